@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+arb_depth - 基于订单簿深度的套利可执行规模
+
+功能：
+    - 拉取 (或从 WebSocket 缓存读取) 各腿订单簿，换算成逐档 ask
+    - 所有腿同时逐档推进，找出扣除手续费后仍盈利的最大合约数
+    - 输出可执行张数、总成本 ($)、净利润 ($)、用到的档位
+    - 订单簿增量变化 (orderbook_delta) 后只重算受影响的组合
+
+用法：
+    from arb_depth import size_opportunity, OrderBook, DepthSizer
+    size = size_opportunity(opp, fetch_book)     # opp 来自 parity_scanner
+    size["max_contracts"], size["capacity_dollars"], size["net_profit"]
+
+    python parity_scanner.py --depth             # 扫描后对前 N 个机会计算深度
+
+依赖：
+    - 无 (标准库)；REST 拉取由调用方传入 fetch 函数
+"""
+
+from typing import Callable, Dict, List, Optional, Tuple
+
+# 与 parity_scanner 相同的费率模型
+KALSHI_FEE_RATE = 0.007
+
+# 手续费最坏情况模型
+FEE_MAX = "max"                  # 只有一腿赢 → 取最贵的那份手续费
+FEE_ALL_BUT_MIN = "all_but_min"  # 除一腿外都赢 (NO 阶梯)
+
+
+def _fee(price_cents: float) -> float:
+    return max(0.0, 100 - price_cents) * KALSHI_FEE_RATE / 100
+
+
+class OrderBook:
+    """
+    单个市场的订单簿 (Kalshi 只公布双边 bid)
+
+    买 YES 吃的是 NO bid：YES ask = 100 - NO bid，数量相同；买 NO 同理。
+    """
+
+    def __init__(self, ticker: str = ""):
+        self.ticker = ticker
+        self.bids: Dict[str, Dict[int, int]] = {"yes": {}, "no": {}}
+        self.version = 0
+        self._asks_cache: Dict[str, Tuple[int, List[Tuple[int, int]]]] = {}
+
+    @classmethod
+    def from_levels(cls, ticker: str, yes_levels, no_levels) -> "OrderBook":
+        book = cls(ticker)
+        for side, levels in (("yes", yes_levels), ("no", no_levels)):
+            for price, qty in levels or []:
+                if qty > 0:
+                    book.bids[side][int(price)] = int(qty)
+        return book
+
+    @classmethod
+    def from_rest(cls, ticker: str, data: Optional[Dict]) -> "OrderBook":
+        """GET /markets/{ticker}/orderbook 的返回"""
+        ob = (data or {}).get("orderbook") or {}
+        return cls.from_levels(ticker, ob.get("yes"), ob.get("no"))
+
+    @classmethod
+    def from_ws(cls, ticker: str, entry: Optional[Dict]) -> "OrderBook":
+        """websocket.handlers.MessageHandlers.orderbook_cache 的条目"""
+        entry = entry or {}
+        return cls.from_levels(ticker, entry.get("yes_levels"), entry.get("no_levels"))
+
+    def apply_delta(self, side: str, price: int, delta: int):
+        """orderbook_delta 增量更新"""
+        levels = self.bids[side]
+        qty = levels.get(price, 0) + delta
+        if qty > 0:
+            levels[price] = qty
+        else:
+            levels.pop(price, None)
+        self.version += 1
+
+    def best_ask(self, side: str) -> int:
+        """买入 side 的最优 ask (¢)，无挂单返回 0 (与 REST 行情的 0 = 无报价一致)"""
+        other = self.bids["no" if side == "yes" else "yes"]
+        return 100 - max(other) if other else 0
+
+    def asks(self, side: str) -> List[Tuple[int, int]]:
+        """买入 side 的逐档 ask [(价格¢, 数量)]，价格升序 (按版本缓存)"""
+        cached = self._asks_cache.get(side)
+        if cached and cached[0] == self.version:
+            return cached[1]
+        other = self.bids["no" if side == "yes" else "yes"]
+        asks = sorted((100 - p, q) for p, q in other.items())
+        self._asks_cache[side] = (self.version, asks)
+        return asks
+
+
+def max_executable(
+    legs: List[Tuple[OrderBook, str]],
+    payout: float = 1.0,
+    fee_mode: str = FEE_MAX,
+    max_contracts: Optional[int] = None,
+) -> Dict:
+    """
+    所有腿同时逐档推进，计算最大可盈利组合数
+
+    每组合 = 每条腿各 1 张。各腿价格随数量单调不减，所以每组合的边际利润单调不增，
+    遇到第一档亏损即停止；复杂度 O(各腿档位数之和)。
+
+    Args:
+        legs: [(OrderBook, "yes"/"no"), ...]
+        payout: 每组合的保底结算金额 ($)
+        fee_mode: FEE_MAX / FEE_ALL_BUT_MIN
+        max_contracts: 上限 (None = 不限)
+
+    Returns:
+        {max_contracts, capacity_dollars, net_profit, avg_cost_cents, levels_used, marginal_profit}
+    """
+    ladders = [book.asks(side) for book, side in legs]
+    pos = [0] * len(legs)           # 每条腿当前档位
+    left = [l[0][1] if l else 0 for l in ladders]  # 当前档位剩余数量
+
+    contracts = 0
+    cost = 0.0
+    profit = 0.0
+    marginal = None
+    levels_used = 0
+
+    while all(p < len(l) for p, l in zip(pos, ladders)):
+        prices = [l[p][0] for p, l in zip(pos, ladders)]
+        fees = [_fee(x) for x in prices]
+        fee = max(fees) if fee_mode == FEE_MAX else sum(fees) - min(fees)
+        unit_cost = sum(prices) / 100.0
+        unit_profit = payout - unit_cost - fee
+        if unit_profit <= 0:
+            marginal = unit_profit
+            break
+
+        qty = min(left)
+        if max_contracts is not None:
+            qty = min(qty, max_contracts - contracts)
+        contracts += qty
+        cost += qty * unit_cost
+        profit += qty * unit_profit
+        marginal = unit_profit
+        levels_used += 1
+        if max_contracts is not None and contracts >= max_contracts:
+            break
+
+        for k in range(len(legs)):
+            left[k] -= qty
+            if left[k] == 0:
+                pos[k] += 1
+                if pos[k] < len(ladders[k]):
+                    left[k] = ladders[k][pos[k]][1]
+
+    return {
+        "max_contracts": contracts,
+        "capacity_dollars": round(cost, 2),
+        "net_profit": round(profit, 2),
+        "avg_cost_cents": round(cost / contracts * 100, 2) if contracts else None,
+        "levels_used": levels_used,
+        "marginal_profit": round(marginal, 4) if marginal is not None else None,
+    }
+
+
+def opportunity_legs(opp: Dict) -> Tuple[List[Tuple[str, str]], float, str]:
+    """parity_scanner 机会 → ([(ticker, side)], payout, fee_mode)"""
+    kind = opp.get("type")
+    if kind == "SINGLE_MARKET_PARITY":
+        return [(opp["ticker"], "yes"), (opp["ticker"], "no")], 1.0, FEE_MAX
+    if kind == "BRACKET_PARITY":
+        return [(b["ticker"], "yes") for b in opp["brackets"]], 1.0, FEE_MAX
+    if kind == "NO_LADDER_PARITY":
+        legs = [(b["ticker"], "no") for b in opp["brackets"]]
+        return legs, float(len(legs) - 1), FEE_ALL_BUT_MIN
+    if kind == "THRESHOLD_PARITY":
+        return [(l["ticker"], l["side"].lower()) for l in opp["legs"]], 1.0, FEE_MAX
+    raise ValueError(f"unknown opportunity type: {kind}")
+
+
+class DepthSizer:
+    """
+    持有一组机会的订单簿，订单簿变化后增量重算
+
+    books 可以来自 REST (fetch) 或 WebSocket 缓存；apply_delta 只把引用了
+    该 ticker 的机会标记为 dirty，refresh() 时只重算这些。
+    """
+
+    def __init__(self, fetch_book: Callable[[str], OrderBook]):
+        self.fetch_book = fetch_book
+        self.books: Dict[str, OrderBook] = {}
+        self.opps: List[Dict] = []
+        self._by_ticker: Dict[str, List[int]] = {}
+        self._dirty: set = set()
+
+    def book(self, ticker: str) -> OrderBook:
+        if ticker not in self.books:
+            self.books[ticker] = self.fetch_book(ticker)
+        return self.books[ticker]
+
+    def add(self, opp: Dict) -> Dict:
+        idx = len(self.opps)
+        self.opps.append(opp)
+        legs, _, _ = opportunity_legs(opp)
+        for ticker, _side in legs:
+            self._by_ticker.setdefault(ticker, []).append(idx)
+        self._dirty.add(idx)
+        return opp
+
+    def apply_delta(self, ticker: str, side: str, price: int, delta: int):
+        if ticker in self.books:
+            self.books[ticker].apply_delta(side, price, delta)
+            self._dirty.update(self._by_ticker.get(ticker, ()))
+
+    def refresh(self) -> List[Dict]:
+        """重算 dirty 的机会，返回被更新的机会"""
+        updated = []
+        for idx in sorted(self._dirty):
+            opp = self.opps[idx]
+            opp["depth"] = self._size(opp)
+            updated.append(opp)
+        self._dirty.clear()
+        return updated
+
+    def _size(self, opp: Dict) -> Dict:
+        legs, payout, fee_mode = opportunity_legs(opp)
+        return max_executable([(self.book(t), s) for t, s in legs], payout, fee_mode)
+
+
+def size_opportunity(opp: Dict, fetch_book: Callable[[str], OrderBook]) -> Dict:
+    """单个机会的深度 (不做缓存)"""
+    legs, payout, fee_mode = opportunity_legs(opp)
+    return max_executable([(fetch_book(t), s) for t, s in legs], payout, fee_mode)
@@ -0,0 +1,576 @@
+#!/usr/bin/env python3
+"""
+backtest_engine - 已结算市场历史回测引擎
+
+功能：
+    - 同步已结算市场到本地历史库 (data/settled_history.jsonl)
+    - 列式加载 (array 列)，支持 10 万级市场秒级回测
+    - 重放真实筛选规则：价格 >=85 / <=15、spread、volume、Tier
+    - 使用 PositionCalculator 的 Kelly 仓位规则，按结算时间顺序滚动资金
+    - 输出 P&L、最大回撤、按类别 / Tier 的校准表
+
+用法：
+    python backtest_engine.py --sync --pages 200      # 拉取已结算市场到本地
+    python backtest_engine.py                         # 用本地历史回测
+    python backtest_engine.py --min-volume 200 --max-spread 3 --json
+    python backtest_engine.py --bench 100000          # 合成数据性能测试
+    python backtest_engine.py --export-columns        # 导出列式快照，之后 --columns 直接 mmap 加载
+
+依赖：
+    - position_calculator.py (Kelly 仓位)
+    - source_detector.py (Tier 检测)
+    - price_store.py (有价格历史时用真实入场价)
+    - snapshot_columns.py (列式快照导出 / 加载)
+    - requests (仅 --sync 需要)
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+from array import array
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Iterable
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+try:
+    import requests
+except ImportError:
+    requests = None
+
+from source_detector import detect_sources
+from position_calculator import PositionCalculator
+from price_store import PriceStore
+
+API_BASE = "https://api.elections.kalshi.com/trade-api/v2"
+HISTORY_FILE = Path(__file__).parent / "data" / "settled_history.jsonl"
+COLUMNS_DIR = Path(__file__).parent / "data" / "snapshots" / "settled_history"
+
+# Kalshi fee: ~0.7% of winnings (same model as parity_scanner)
+KALSHI_FEE_RATE = 0.007
+
+# 默认筛选规则 (与 kalshi_pipeline.quick_filter / report_v2.score_market 一致)
+DEFAULT_RULES = {
+    "yes_min_price": 85,     # 价格 >= 85 → 买 YES
+    "no_max_price": 15,      # 价格 <= 15 → 买 NO
+    "max_spread": 5,         # score_market: spread <= 5 才算流动性可
+    "min_volume": 100,       # quick_filter 默认 min_volume
+    "max_tier": 2,           # quick_filter 只要 Tier 1-2
+    "min_ann_yield": 100,    # score_market: 年化 < 100% 直接跳过
+    "min_probability": 0,    # endgame_scanner: 入场方隐含胜率下限 (0 = 不启用)
+}
+
+# Tier → 置信度 (与 kalshi_pipeline.CONFIDENCE_THRESHOLDS 的 tier_max 对齐)
+TIER_CONFIDENCE = {1: "HIGH", 2: "MEDIUM"}
+
+# 校准分桶 (入场成本 ¢ → 隐含胜率)
+CALIBRATION_BUCKETS = [(85, 90), (90, 95), (95, 100)]
+
+SKIP_CATEGORIES = {"Sports", "Entertainment"}
+
+
+# ============================================================
+# 历史库
+# ============================================================
+
+def _parse_ts(iso_str: str) -> int:
+    """ISO 时间 → epoch 秒 (解析失败返回 0)"""
+    if not iso_str:
+        return 0
+    try:
+        return int(datetime.fromisoformat(iso_str.replace("Z", "+00:00")).timestamp())
+    except (ValueError, TypeError):
+        return 0
+
+
+def normalize_settled_market(m: Dict, category: str = "", price_store=None) -> Optional[Dict]:
+    """
+    把 API 返回的已结算市场压缩成历史库的一行
+
+    入场价优先级：记录自带 entry_price → price_store 中结算前 24h 的收盘价
+    → previous_* 字段 (API 的结算前 24h 快照)。
+    """
+    result = (m.get("result") or "").lower()
+    if result not in ("yes", "no"):
+        return None
+
+    close_ts = _parse_ts(m.get("close_time", ""))
+    if not close_ts:
+        return None
+
+    ticker = m.get("ticker", "")
+    title = m.get("title", "")
+    tier = m.get("tier")
+    if tier is None:
+        tier = detect_sources(m.get("rules_primary", ""), title).get("research_tier", 9)
+
+    price = m.get("entry_price")
+    if price is None and price_store is not None:
+        price = price_store.price_at(ticker, close_ts - 86400)
+    if price is None:
+        price = m.get("previous_price") or m.get("last_price") or 50
+    yes_bid = m.get("previous_yes_bid", m.get("yes_bid", 0)) or 0
+    yes_ask = m.get("previous_yes_ask", m.get("yes_ask", 0)) or 0
+
+    return {
+        "ticker": ticker,
+        "series": ticker.split("-")[0] if "-" in ticker else ticker,
+        "category": category or m.get("category", "") or "Unknown",
+        "tier": int(tier),
+        "close_ts": close_ts,
+        "entry_ts": int(m.get("entry_ts") or close_ts - 86400),
+        "result": result,
+        "price": int(price),
+        "yes_bid": int(yes_bid),
+        "yes_ask": int(yes_ask),
+        "volume": int(m.get("volume_24h", 0) or m.get("volume", 0) or 0),
+    }
+
+
+def load_history_records(path: Path = HISTORY_FILE) -> List[Dict]:
+    """读取本地历史库 (JSON lines)"""
+    records = []
+    if not path.exists():
+        return records
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
+
+
+def sync_settled_history(max_pages: int = 100, path: Path = HISTORY_FILE) -> int:
+    """
+    拉取已结算 events (含 nested markets)，追加新市场到本地历史库
+
+    Returns:
+        新增的市场数量
+    """
+    if requests is None:
+        print("Error: requests module required for --sync", file=sys.stderr)
+        return 0
+
+    known = {r.get("ticker") for r in load_history_records(path)}
+    path.parent.mkdir(parents=True, exist_ok=True)
+    store = PriceStore()
+
+    added = 0
+    cursor = None
+    with open(path, "a") as out:
+        page = 0
+        while page < max_pages:
+            params = {"limit": 100, "status": "settled", "with_nested_markets": "true"}
+            if cursor:
+                params["cursor"] = cursor
+            try:
+                resp = requests.get(f"{API_BASE}/events", params=params, timeout=15)
+                if resp.status_code == 429:
+                    time.sleep(2)
+                    continue
+                if resp.status_code != 200:
+                    break
+                data = resp.json()
+            except Exception as e:
+                print(f"  Events API error: {e}", file=sys.stderr)
+                break
+
+            for e in data.get("events", []):
+                category = e.get("category", "")
+                if category in SKIP_CATEGORIES:
+                    continue
+                for m in e.get("markets", []):
+                    if m.get("ticker") in known:
+                        continue
+                    row = normalize_settled_market(m, category, price_store=store)
+                    if row:
+                        out.write(json.dumps(row) + "\n")
+                        known.add(row["ticker"])
+                        added += 1
+
+            cursor = data.get("cursor")
+            page += 1
+            if not cursor:
+                break
+            if page % 10 == 0:
+                print(f"  Page {page}: +{added} markets", file=sys.stderr, flush=True)
+
+    return added
+
+
+class SettledHistory:
+    """
+    已结算市场的列式视图
+
+    数值列用 array 存储；category 做字典编码 (category_codes + categories)。
+    """
+
+    INT_COLUMNS = ("tier", "close_ts", "entry_ts", "won_yes", "price", "yes_bid", "yes_ask", "volume")
+
+    def __init__(self):
+        self.tickers: List[str] = []
+        self.categories: List[str] = []
+        self.category_codes = array("i")
+        self.tier = array("i")
+        self.close_ts = array("q")
+        self.entry_ts = array("q")
+        self.won_yes = array("b")
+        self.price = array("i")
+        self.yes_bid = array("i")
+        self.yes_ask = array("i")
+        self.volume = array("q")
+
+    def __len__(self):
+        return len(self.price)
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict]) -> "SettledHistory":
+        """从历史行构建列 (按 close_ts 排序，回测按结算顺序滚动资金)"""
+        rows = sorted(records, key=lambda r: r.get("close_ts", 0))
+        h = cls()
+        cat_index: Dict[str, int] = {}
+        for r in rows:
+            cat = r.get("category", "Unknown")
+            code = cat_index.get(cat)
+            if code is None:
+                code = cat_index[cat] = len(h.categories)
+                h.categories.append(cat)
+            h.tickers.append(r.get("ticker", ""))
+            h.category_codes.append(code)
+            h.tier.append(int(r.get("tier", 9)))
+            h.close_ts.append(int(r.get("close_ts", 0)))
+            h.entry_ts.append(int(r.get("entry_ts", 0)))
+            h.won_yes.append(1 if r.get("result") == "yes" else 0)
+            h.price.append(int(r.get("price", 50)))
+            h.yes_bid.append(int(r.get("yes_bid", 0)))
+            h.yes_ask.append(int(r.get("yes_ask", 0)))
+            h.volume.append(int(r.get("volume", 0)))
+        return h
+
+    @classmethod
+    def load(cls, path: Path = HISTORY_FILE) -> "SettledHistory":
+        return cls.from_records(load_history_records(path))
+
+    def export_columns(self, out_dir: Path = COLUMNS_DIR) -> Path:
+        """导出为列式快照 (每列一个 .npy，category 字典放 schema meta)"""
+        from snapshot_columns import write_columns
+        cols = {"ticker": self.tickers, "category_codes": self.category_codes}
+        cols.update((name, getattr(self, name)) for name in self.INT_COLUMNS)
+        return write_columns(cols, out_dir, source="backtest_engine",
+                             meta={"categories": self.categories})
+
+    @classmethod
+    def from_columns(cls, snapshot_dir: Path = COLUMNS_DIR) -> "SettledHistory":
+        """mmap 列式快照 (数值列是只读 memoryview，不解析 JSONL)"""
+        from snapshot_columns import SnapshotReader
+        reader = SnapshotReader(snapshot_dir)
+        h = cls()
+        h._reader = reader  # 保持 mmap 存活
+        h.categories = list(reader.schema.get("meta", {}).get("categories", []))
+        h.tickers = reader.column("ticker")
+        h.category_codes = reader.column("category_codes")
+        for name in cls.INT_COLUMNS:
+            setattr(h, name, reader.column(name))
+        return h
+
+
+# ============================================================
+# 回测引擎
+# ============================================================
+
+class BacktestEngine:
+    """
+    在 SettledHistory 上重放筛选规则 + Kelly 仓位
+
+    筛选和 P&L 按列批量计算；只有资金滚动 (仓位依赖余额) 是顺序循环。
+    """
+
+    def __init__(
+        self,
+        history: SettledHistory,
+        calculator: Optional[PositionCalculator] = None,
+        starting_balance: float = 1000.0,
+        fee_rate: float = KALSHI_FEE_RATE,
+    ):
+        self.history = history
+        self.calculator = calculator or PositionCalculator()
+        self.starting_balance = starting_balance
+        self.fee_rate = fee_rate
+
+    def _position_pct_table(self) -> Dict[str, List[float]]:
+        """
+        预计算 (置信度, 价格) → 仓位比例
+
+        与 PositionCalculator.calculate 相同：Kelly × 置信度乘数，上限 max_single_position_pct
+        """
+        config = self.calculator.config
+        max_single = config.get("max_single_position_pct", 0.15)
+        multipliers = config.get("confidence_multipliers", {})
+        table = {}
+        for confidence in ("HIGH", "MEDIUM", "LOW"):
+            mult = multipliers.get(confidence, 0)
+            table[confidence] = [
+                min(self.calculator.calculate_kelly(confidence, p) * mult, max_single) if mult > 0 else 0.0
+                for p in range(101)
+            ]
+        return table
+
+    def screen(self, rules: Optional[Dict] = None) -> List[int]:
+        """
+        按规则筛选，返回通过的行号
+
+        side: 价格 >= yes_min_price 买 YES，<= no_max_price 买 NO
+        """
+        r = {**DEFAULT_RULES, **(rules or {})}
+        h = self.history
+        yes_min, no_max = r["yes_min_price"], r["no_max_price"]
+        max_spread, min_volume = r["max_spread"], r["min_volume"]
+        max_tier, min_ann = r["max_tier"], r["min_ann_yield"]
+        min_prob = r["min_probability"]
+
+        selected = []
+        for i, (p, bid, ask, vol, tier, c_ts, e_ts) in enumerate(zip(
+            h.price, h.yes_bid, h.yes_ask, h.volume, h.tier, h.close_ts, h.entry_ts
+        )):
+            if no_max < p < yes_min:
+                continue
+            if vol < min_volume or tier > max_tier:
+                continue
+            spread = (ask - bid) if ask else 99
+            if spread > max_spread:
+                continue
+            cost = p if p >= yes_min else 100 - p
+            if cost <= 0 or cost >= 100 or cost < min_prob:
+                continue
+            if min_ann:
+                days = max((c_ts - e_ts) // 86400, 1)
+                if ((100 - cost) / cost) * 100 / days * 365 < min_ann:
+                    continue
+            selected.append(i)
+        return selected
+
+    def run(self, rules: Optional[Dict] = None) -> Dict:
+        """
+        运行回测
+
+        Returns:
+            {
+                "trades": int, "wins": int, "hit_rate": float,
+                "pnl": float, "roi": float, "max_drawdown": float,
+                "final_balance": float,
+                "by_category": {...}, "by_tier": {...},
+                "calibration": [...],
+            }
+        """
+        r = {**DEFAULT_RULES, **(rules or {})}
+        h = self.history
+        selected = self.screen(r)
+        pct_table = self._position_pct_table()
+        reserve = self.calculator.config.get("min_cash_reserve_pct", 0.2)
+        yes_min = r["yes_min_price"]
+
+        balance = self.starting_balance
+        peak = balance
+        max_dd = 0.0
+        trades = wins = 0
+        by_category: Dict[str, Dict] = {}
+        by_tier: Dict[int, Dict] = {}
+        calib = {b: [0, 0, 0.0] for b in CALIBRATION_BUCKETS}  # n, wins, sum(implied)
+
+        for i in selected:
+            p = h.price[i]
+            tier = h.tier[i]
+            confidence = TIER_CONFIDENCE.get(tier, "LOW")
+            pct = pct_table[confidence][p]
+            if pct <= 0 or balance < 10:
+                continue
+
+            is_yes = p >= yes_min
+            cost = p if is_yes else 100 - p
+            dollars = max(10, min(200, balance * (1 - reserve) * pct))
+            contracts = int(dollars * 100 / cost)
+            if contracts <= 0:
+                continue
+
+            won = bool(h.won_yes[i]) == is_yes
+            if won:
+                gross = contracts * (100 - cost) / 100
+                pnl = gross - gross * self.fee_rate
+            else:
+                pnl = -contracts * cost / 100
+
+            balance += pnl
+            peak = max(peak, balance)
+            max_dd = max(max_dd, (peak - balance) / peak if peak > 0 else 0)
+            trades += 1
+            wins += won
+
+            cat = h.categories[h.category_codes[i]]
+            for key, group in ((cat, by_category), (tier, by_tier)):
+                g = group.setdefault(key, {"trades": 0, "wins": 0, "pnl": 0.0, "cost": 0.0})
+                g["trades"] += 1
+                g["wins"] += won
+                g["pnl"] += pnl
+                g["cost"] += contracts * cost / 100
+
+            for lo, hi in CALIBRATION_BUCKETS:
+                if lo <= cost < hi:
+                    c = calib[(lo, hi)]
+                    c[0] += 1
+                    c[1] += won
+                    c[2] += cost / 100
+                    break
+
+        for group in (by_category, by_tier):
+            for g in group.values():
+                g["hit_rate"] = g["wins"] / g["trades"] if g["trades"] else 0
+                g["roi"] = g["pnl"] / g["cost"] if g["cost"] else 0
+                g["pnl"] = round(g["pnl"], 2)
+                g["cost"] = round(g["cost"], 2)
+
+        calibration = [
+            {
+                "bucket": f"{lo}-{hi - 1}¢",
+                "trades": n,
+                "implied": round(s / n, 3) if n else None,
+                "actual": round(w / n, 3) if n else None,
+            }
+            for (lo, hi), (n, w, s) in calib.items()
+        ]
+
+        pnl_total = balance - self.starting_balance
+        return {
+            "markets": len(h),
+            "screened": len(selected),
+            "trades": trades,
+            "wins": wins,
+            "hit_rate": wins / trades if trades else 0,
+            "pnl": round(pnl_total, 2),
+            "roi": pnl_total / self.starting_balance if self.starting_balance else 0,
+            "final_balance": round(balance, 2),
+            "max_drawdown": round(max_dd, 4),
+            "by_category": by_category,
+            "by_tier": {str(k): v for k, v in sorted(by_tier.items())},
+            "calibration": calibration,
+            "rules": r,
+        }
+
+
+def format_report(result: Dict) -> str:
+    """格式化回测报告"""
+    r = result
+    lines = [
+        "=" * 60,
+        "📊 已结算市场回测报告",
+        f"⏰ {datetime.now().strftime('%Y-%m-%d %H:%M')}",
+        "=" * 60,
+        "",
+        "📈 总体",
+        f"  历史市场: {r['markets']} | 通过筛选: {r['screened']} | 成交: {r['trades']}",
+        f"  胜率: {r['hit_rate']:.1%} | P&L: ${r['pnl']:+,.2f} ({r['roi']:+.1%})",
+        f"  期末资金: ${r['final_balance']:,.2f} | 最大回撤: {r['max_drawdown']:.1%}",
+        "",
+        "🔍 按类别",
+    ]
+    for cat, g in sorted(r["by_category"].items(), key=lambda x: -x[1]["trades"]):
+        lines.append(f"  {cat}: {g['wins']}/{g['trades']} ({g['hit_rate']:.0%}) | "
+                     f"P&L ${g['pnl']:+,.2f} | ROI {g['roi']:+.1%}")
+
+    lines.extend(["", "🏷️ 按 Tier"])
+    for tier, g in r["by_tier"].items():
+        lines.append(f"  Tier {tier}: {g['wins']}/{g['trades']} ({g['hit_rate']:.0%}) | "
+                     f"P&L ${g['pnl']:+,.2f} | ROI {g['roi']:+.1%}")
+
+    lines.extend(["", "🎯 校准 (入场价隐含胜率 vs 实际胜率)"])
+    for c in r["calibration"]:
+        if c["trades"]:
+            lines.append(f"  {c['bucket']}: 隐含 {c['implied']:.1%} vs 实际 {c['actual']:.1%} ({c['trades']}笔)")
+
+    return "\n".join(lines)
+
+
+def synthetic_records(n: int, seed: int = 7) -> List[Dict]:
+    """生成合成历史 (性能测试用)"""
+    rng = random.Random(seed)
+    cats = ["Economics", "Politics", "Financials", "Climate and Weather", "World"]
+    base = 1_700_000_000
+    records = []
+    for i in range(n):
+        price = rng.randint(1, 99)
+        win_yes = rng.random() < price / 100
+        bid = max(0, price - rng.randint(0, 4))
+        close_ts = base + i * 600
+        records.append({
+            "ticker": f"KXSYN-{i}",
+            "category": rng.choice(cats),
+            "tier": rng.choice((1, 1, 2, 3, 9)),
+            "close_ts": close_ts,
+            "entry_ts": close_ts - 86400,
+            "result": "yes" if win_yes else "no",
+            "price": price,
+            "yes_bid": bid,
+            "yes_ask": min(100, bid + rng.randint(1, 6)),
+            "volume": rng.randint(0, 5000),
+        })
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="已结算市场回测引擎")
+    parser.add_argument("--sync", action="store_true", help="拉取已结算市场到本地历史库")
+    parser.add_argument("--pages", type=int, default=100, help="--sync 最多翻页数")
+    parser.add_argument("--balance", type=float, default=1000.0, help="初始资金 ($)")
+    parser.add_argument("--min-volume", type=int, default=DEFAULT_RULES["min_volume"])
+    parser.add_argument("--max-spread", type=int, default=DEFAULT_RULES["max_spread"])
+    parser.add_argument("--max-tier", type=int, default=DEFAULT_RULES["max_tier"])
+    parser.add_argument("--bench", type=int, default=0, help="用 N 个合成市场测试性能")
+    parser.add_argument("--columns", action="store_true", help=f"从列式快照加载 ({COLUMNS_DIR})")
+    parser.add_argument("--export-columns", action="store_true", help="把本地历史导出为列式快照")
+    parser.add_argument("--json", action="store_true", help="输出JSON")
+    args = parser.parse_args()
+
+    if args.sync:
+        added = sync_settled_history(max_pages=args.pages)
+        print(f"✅ 新增 {added} 个已结算市场 → {HISTORY_FILE}", file=sys.stderr)
+        return
+
+    t0 = time.time()
+    if args.bench:
+        history = SettledHistory.from_records(synthetic_records(args.bench))
+    elif args.columns:
+        history = SettledHistory.from_columns()
+    else:
+        history = SettledHistory.load()
+        if not len(history):
+            print(f"⚠️ 本地历史为空，先运行 --sync ({HISTORY_FILE})", file=sys.stderr)
+            return
+    t_load = time.time() - t0
+
+    if args.export_columns:
+        out = history.export_columns()
+        print(f"✅ 导出 {len(history)} 个市场 → {out}", file=sys.stderr)
+        return
+
+    rules = {"min_volume": args.min_volume, "max_spread": args.max_spread, "max_tier": args.max_tier}
+    engine = BacktestEngine(history, calculator=PositionCalculator(), starting_balance=args.balance)
+    t1 = time.time()
+    result = engine.run(rules)
+    t_run = time.time() - t1
+    print(f"⏱️  加载 {len(history)} 个市场 {t_load:.2f}s | 回测 {t_run:.2f}s", file=sys.stderr)
+
+    if args.json:
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+    else:
+        print(format_report(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -33,9 +33,11 @@ KALSHI_FEE = 0.007      # ~0.7%
 POLY_FEE_US = 0.0001    # ~0.01% (US users)
 POLY_FEE_INTL = 0.02    # ~2% (international)
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from market_matcher import MarketMatcher
+
 # Import existing fuzzy matching from crossplatform.py
 try:
-    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
     from kalshi.crossplatform import (
         similarity, jaccard, levenshtein_ratio,
         auto_match_markets, PAIRS as KNOWN_PAIRS,
@@ -175,7 +177,15 @@ def fetch_kalshi_series_markets(series_ticker):
 
 
 def fetch_polymarket_events(limit=100):
-    """Fetch active Polymarket events from Gamma API."""
+    """Fetch active Polymarket events (local mirror first, Gamma API as fallback)."""
+    try:
+        sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        from poly_mirror import get_index
+        events = get_index().events
+        if events:
+            return events[:limit]
+    except ImportError:
+        pass
     try:
         r = requests.get(f"{POLY_GAMMA_API}/events", params={
             "limit": limit,
@@ -277,30 +287,22 @@ def calculate_arb_profit(k_price, p_price, fee_mode="us"):
     }
 
 
-def match_kalshi_to_poly(k_market, poly_events, threshold=0.35):
+def match_kalshi_to_poly(k_market, poly_events, threshold=0.35, matcher=None):
     """
     Try to match a single Kalshi market to a Polymarket market using fuzzy matching.
     Returns best match or None.
+
+    Pass matcher=MarketMatcher(poly_events) when matching many Kalshi markets
+    against the same events: the Polymarket side is then indexed once and each
+    call only scores the blocked candidates. Without it the index is built per call.
     """
-    k_title = k_market.get("title", "")
-    best_score = 0
-    best_match = None
-    
-    for event in poly_events:
-        for pm in event.get("markets", []):
-            p_title = pm.get("question", "") or event.get("title", "")
-            score = similarity(k_title, p_title)
-            if score > best_score:
-                best_score = score
-                best_match = {
-                    "event": event,
-                    "market": pm,
-                    "score": score,
-                }
-    
-    if best_score >= threshold and best_match:
-        return best_match
-    return None
+    if matcher is None:
+        matcher = MarketMatcher(poly_events)
+    hit = matcher.best(k_market.get("title", ""), threshold)
+    if not hit:
+        return None
+    score, event, market = hit
+    return {"event": event, "market": market, "score": score}
 
 
 def compare_known_pairs(poly_events):
@@ -417,9 +419,10 @@ def auto_discover_matches(poly_events):
     print(f"  📊 Kalshi: {len(kalshi_markets)} markets | "
           f"Polymarket: {len(poly_filtered)} events")
     
-    # Match each Kalshi market to Polymarket
+    # Match each Kalshi market to Polymarket (index the Polymarket side once)
+    matcher = MarketMatcher(poly_filtered)
     for km in kalshi_markets:
-        best = match_kalshi_to_poly(km, poly_filtered, threshold=0.35)
+        best = match_kalshi_to_poly(km, poly_filtered, threshold=0.35, matcher=matcher)
         if not best:
             continue
         
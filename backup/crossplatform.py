@@ -9,11 +9,15 @@ Two modes:
 Run: python3 crossplatform.py          # Manual pairs only
      python3 crossplatform.py --auto   # + auto-discovery
 """
+import os
 import sys
 sys.path.insert(0, '/tmp/pip_packages')
 import requests, json, re
 from datetime import datetime, timezone
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from market_matcher import MarketMatcher
+
 KALSHI_API = "https://api.elections.kalshi.com/trade-api/v2"
 POLY_API = "https://gamma-api.polymarket.com"
 
@@ -56,29 +60,13 @@ def similarity(text_a, text_b):
 
 
 def auto_match_markets(kalshi_markets, poly_events, threshold=0.45):
-    """Auto-match Kalshi markets to Polymarket events using fuzzy matching."""
-    matches = []
-    for km in kalshi_markets:
-        k_title = km.get('title', '')
-        best_score = 0
-        best_match = None
-        for pe in poly_events:
-            for pm in pe.get('markets', []):
-                p_title = pm.get('question', '') or pe.get('title', '')
-                score = similarity(k_title, p_title)
-                if score > best_score:
-                    best_score = score
-                    best_match = (pe, pm)
-        
-        if best_score >= threshold and best_match:
-            matches.append({
-                'kalshi': km,
-                'poly_event': best_match[0],
-                'poly_market': best_match[1],
-                'score': best_score,
-            })
-    
-    return sorted(matches, key=lambda x: x['score'], reverse=True)
+    """
+    Auto-match Kalshi markets to Polymarket events using fuzzy matching.
+
+    Same score as similarity(), but candidates are blocked through a token
+    inverted index (market_matcher) instead of comparing every pair.
+    """
+    return MarketMatcher(poly_events).match_all(kalshi_markets, threshold)
 
 # Manually paired markets (Kalshi series → Polymarket event slug)
 # Updated: 2026-02-01
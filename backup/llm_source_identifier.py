@@ -10,10 +10,15 @@ Date: 2026-02-20
 """
 
 import os
+import sys
 import json
 import re
 from typing import List, Dict, Optional
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from llm_cache import cached_llm_call
+from llm_pool import llm_call
+
 # 尝试导入 LLM 客户端
 try:
     import anthropic
@@ -95,12 +100,13 @@ class LLMSourceIdentifier:
         else:
             self.client = None
     
-    def identify_sources(self, market: Dict) -> Dict:
+    def identify_sources(self, market: Dict, deadline: Optional[float] = None) -> Dict:
         """
         使用 LLM 识别市场所需的数据源
         
         Args:
             market: 市场信息 dict，包含 title, rules_primary, rules_secondary
+            deadline: 给定时经 llm_pool 调用，超时立即返回规则回退 (LLM 结果后台写入缓存)
             
         Returns:
             {
@@ -126,28 +132,24 @@ class LLMSourceIdentifier:
 识别所需的数据源并输出 JSON。"""
 
         try:
-            if self.provider == "anthropic":
-                response = self.client.messages.create(
-                    model="claude-3-haiku-20240307",
-                    max_tokens=1000,
-                    system=SYSTEM_PROMPT,
-                    messages=[{"role": "user", "content": prompt}]
-                )
-                text = response.content[0].text
-            else:  # gemini
-                response = self.client.generate_content(
-                    f"{SYSTEM_PROMPT}\n\n{prompt}",
-                    generation_config=genai.types.GenerationConfig(
-                        temperature=0.2,
-                        max_output_tokens=1000,
-                    )
-                )
-                text = response.text
+            # 同一事件下只改阈值的兄弟市场规则相同 → 数字抽象掉后共用一次识别结果
+            kind = f"sources:{self.provider}"
+            if deadline is None:
+                text = cached_llm_call(kind, prompt, lambda: self._generate(prompt), template=True)
+                status = "llm" if text else "error"
+            else:
+                text, status = llm_call(kind, prompt, lambda: self._generate(prompt),
+                                        template=True, deadline=deadline)
+            if not text:
+                result = self._fallback_identify(market)
+                result["llm_status"] = status
+                return result
             
             # 提取 JSON
             json_match = re.search(r'\{[\s\S]*\}', text)
             if json_match:
                 result = json.loads(json_match.group())
+                result["llm_status"] = status
                 return result
             else:
                 return self._fallback_identify(market)
@@ -156,6 +158,34 @@ class LLMSourceIdentifier:
             print(f"LLM error: {e}")
             return self._fallback_identify(market)
     
+    def _generate(self, prompt: str):
+        """调用 LLM → (text, usage)"""
+        if self.provider == "anthropic":
+            response = self.client.messages.create(
+                model="claude-3-haiku-20240307",
+                max_tokens=1000,
+                system=SYSTEM_PROMPT,
+                messages=[{"role": "user", "content": prompt}]
+            )
+            usage = getattr(response, "usage", None)
+            return response.content[0].text, {
+                "input_tokens": getattr(usage, "input_tokens", 0),
+                "output_tokens": getattr(usage, "output_tokens", 0),
+            }
+        # gemini
+        response = self.client.generate_content(
+            f"{SYSTEM_PROMPT}\n\n{prompt}",
+            generation_config=genai.types.GenerationConfig(
+                temperature=0.2,
+                max_output_tokens=1000,
+            )
+        )
+        usage = getattr(response, "usage_metadata", None)
+        return response.text, {
+            "input_tokens": getattr(usage, "prompt_token_count", 0),
+            "output_tokens": getattr(usage, "candidates_token_count", 0),
+        }
+    
     def _fallback_identify(self, market: Dict) -> Dict:
         """LLM 不可用时的回退逻辑"""
         title = market.get('title', '').lower()
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+bracket_parity - 区间 / 阈值阶梯的线性时间 parity 引擎
+
+功能：
+    - 从 strike 字段 / 副标题 / ticker 后缀解析区间上下界
+    - 按数值区间排序，判断阶梯类型 (互斥区间 / 单边阈值) 和是否覆盖全部结果
+    - 一次扫描得到每个事件的列式结果：
+        · 单市场 YES+NO parity (每个市场只算一次)
+        · 全阶梯 YES 之和 < $1 (互斥且完备的区间)
+        · 全阶梯 NO 之和 < $(n-1)
+        · 阈值阶梯相邻单调性 (YES 低阈值 + NO 高阈值 < $1，前缀最小值线性求解)
+    - 替代 parity_scanner.check_adjacent_bracket_parity 的 O(n²) 配对循环
+
+用法：
+    from bracket_parity import evaluate_ladder
+    ladder = evaluate_ladder(event_markets)
+    ladder.single_net / ladder.yes_ladder / ladder.threshold_pair
+
+    python bracket_parity.py --check           # 完备性判断的回归用例
+    python bracket_parity.py --bench 40        # 40 档合成阶梯，对比旧配对循环
+    python bracket_parity.py --bench 2000 --events 200
+
+依赖：
+    - 无 (标准库)
+"""
+
+import re
+import sys
+import time
+import random
+import argparse
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# 与 parity_scanner 相同的费率模型：赢的一腿按利润收 0.7%
+KALSHI_FEE_RATE = 0.007
+
+INF = float("inf")
+TICK_EPS = 1e-6               # 区间首尾间隔与刻度比较的容差
+
+# 阶梯类型
+KIND_BUCKET = "bucket"        # 互斥区间 (含开放的两端)
+KIND_ABOVE = "above"          # 全是 "高于 X" 阈值
+KIND_BELOW = "below"          # 全是 "低于 X" 阈值
+KIND_UNKNOWN = "unknown"      # 解析不出区间，交给旧的逐市场逻辑
+
+_NUM = r"(-?\d[\d,]*(?:\.\d+)?)"
+_RANGE_RE = re.compile(_NUM + r"\s*[%¢°kKmMbB]?\s*(?:to|and|-|–|—)\s*\$?" + _NUM)
+_ABOVE_RE = re.compile(r"(?:\b(?:above|over|more than|greater than|at least)|≥|>)\s*\$?" + _NUM, re.I)
+_ABOVE_SUFFIX_RE = re.compile(_NUM + r"\S*\s*(?:or (?:more|above|higher|greater)|\+)", re.I)
+_BELOW_RE = re.compile(r"(?:\b(?:below|under|less than|fewer than|at most)|≤|<)\s*\$?" + _NUM, re.I)
+_BELOW_SUFFIX_RE = re.compile(_NUM + r"\S*\s*or (?:less|below|lower|fewer)", re.I)
+_TICKER_T_RE = re.compile(r"-T(-?\d+(?:\.\d+)?)$")
+
+
+def _num(s: str) -> float:
+    return float(s.replace(",", ""))
+
+
+def parse_bracket(market: Dict) -> Optional[Tuple[float, float]]:
+    """
+    解析市场的结算区间 (lo, hi)；单边阈值用 ±inf 表示
+
+    优先级：API strike 字段 → yes_sub_title / subtitle → ticker 的 -T 后缀
+    """
+    strike_type = market.get("strike_type") or ""
+    floor = market.get("floor_strike")
+    cap = market.get("cap_strike")
+    if strike_type in ("greater", "greater_or_equal") and floor is not None:
+        return float(floor), INF
+    if strike_type in ("less", "less_or_equal") and cap is not None:
+        return -INF, float(cap)
+    if strike_type == "between" and floor is not None and cap is not None:
+        return float(floor), float(cap)
+
+    sub = market.get("yes_sub_title") or market.get("subtitle") or ""
+    if sub:
+        m = _ABOVE_RE.search(sub) or _ABOVE_SUFFIX_RE.search(sub)
+        if m:
+            return _num(m.group(1)), INF
+        m = _BELOW_RE.search(sub) or _BELOW_SUFFIX_RE.search(sub)
+        if m:
+            return -INF, _num(m.group(1))
+        m = _RANGE_RE.search(sub)
+        if m:
+            lo, hi = _num(m.group(1)), _num(m.group(2))
+            if lo <= hi:
+                return lo, hi
+
+    m = _TICKER_T_RE.search(market.get("ticker", ""))
+    if m:
+        return _num(m.group(1)), INF
+    return None
+
+
+def _unit(x: float) -> float:
+    """单个数值能看出的刻度 (2.4 → 0.1, 55 / 2.0 → 1)；"x.0" 看不出精度，由 ladder_unit 取整个阶梯的"""
+    text = repr(round(x, 6))
+    if "e" in text or "." not in text or text.endswith(".0"):
+        return 1.0
+    return 10.0 ** -len(text.split(".")[1])
+
+
+def ladder_unit(values: Iterable[float]) -> float:
+    """
+    整个阶梯共用的刻度：所有有限边界里最细的小数精度
+
+    "1.0-1.4" 单看 1.0 是整数，和 1.4 同在一个阶梯时刻度是 0.1；全是整数的阶梯刻度为 1
+    """
+    return min((_unit(x) for x in values if x not in (INF, -INF)), default=1.0)
+
+
+def _fee(cost_cents: float) -> float:
+    """一腿获胜时的手续费 ($)"""
+    return max(0.0, 100 - cost_cents) * KALSHI_FEE_RATE / 100
+
+
+class LadderResult:
+    """
+    单个事件的列式 parity 结果
+
+    列 (按区间排序后的顺序)：order / lo / hi / yes_ask / no_ask / single_net
+    汇总：kind, exhaustive, yes_ladder, no_ladder, threshold_pair
+    """
+
+    __slots__ = ("kind", "exhaustive", "order", "lo", "hi", "yes_ask", "no_ask",
+                 "single_net", "yes_ladder", "no_ladder", "threshold_pair")
+
+    def __init__(self):
+        self.kind = KIND_UNKNOWN
+        self.exhaustive = False
+        self.order: List[int] = []
+        self.lo = array("d")
+        self.hi = array("d")
+        self.yes_ask = array("i")
+        self.no_ask = array("i")
+        self.single_net = array("d")
+        self.yes_ladder: Optional[Dict] = None
+        self.no_ladder: Optional[Dict] = None
+        self.threshold_pair: Optional[Dict] = None
+
+    def __len__(self):
+        return len(self.order)
+
+
+def evaluate_ladder(markets: List[Dict]) -> LadderResult:
+    """
+    对一个事件的所有市场做一次排序 + 线性扫描
+
+    单市场 parity 对每个市场都会计算 (single_net > 0 即有利可图)；
+    阶梯类检查只在区间能解析时进行。
+    """
+    res = LadderResult()
+    n = len(markets)
+
+    yes = [m.get("yes_ask", 0) or 0 for m in markets]
+    no = [m.get("no_ask", 0) or 0 for m in markets]
+    bounds = [parse_bracket(m) for m in markets]
+
+    if n and all(b is not None for b in bounds):
+        order = sorted(range(n), key=lambda i: (bounds[i][0], bounds[i][1]))
+        kinds = {("above" if hi == INF and lo != -INF else
+                  "below" if lo == -INF and hi != INF else "between")
+                 for lo, hi in bounds}
+        if kinds == {"above"}:
+            res.kind = KIND_ABOVE
+        elif kinds == {"below"}:
+            res.kind = KIND_BELOW
+            order = sorted(range(n), key=lambda i: bounds[i][1])
+        else:
+            res.kind = KIND_BUCKET
+    else:
+        order = list(range(n))
+
+    res.order = order
+    for i in order:
+        y, nn = yes[i], no[i]
+        if bounds[i] is not None:
+            res.lo.append(bounds[i][0])
+            res.hi.append(bounds[i][1])
+        res.yes_ask.append(y)
+        res.no_ask.append(nn)
+        if y > 0 and nn > 0:
+            res.single_net.append(1.0 - (y + nn) / 100.0 - max(_fee(y), _fee(nn)))
+        else:
+            res.single_net.append(0.0)
+
+    if res.kind == KIND_BUCKET:
+        _evaluate_buckets(res)
+    elif res.kind in (KIND_ABOVE, KIND_BELOW):
+        _evaluate_thresholds(res)
+    return res
+
+
+def _evaluate_buckets(res: LadderResult):
+    """互斥区间：检查完备性，再算 YES 阶梯和 NO 阶梯"""
+    n = len(res)
+    lo, hi = res.lo, res.hi
+    exhaustive = n >= 2 and lo[0] == -INF and hi[n - 1] == INF
+    u = ladder_unit(list(lo) + list(hi))
+    for k in range(n - 1):
+        if not exhaustive:
+            break
+        gap = lo[k + 1] - hi[k]
+        # 相接：边界相同 (strike 字段的 "< X" / "X-Y") 或正好差一个刻度 ("2.0-2.4" / "2.5-2.9")；
+        # 其他间隔说明中间缺档，重叠则不互斥
+        if abs(gap) > TICK_EPS * u and abs(gap - u) > TICK_EPS * u:
+            exhaustive = False
+    res.exhaustive = exhaustive
+    if not exhaustive:
+        return
+
+    yes, no = res.yes_ask, res.no_ask
+    if all(y > 0 for y in yes):
+        total = sum(yes)
+        # 只有一档会赢；最坏情况是最便宜的一档赢 (利润最大 → 手续费最高)
+        max_fee = _fee(min(yes))
+        res.yes_ladder = {
+            "cost_cents": total,
+            "net_profit": 1.0 - total / 100.0 - max_fee,
+            "max_fee": max_fee,
+        }
+    if all(x > 0 for x in no):
+        total = sum(no)
+        fees = [_fee(x) for x in no]
+        # n-1 档 NO 获胜；最坏情况是手续费最低的那一档输掉
+        max_fee = sum(fees) - min(fees)
+        res.no_ladder = {
+            "cost_cents": total,
+            "payout": n - 1,
+            "net_profit": (n - 1) - total / 100.0 - max_fee,
+            "max_fee": max_fee,
+        }
+
+
+def _evaluate_thresholds(res: LadderResult):
+    """
+    单边阈值阶梯：价格应随阈值单调
+
+    above: 买 YES(低阈值 a) + NO(高阈值 b)，a < b 时至少一腿获胜
+    below: 买 NO(低阈值 a) + YES(高阈值 b)，同理
+    对每个 b 只需前面最便宜的第一腿 (成本 + 最坏手续费随第一腿价格单调)，
+    所以前缀最小值一遍扫描即可找到最优组合。
+    """
+    first = res.yes_ask if res.kind == KIND_ABOVE else res.no_ask
+    second = res.no_ask if res.kind == KIND_ABOVE else res.yes_ask
+    best = None
+    best_first = -1  # 前缀中第一腿最便宜的位置
+    for j in range(len(res)):
+        if best_first >= 0 and second[j] > 0:
+            a, b = first[best_first], second[j]
+            net = 1.0 - (a + b) / 100.0 - max(_fee(a), _fee(b))
+            if best is None or net > best["net_profit"]:
+                best = {"first": best_first, "second": j, "cost_cents": a + b,
+                        "net_profit": net, "max_fee": max(_fee(a), _fee(b))}
+        if first[j] > 0 and (best_first < 0 or first[j] < first[best_first]):
+            best_first = j
+    res.threshold_pair = best
+
+
+# ============================================================
+# Benchmark
+# ============================================================
+
+def synthetic_ladder(n: int, kind: str = KIND_BUCKET, seed: int = 0) -> List[Dict]:
+    """合成 n 档阶梯 (价格带噪声，偶尔出现可套利的偏差)"""
+    rng = random.Random(seed)
+    markets = []
+    for i in range(n):
+        p = max(1, min(99, int(100 / n) + rng.randint(-2, 2)))
+        if kind == KIND_BUCKET:
+            if i == 0:
+                sub = f"{0.4:.1f}% or below"
+            elif i == n - 1:
+                sub = f"{i * 0.5:.1f}% or above"
+            else:
+                sub = f"{i * 0.5:.1f}% to {i * 0.5 + 0.4:.1f}%"
+        else:
+            p = max(1, min(99, 99 - int(98 * i / max(1, n - 1)) + rng.randint(-3, 3)))
+            sub = f"Above {i * 0.5:.1f}%"
+        markets.append({
+            "ticker": f"KXSYN-26JAN01-B{i}",
+            "title": f"Synthetic bracket {i:04d}",
+            "yes_sub_title": sub,
+            "yes_ask": p,
+            "no_ask": max(1, min(99, 100 - p + rng.randint(-1, 3))),
+            "volume_24h": rng.randint(0, 5000),
+        })
+    rng.shuffle(markets)
+    return markets
+
+
+def _bucket(sub: str, yes: int = 20, no: int = 80) -> Dict:
+    return {"ticker": f"KXCHK-{sub}", "yes_sub_title": sub, "yes_ask": yes, "no_ask": no}
+
+
+def check_exhaustive() -> bool:
+    """完备性回归用例：(名称, 阶梯, 期望 exhaustive)"""
+    cases = [
+        ("完整 0.5 档", ["0.9% or below", "1.0% to 1.4%", "1.5% to 1.9%", "2.0% or above"], True),
+        ("缺中间档 1.5-1.9", ["0.9% or below", "1.0% to 1.4%", "2.0% to 2.4%", "2.5% or above"], False),
+        ("整数档", ["54° or below", "55° to 56°", "57° to 58°", "59° or above"], True),
+        ("整数档缺 57-58", ["54° or below", "55° to 56°", "59° to 60°", "61° or above"], False),
+        ("strike 边界相同", [{"strike_type": "less", "cap_strike": 1.0},
+                           {"strike_type": "between", "floor_strike": 1.0, "cap_strike": 2.0},
+                           {"strike_type": "greater", "floor_strike": 2.0}], True),
+        ("重叠", ["1.0% or below", "0.5% to 1.4%", "1.5% or above"], False),
+    ]
+    ok = True
+    for name, ladder, expected in cases:
+        markets = [_bucket(m) if isinstance(m, str) else dict(m, ticker=f"KXCHK-{i}", yes_ask=20, no_ask=80)
+                   for i, m in enumerate(ladder)]
+        res = evaluate_ladder(markets)
+        good = res.exhaustive == expected and (res.yes_ladder is not None) == expected
+        ok = ok and good
+        print(f"{'✅' if good else '❌'} {name}: exhaustive={res.exhaustive}", file=sys.stderr)
+    return ok
+
+
+def _legacy_pairs(markets: List[Dict]) -> int:
+    """旧 check_adjacent_bracket_parity 的配对循环 (只计数单市场检查次数)"""
+    sorted_markets = sorted(markets, key=lambda m: m.get("title", ""))
+    checks = 0
+    for i in range(len(sorted_markets)):
+        for j in range(i + 1, len(sorted_markets)):
+            for m in (sorted_markets[i], sorted_markets[j]):
+                y, n = m.get("yes_ask", 0) or 0, m.get("no_ask", 0) or 0
+                if y > 0 and n > 0:
+                    _ = 1.0 - (y + n) / 100.0 - max(_fee(y), _fee(n))
+                checks += 1
+    return checks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="阶梯 parity 引擎 benchmark")
+    parser.add_argument("--bench", type=int, default=40, help="每个事件的档数")
+    parser.add_argument("--events", type=int, default=50, help="合成事件数量")
+    parser.add_argument("--kind", choices=(KIND_BUCKET, KIND_ABOVE), default=KIND_BUCKET)
+    parser.add_argument("--skip-legacy", action="store_true", help="不跑旧 O(n²) 循环")
+    parser.add_argument("--check", action="store_true", help="完备性回归用例")
+    args = parser.parse_args()
+
+    if args.check:
+        sys.exit(0 if check_exhaustive() else 1)
+
+    events = [synthetic_ladder(args.bench, args.kind, seed=s) for s in range(args.events)]
+
+    t0 = time.time()
+    results = [evaluate_ladder(ev) for ev in events]
+    t_new = time.time() - t0
+
+    found = sum(
+        sum(1 for x in r.single_net if x > 0)
+        + bool(r.yes_ladder and r.yes_ladder["net_profit"] > 0)
+        + bool(r.no_ladder and r.no_ladder["net_profit"] > 0)
+        + bool(r.threshold_pair and r.threshold_pair["net_profit"] > 0)
+        for r in results
+    )
+    exhaustive = sum(r.exhaustive for r in results)
+    print(f"⚡ 引擎: {args.events} 事件 × {args.bench} 档 | {t_new * 1000:.1f}ms | "
+          f"完备阶梯 {exhaustive} | 机会 {found}", file=sys.stderr)
+
+    if not args.skip_legacy:
+        t0 = time.time()
+        checks = sum(_legacy_pairs(ev) for ev in events)
+        t_old = time.time() - t0
+        print(f"🐢 旧配对循环: {checks} 次单市场检查 | {t_old * 1000:.1f}ms | "
+              f"加速 {t_old / max(t_new, 1e-9):.1f}x", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
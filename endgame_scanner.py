@@ -10,22 +10,34 @@ endgame_scanner - Kalshi 临期策略扫描
 用法：
     python endgame_scanner.py              # 扫描临期机会
     python endgame_scanner.py --days 3     # 3天内到期
+    python endgame_scanner.py --columnar   # 额外导出列式快照 (--no-json 跳过 JSON)
+    python endgame_scanner.py --deadline 10  # 补充信息 (决策引擎/新闻) 最多等 10 秒
     
 依赖：
     - requests
+    - host_limiter.py (按主机限速)
+    - news_cache.py (新闻查询缓存)
 """
 
 import json
 import os
+import re
 import sys
 import time
+import calendar
 import requests
-from datetime import datetime, timezone, timedelta
+from array import array
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timezone
 
 # ── Kalshi API (same pattern as report_v2.py) ──
 
 API_BASE = "https://api.elections.kalshi.com/trade-api/v2"
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from host_limiter import throttle
+from news_cache import prefetch_news, cached_news, flush_news_cache
+
 # Import validated functions from the project registry
 try:
     sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -38,10 +50,12 @@ except ImportError:
     HAVE_REPORT_V2 = False
     def api_get(endpoint, params=None):
         try:
-            resp = requests.get(f"{API_BASE}{endpoint}", params=params, timeout=15)
+            with throttle(API_BASE):
+                resp = requests.get(f"{API_BASE}{endpoint}", params=params, timeout=15)
             if resp.status_code == 429:
                 time.sleep(3)
-                resp = requests.get(f"{API_BASE}{endpoint}", params=params, timeout=15)
+                with throttle(API_BASE):
+                    resp = requests.get(f"{API_BASE}{endpoint}", params=params, timeout=15)
             resp.raise_for_status()
             return resp.json()
         except Exception:
@@ -55,21 +69,14 @@ except ImportError:
         elif v >= 1_000: return f"{v/1_000:.0f}K"
         return str(v)
 
-    def search_news(query, max_results=5):
-        import re
-        from urllib.parse import quote
-        results = []
-        try:
-            url = f"https://news.google.com/rss/search?q={quote(query)}&hl=en-US&gl=US&ceid=US:en"
-            r = requests.get(url, timeout=10)
-            titles = re.findall(r'<title>(.*?)</title>', r.text)
-            dates = re.findall(r'<pubDate>(.*?)</pubDate>', r.text)
-            for i, title in enumerate(titles[1:max_results + 1]):
-                results.append({"title": title, "date": dates[i] if i < len(dates) else ""})
-        except Exception:
-            pass
-        return results
+    from news_cache import search_news
+
 
+# Enrichment stage (top-N by annualized yield, one shared deadline)
+DECISION_TOP_N = 20
+NEWS_TOP_N = 10
+ENRICH_WORKERS = 8
+ENRICH_DEADLINE_SECONDS = 20
 
 # Skip categories that are unpredictable
 SKIP_CATEGORIES = {"Sports", "Entertainment"}
@@ -100,42 +107,68 @@ KNOWN_RELEASES = {
 }
 
 
+def close_epochs(close_strs):
+    """
+    ISO close_time 列 → epoch 秒 (array 'q'，无法解析为 0)
+
+    同一页里大量市场共用同一个 close_time (整点/同一事件)，只解析去重后的值；
+    Kalshi 固定格式 YYYY-MM-DDTHH:MM:SSZ 走切片 + timegm，其余回退 fromisoformat。
+    """
+    parsed = {}
+    for s in set(close_strs):
+        if not s:
+            parsed[s] = 0
+            continue
+        try:
+            if len(s) == 20 and s[-1] == "Z":
+                parsed[s] = calendar.timegm((int(s[0:4]), int(s[5:7]), int(s[8:10]),
+                                             int(s[11:13]), int(s[14:16]), int(s[17:19])))
+            else:
+                parsed[s] = int(datetime.fromisoformat(s.replace("Z", "+00:00")).timestamp())
+        except (ValueError, TypeError):
+            parsed[s] = 0
+    return array("q", [parsed[s] for s in close_strs])
+
+
 def fetch_settling_soon_markets(max_days=7):
-    """Fetch ALL open markets settling within max_days."""
-    now = datetime.now(timezone.utc)
-    cutoff = now + timedelta(days=max_days)
+    """
+    Fetch open markets settling within max_days.
+
+    The close-time window is applied server-side (min_close_ts / max_close_ts),
+    so only the markets in the window are paginated instead of the whole open
+    universe. The local epoch check stays as a guard.
+    """
+    now_ts = int(time.time())
+    cutoff_ts = now_ts + int(max_days * 86400)
     
     all_markets = []
     cursor = None
+    fetched = 0
     
     while True:
-        params = {"limit": 200, "status": "open"}
+        params = {"limit": 200, "status": "open",
+                  "min_close_ts": now_ts, "max_close_ts": cutoff_ts}
         if cursor:
             params["cursor"] = cursor
         data = api_get("/markets", params)
         if not data:
             break
         
-        for m in data.get("markets", []):
-            close_str = m.get("close_time", "")
-            if not close_str:
-                continue
-            try:
-                close = datetime.fromisoformat(close_str.replace("Z", "+00:00"))
-            except (ValueError, TypeError):
-                continue
-            
-            days = (close - now).total_seconds() / 86400
-            if 0 < days <= max_days:
-                m["_days_to_settle"] = round(days, 1)
-                m["_close_dt"] = close
+        page = data.get("markets", [])
+        fetched += len(page)
+        epochs = close_epochs([m.get("close_time", "") or "" for m in page])
+        for m, ts in zip(page, epochs):
+            if now_ts < ts <= cutoff_ts:
+                m["_days_to_settle"] = round((ts - now_ts) / 86400, 1)
+                m["_close_ts"] = ts
                 all_markets.append(m)
         
         cursor = data.get("cursor", "")
-        if not cursor or len(data.get("markets", [])) < 200:
+        if not cursor or len(page) < 200:
             break
         time.sleep(0.15)
     
+    print(f"   ({fetched} rows fetched for the {max_days}-day window)", file=sys.stderr)
     return all_markets
 
 
@@ -318,49 +351,102 @@ def find_endgame_opportunities(markets, min_probability=95, max_price=95):
     return opportunities
 
 
+def _decision_task(ticker):
+    detailed = fetch_market_details(ticker)
+    return score_market(detailed) if detailed else None
+
+
+def _news_query(title):
+    clean = re.sub(r'[^\w\s]', ' ', title)
+    terms = [t for t in clean.split() if len(t) > 2][:4]
+    return " ".join(terms)
+
+
+def _news_batch(queries):
+    prefetch_news(queries)
+    return [search_news(q, 3) for q in queries]
+
+
+def _apply_decision(opp, result):
+    if result:
+        opp["decision_score"] = result.get("score", 0)
+        opp["decision"] = result.get("decision", "N/A")
+        opp["decision_reasons"] = result.get("reasons", [])
+
+
+def _apply_news(opp, news):
+    if news:
+        opp["news"] = [n.get("title", "") for n in news]
+        opp["news_count"] = len(news)
+
+
+def enrich_opportunities(opportunities, decision_top=DECISION_TOP_N, news_top=NEWS_TOP_N,
+                         deadline=ENRICH_DEADLINE_SECONDS, stats=None):
+    """
+    Concurrent enrichment: detail fetch + score_market (which itself does the
+    news / Polymarket cross-check) and the headline news lookup all run in one
+    thread pool. Per-host pacing comes from host_limiter, replacing the fixed
+    sleeps. Whatever finishes before `deadline` seconds is applied; the rest is
+    recorded in opp["enrich_missing"] instead of holding up the report.
+    """
+    tasks = {}
+    pool = ThreadPoolExecutor(max_workers=ENRICH_WORKERS)
+    if HAVE_REPORT_V2:
+        for opp in opportunities[:decision_top]:
+            tasks[pool.submit(_decision_task, opp["ticker"])] = (opp, "decision")
+    news_opps = [(opp, _news_query(opp.get("title", ""))) for opp in opportunities[:news_top]]
+    news_opps = [(opp, q) for opp, q in news_opps if q]
+    if news_opps:
+        # 一个批量任务：预取 (归一化后去重)，之后逐个 search_news 都是缓存命中
+        tasks[pool.submit(_news_batch, [q for _, q in news_opps])] = (news_opps, "news")
+    
+    done, pending = wait(tasks, timeout=deadline)
+    for fut in done:
+        target, kind = tasks[fut]
+        try:
+            result = fut.result()
+        except Exception:
+            result = None
+        if kind == "decision":
+            _apply_decision(target, result)
+        else:
+            for (opp, _q), news in zip(target, result or []):
+                _apply_news(opp, news)
+    for fut in pending:
+        target, kind = tasks[fut]
+        if kind == "decision":
+            target.setdefault("enrich_missing", []).append(kind)
+            continue
+        # 批量新闻没跑完：已进缓存的查询照样用上
+        for opp, q in target:
+            news = cached_news(q, 3)
+            if news is None:
+                opp.setdefault("enrich_missing", []).append(kind)
+            else:
+                _apply_news(opp, news)
+    # 超时的任务不再等待 (已在途的 HTTP 请求由各自的 timeout 结束)
+    pool.shutdown(wait=False, cancel_futures=True)
+    
+    if stats is not None:
+        stats["enrich_tasks"] = len(tasks)
+        stats["enrich_timed_out"] = len(pending)
+    if pending:
+        print(f"   ⏱️ {len(pending)}/{len(tasks)} enrichment tasks missed the "
+              f"{deadline:.0f}s deadline", file=sys.stderr)
+    return opportunities
+
+
 def enrich_with_decision_engine(opportunities):
     """
     Cross-reference opportunities with the validated decision engine (score_market).
     Only runs if report_v2 is importable.
     """
-    if not HAVE_REPORT_V2:
-        return opportunities
-    
-    enriched = []
-    for opp in opportunities[:20]:  # Limit API calls
-        ticker = opp["ticker"]
-        detailed = fetch_market_details(ticker)
-        if detailed:
-            # Run through the validated scoring engine
-            result = score_market(detailed)
-            if result:
-                opp["decision_score"] = result.get("score", 0)
-                opp["decision"] = result.get("decision", "N/A")
-                opp["decision_reasons"] = result.get("reasons", [])
-        enriched.append(opp)
-        time.sleep(0.2)  # Rate limit
-    
-    return enriched
+    return enrich_opportunities(opportunities, news_top=0)
 
 
 def enrich_with_news(opportunities):
     """Cross-reference top opportunities with news data."""
-    for opp in opportunities[:10]:  # Only top 10
-        title = opp.get("title", "")
-        # Extract key search terms
-        import re
-        clean = re.sub(r'[^\w\s]', ' ', title)
-        terms = [t for t in clean.split() if len(t) > 2][:4]
-        query = " ".join(terms)
-        
-        if query:
-            news = search_news(query, max_results=3)
-            if news:
-                opp["news"] = [n.get("title", "") for n in news]
-                opp["news_count"] = len(news)
-            time.sleep(0.3)  # Rate limit news API
-    
-    return opportunities
+    return enrich_opportunities(opportunities, decision_top=0)
 
 
 def format_report(opportunities, stats):
@@ -420,6 +506,9 @@ def format_report(opportunities, stats):
             if opp.get("decision_reasons"):
                 lines.append(f"     🧠 Decision: {' | '.join(opp['decision_reasons'][:3])}")
             
+            if opp.get("enrich_missing"):
+                lines.append(f"     ⏱️ Not enriched in time: {', '.join(opp['enrich_missing'])}")
+            
             lines.append(f"     🔗 {opp['url']}")
     
     lines.append("\n" + "=" * 65)
@@ -430,8 +519,8 @@ def format_report(opportunities, stats):
     return "\n".join(lines)
 
 
-def save_results(opportunities, stats, path=None):
-    """Save results to JSON."""
+def save_results(opportunities, stats, path=None, columnar=False, write_json=True):
+    """Save results to JSON and/or a columnar snapshot (data/snapshots/endgame)."""
     if path is None:
         path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
                             "endgame-scan-results.json")
@@ -442,15 +531,25 @@ def save_results(opportunities, stats, path=None):
         "opportunities": opportunities,
     }
     
-    with open(path, "w") as f:
-        json.dump(output, f, indent=2, default=str)
+    if write_json:
+        with open(path, "w") as f:
+            json.dump(output, f, indent=2, default=str)
+        print(f"\n💾 Results saved to {path}")
     
-    print(f"\n💾 Results saved to {path}")
+    if columnar:
+        from snapshot_columns import write_snapshot
+        snap_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "data", "snapshots", "endgame")
+        write_snapshot(opportunities, snap_dir, source="endgame_scanner")
+        print(f"💾 Columnar snapshot saved to {snap_dir}")
 
 
 def main():
     max_days = 7
     min_prob = 95
+    deadline = ENRICH_DEADLINE_SECONDS
+    columnar = False
+    write_json = True
     
     args = sys.argv[1:]
     i = 0
@@ -461,6 +560,15 @@ def main():
         elif args[i] == "--min-prob" and i + 1 < len(args):
             min_prob = int(args[i + 1])
             i += 2
+        elif args[i] == "--deadline" and i + 1 < len(args):
+            deadline = float(args[i + 1])
+            i += 2
+        elif args[i] == "--columnar":
+            columnar = True
+            i += 1
+        elif args[i] == "--no-json":
+            write_json = False
+            i += 1
         else:
             i += 1
     
@@ -482,21 +590,21 @@ def main():
     opportunities = find_endgame_opportunities(markets, min_probability=min_prob)
     print(f"   Found {len(opportunities)} opportunities\n")
     
-    # Step 3: Enrich with decision engine (if available)
-    if HAVE_REPORT_V2 and opportunities:
-        print("🧠 Running decision engine on top opportunities...")
-        opportunities = enrich_with_decision_engine(opportunities)
-    
-    # Step 4: Enrich with news
+    # Step 3: Enrich with decision engine (if available) + news, concurrently
     if opportunities:
-        print("📰 Checking news for top opportunities...")
-        opportunities = enrich_with_news(opportunities)
+        print("🧠 Enriching top opportunities (decision engine + news)...")
+        opportunities = enrich_opportunities(opportunities, deadline=deadline, stats=stats)
+    
+    if HAVE_REPORT_V2:
+        from market_cache import log_dedup_stats
+        log_dedup_stats("endgame")
+    flush_news_cache("endgame")
     
-    # Step 5: Report
+    # Step 4: Report
     report = format_report(opportunities, stats)
     print(report)
     
-    save_results(opportunities, stats)
+    save_results(opportunities, stats, columnar=columnar, write_json=write_json)
     
     return opportunities, stats
 
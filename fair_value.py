@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+fair_value - 整个阶梯一次算出公平价 (nowcast 正态分布 → 每档 P(yes) / 公平价 / edge)
+
+功能：
+    - 输入 nowcast 分布 (mean, sigma, bias) + 一个 series 的全部阈值 / 区间市场
+    - 所有档位的边界去重排序后只算一次正态 CDF，区间概率 = 相邻边界 CDF 之差
+      (阈值档与 generate_report.calculate_signal 完全一致；区间档按刻度做连续性修正，
+      互斥完备的阶梯概率和为 1)
+    - 列式输出：p_yes / fair_yes / fair_no / z / 买 YES、买 NO 的净 edge (对 ask，扣交易成本)
+    - sigma <= 0 (没有不确定性) 退化为点分布：P(yes) 只取 0 / 1 (正好落在阈值上取 0.5)
+    - --check 与标量函数 (calculate_signal / calculate_edge / estimate_win_prob) 逐档对比
+
+用法：
+    from fair_value import price_ladder
+    fv = price_ladder(event_markets, mean=3.1, sigma=1.0, bias=0.3)
+    fv.p_yes[i], fv.edge_yes[i], fv.best()        # 列顺序与输入一致
+
+    dist = NowcastFetcher().distribution("KXGDP")   # {"mean", "sigma", "bias", "source", "age_seconds", ...}
+    fv = price_ladder(event_markets, **{k: dist[k] for k in ("mean", "sigma", "bias")})
+
+    python fair_value.py --check              # 与标量函数的一致性检查
+    python fair_value.py --bench 200 --events 500
+
+依赖：
+    - bracket_parity.py (区间解析)
+    - win_prob.py (--check 对比 estimate_win_prob)
+"""
+
+import os
+import sys
+import math
+import time
+import random
+import argparse
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bracket_parity import parse_bracket, ladder_unit, INF
+
+DEFAULT_TX_COST = 5   # cents，与 generate_report.MARKET_PARAMS 一致
+
+# |z| 分级 (与 generate_report.calculate_signal 相同)
+SIGNAL_LEVELS = ((0.5, "NO_SIGNAL"), (1.0, "WEAK"), (2.0, "MODERATE"), (INF, "STRONG"))
+
+
+def signal_label(z: float) -> str:
+    if math.isnan(z):
+        return ""
+    abs_z = abs(z)
+    for bound, label in SIGNAL_LEVELS:
+        if abs_z < bound:
+            return label
+    return "STRONG"
+
+
+class FairLadder:
+    """
+    一个阶梯的列式公平价 (顺序与输入市场一致)
+
+    p_yes / fair_yes / fair_no / z / edge_yes / edge_no
+    z 只对单边阈值档有意义 (区间档为 nan)；edge 为净值 (cents)，没有报价的一侧为 nan
+    """
+
+    __slots__ = ("tickers", "lo", "hi", "p_yes", "fair_yes", "fair_no", "z",
+                 "edge_yes", "edge_no", "unparsed")
+
+    def __init__(self):
+        self.tickers: List[str] = []
+        self.lo = array("d")
+        self.hi = array("d")
+        self.p_yes = array("d")
+        self.fair_yes = array("i")
+        self.fair_no = array("i")
+        self.z = array("d")
+        self.edge_yes = array("d")
+        self.edge_no = array("d")
+        self.unparsed: List[int] = []   # 解析不出区间的市场 (各列填 nan / 0)
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def signal(self, i: int) -> str:
+        return signal_label(self.z[i])
+
+    def best(self) -> Optional[Tuple[int, str, float]]:
+        """净 edge 最大的 (市场下标, 'YES'/'NO', edge)；没有正 edge 返回 None"""
+        best = None
+        for i in range(len(self)):
+            for side, edge in (("YES", self.edge_yes[i]), ("NO", self.edge_no[i])):
+                if edge > 0 and (best is None or edge > best[2]):
+                    best = (i, side, edge)
+        return best
+
+    def rows(self) -> List[Dict]:
+        return [{
+            "ticker": self.tickers[i],
+            "p_yes": self.p_yes[i],
+            "fair_yes": self.fair_yes[i],
+            "fair_no": self.fair_no[i],
+            "z_score": self.z[i],
+            "signal": self.signal(i),
+            "edge_yes": self.edge_yes[i],
+            "edge_no": self.edge_no[i],
+        } for i in range(len(self))]
+
+
+def _z(diff: float, sigma: float) -> float:
+    """diff / sigma；sigma <= 0 时退化为 ±inf (diff 为 0 时取 0，对应 P = 0.5)"""
+    if sigma > 0:
+        return diff / sigma
+    return math.copysign(INF, diff) if diff else 0.0
+
+
+def _asks(market: Dict) -> Tuple[int, int]:
+    """(yes_ask, no_ask)；缺 ask 时用对侧 bid 推出"""
+    yes_ask = market.get("yes_ask") or 0
+    no_ask = market.get("no_ask") or 0
+    if not no_ask and market.get("yes_bid"):
+        no_ask = 100 - market["yes_bid"]
+    if not yes_ask and market.get("no_bid"):
+        yes_ask = 100 - market["no_bid"]
+    return yes_ask, no_ask
+
+
+def price_ladder(markets: List[Dict], mean: float, sigma: float, bias: float = 0.0,
+                 tx_cost: float = DEFAULT_TX_COST) -> FairLadder:
+    """
+    一次计算整个阶梯
+
+    阈值 "above X": P(yes) = Φ((mean - bias - X) / sigma)
+    阈值 "below X": P(yes) = 1 - Φ((mean - bias - X) / sigma)
+    区间 [lo, hi] (刻度 u): P(yes) = S(lo - u/2) - S(hi + u/2)，S(x) = Φ((mean - bias - x) / sigma)
+    含区间档的阶梯里，两端的开放档 "≤ X" / "≥ X" 也按区间处理 (X ± u/2)
+    sigma <= 0 时 z = ±inf，P(yes) 为 0 / 1 的点分布
+    """
+    res = FairLadder()
+    adjusted = mean - bias
+    nan = float("nan")
+
+    # 1) 解析所有档位，收集需要的边界 (去重)
+    bounds = [parse_bracket(m) for m in markets]
+    # 含区间档的阶梯 (bracket_parity 的 bucket 类)：两端开放档也按刻度修正，保证概率和为 1
+    bucket_mode = any(b is not None and b[0] != -INF and b[1] != INF for b in bounds)
+    if bucket_mode:
+        # 整个阶梯共用最小刻度 ("1.0" 单独看是整数，和 "1.1-1.5" 同在一个阶梯时刻度是 0.1)
+        u = ladder_unit(x for b in bounds if b is not None for x in b)
+    specs = []           # (kind, a, b)  kind: above / below / between / None
+    edges = set()
+    for b in bounds:
+        if b is None:
+            specs.append((None, nan, nan))
+            continue
+        lo, hi = b
+        if bucket_mode:
+            a = round(lo - u / 2, 9) if lo != -INF else -INF
+            c = round(hi + u / 2, 9) if hi != INF else INF
+            specs.append(("between", a, c))
+            edges.update(x for x in (a, c) if x not in (INF, -INF))
+        elif hi == INF and lo != -INF:
+            specs.append(("above", lo, INF))
+            edges.add(lo)
+        elif lo == -INF and hi != INF:
+            specs.append(("below", hi, INF))
+            edges.add(hi)
+        else:
+            specs.append(("between", -INF, INF))
+
+    # 2) 每个边界只算一次生存函数 S(x) = P(value > x)
+    ordered = sorted(edges)
+    z_at = array("d", (_z(adjusted - x, sigma) for x in ordered))
+    surv = {x: 0.5 * (1 + math.erf(z / math.sqrt(2))) for x, z in zip(ordered, z_at)}
+    surv[-INF], surv[INF] = 1.0, 0.0
+
+    # 3) 整列组装 (列表推导 + array 一次构造，不逐元素 append)
+    p_yes = [nan if k is None else surv[a] if k == "above" else 1.0 - surv[a] if k == "below"
+             else max(0.0, surv[a] - surv[c]) for k, a, c in specs]
+    z = [_z(adjusted - a, sigma) if k == "above" else _z(a - adjusted, sigma) if k == "below" else nan
+         for k, a, c in specs]
+    fair_yes = [int(p * 100) if p == p else 0 for p in p_yes]
+    fair_no = [100 - f if p == p else 0 for f, p in zip(fair_yes, p_yes)]
+    asks = [_asks(m) for m in markets]
+
+    res.tickers = [m.get("ticker", "") for m in markets]
+    res.lo = array("d", (b[0] if b else nan for b in bounds))
+    res.hi = array("d", (b[1] if b else nan for b in bounds))
+    res.p_yes = array("d", p_yes)
+    res.z = array("d", z)
+    res.fair_yes = array("i", fair_yes)
+    res.fair_no = array("i", fair_no)
+    res.edge_yes = array("d", [f - ya - tx_cost if ya and p == p else nan
+                               for f, (ya, _), p in zip(fair_yes, asks, p_yes)])
+    res.edge_no = array("d", [f - na - tx_cost if na and p == p else nan
+                              for f, (_, na), p in zip(fair_no, asks, p_yes)])
+    res.unparsed = [i for i, (k, _, _) in enumerate(specs) if k is None]
+    return res
+
+
+# ============================================================
+# 与标量函数对比 / benchmark
+# ============================================================
+
+def _threshold_markets(thresholds: List[float], rng: random.Random) -> List[Dict]:
+    markets = []
+    for t in thresholds:
+        yes = rng.randint(1, 99)
+        markets.append({"ticker": f"KXGDP-26Q3-T{t}", "strike_type": "greater", "floor_strike": t,
+                        "yes_ask": yes, "no_ask": 100 - yes})
+    return markets
+
+
+def check_parity(n: int = 400, seed: int = 0) -> bool:
+    """阈值档逐一对比 backup/generate_report 与 win_prob 的标量实现；区间阶梯检查概率和"""
+    rng = random.Random(seed)
+    ok = True
+    try:
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backup"))
+        from generate_report import calculate_signal, calculate_edge, MARKET_PARAMS
+    except ImportError as e:
+        print(f"⚠️ 无法导入 generate_report ({e})，跳过 calculate_signal 对比", file=sys.stderr)
+    else:
+        mismatches = 0
+        for kind, params in MARKET_PARAMS.items():
+            mean = rng.uniform(-1, 5)
+            thresholds = [round(rng.uniform(-2, 6), 1) for _ in range(n)]
+            markets = _threshold_markets(thresholds, rng)
+            fv = price_ladder(markets, mean, params["sigma"], params["bias"], params["tx_cost"])
+            for i, (t, m) in enumerate(zip(thresholds, markets)):
+                sig = calculate_signal(mean, t, params["sigma"], params["bias"])
+                e_yes = calculate_edge(sig, m["yes_ask"], "YES", params["tx_cost"])
+                e_no = calculate_edge(sig, m["yes_ask"], "NO", params["tx_cost"])
+                if (sig["p_yes"] != fv.p_yes[i] or sig["fair_yes"] != fv.fair_yes[i]
+                        or sig["signal"] != fv.signal(i) or e_yes["net_edge"] != fv.edge_yes[i]
+                        or e_no["net_edge"] != fv.edge_no[i]):
+                    mismatches += 1
+        print(f"{'✅' if not mismatches else '❌'} calculate_signal/calculate_edge: "
+              f"{n * len(MARKET_PARAMS)} 档, 不一致 {mismatches}", file=sys.stderr)
+        ok = ok and not mismatches
+
+    from win_prob import estimate_win_prob, GDP_NOW, GDP_SIGMA, GDP_PROB_MIN, GDP_PROB_MAX
+    thresholds = [round(rng.uniform(-2, 6), 1) for _ in range(n)]
+    fv = price_ladder(_threshold_markets(thresholds, rng), GDP_NOW, GDP_SIGMA)
+    mismatches = sum(1 for i, t in enumerate(thresholds)
+                     if estimate_win_prob(f"KXGDP-26Q3-T{t}", 0) != min(max(fv.p_yes[i], GDP_PROB_MIN), GDP_PROB_MAX))
+    print(f"{'✅' if not mismatches else '❌'} estimate_win_prob (GDP): {n} 档, 不一致 {mismatches}",
+          file=sys.stderr)
+    ok = ok and not mismatches
+
+    # 互斥完备区间的概率和应为 1
+    buckets = [{"ticker": "B0", "strike_type": "less", "cap_strike": 1.0}]
+    buckets += [{"ticker": f"B{k}", "strike_type": "between", "floor_strike": round(1.0 + k * 0.5 - 0.4, 1),
+                 "cap_strike": round(1.0 + k * 0.5, 1)} for k in range(1, 8)]
+    buckets += [{"ticker": "B8", "strike_type": "greater", "floor_strike": 4.6}]
+    total = sum(price_ladder(buckets, 2.7, 0.8).p_yes)
+    print(f"{'✅' if abs(total - 1) < 1e-9 else '❌'} 区间阶梯概率和: {total:.12f}", file=sys.stderr)
+    return ok and abs(total - 1) < 1e-9
+
+
+def main():
+    parser = argparse.ArgumentParser(description="阶梯公平价引擎")
+    parser.add_argument("--check", action="store_true", help="与标量函数对比")
+    parser.add_argument("--bench", type=int, metavar="N", help="每个阶梯 N 档的 benchmark")
+    parser.add_argument("--events", type=int, default=100)
+    args = parser.parse_args()
+
+    if args.check:
+        sys.exit(0 if check_parity() else 1)
+    if args.bench:
+        rng = random.Random(1)
+        ladders = [_threshold_markets([round(rng.uniform(-2, 6), 1) for _ in range(args.bench)], rng)
+                   for _ in range(args.events)]
+        t0 = time.time()
+        for markets in ladders:
+            for m in markets:   # 旧做法：每个市场单独解析阈值、算 z / CDF / 两侧 edge
+                lo, _ = parse_bracket(m)
+                z = (2.0 - lo) / 1.0
+                p = 0.5 * (1 + math.erf(z / math.sqrt(2)))
+                fair_yes = int(p * 100)
+                _ = {"z_score": z, "signal": signal_label(z), "p_yes": p, "fair_yes": fair_yes,
+                     "edge_yes": fair_yes - m["yes_ask"] - DEFAULT_TX_COST,
+                     "edge_no": 100 - fair_yes - m["no_ask"] - DEFAULT_TX_COST}
+        t1 = time.time()
+        for markets in ladders:
+            price_ladder(markets, 2.0, 1.0)
+        t2 = time.time()
+        total = args.bench * args.events
+        print(f"⚡ {args.events} 个阶梯 × {args.bench} 档", file=sys.stderr)
+        print(f"   逐档标量: {(t1 - t0) * 1000:.0f}ms | price_ladder: {(t2 - t1) * 1000:.0f}ms "
+              f"({(t2 - t1) / total * 1e6:.1f}µs/档)", file=sys.stderr)
+        return
+    print(__doc__)
+
+
+if __name__ == "__main__":
+    main()
@@ -23,6 +23,9 @@ from urllib import request as urlrequest
 from cryptography.hazmat.primitives import hashes, serialization
 from cryptography.hazmat.primitives.asymmetric import padding
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from market_cache import get_market, log_dedup_stats
+
 # Account definitions
 ACCOUNTS = {
     'main': {
@@ -102,8 +105,7 @@ def get_positions(api_key=None, key_path=None, account_label=None):
         }
         # Get current market price (use default creds - market info is public)
         try:
-            market = kalshi_get(f'/trade-api/v2/markets/{ticker}')
-            m = market.get('market', {})
+            m = get_market(ticker, lambda: kalshi_get(f'/trade-api/v2/markets/{ticker}').get('market', {})) or {}
             pos['title'] = m.get('title', '')
             pos['yes_bid'] = m.get('yes_bid', 0) / 100
             pos['yes_ask'] = m.get('yes_ask', 0) / 100
@@ -213,6 +215,7 @@ def get_all_accounts_summary():
     print(f"Balance: ${total_balance/100:.2f} | Portfolio: ${total_portfolio/100:.2f}")
     print(f"Total: ${(total_balance+total_portfolio)/100:.2f}")
     print(f"Positions: {len(all_positions)}")
+    log_dedup_stats("get_positions")
     
     return all_positions, total_balance, total_portfolio
 
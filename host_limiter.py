@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+host_limiter - 按主机的并发 / 请求间隔限制
+
+功能：
+    - 每个主机一个并发上限 (信号量) + 最小请求间隔 (令牌式排队)
+    - 替代散落在各处的 time.sleep(0.2) / time.sleep(0.3)，线程池里也安全
+    - 未配置的主机使用默认限制
+
+用法：
+    from host_limiter import throttle
+    with throttle(url):
+        r = requests.get(url, timeout=10)
+
+依赖：
+    - 无 (标准库)
+"""
+
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+# host → (最大并发, 最小请求间隔秒)
+HOST_LIMITS: Dict[str, Tuple[int, float]] = {
+    "api.elections.kalshi.com": (5, 0.05),   # 8+ 并发开始 429 (见 report_v2)
+    "news.google.com": (2, 0.3),
+    "gamma-api.polymarket.com": (2, 0.2),
+}
+DEFAULT_LIMIT = (4, 0.1)
+
+
+def host_of(url_or_host: str) -> str:
+    if "://" in url_or_host:
+        return urlsplit(url_or_host).hostname or url_or_host
+    return url_or_host
+
+
+class _Host:
+    __slots__ = ("sem", "interval", "lock", "next_at")
+
+    def __init__(self, concurrency: int, interval: float):
+        self.sem = threading.BoundedSemaphore(concurrency)
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.next_at = 0.0
+
+
+class HostLimiter:
+    def __init__(self, limits: Optional[Dict[str, Tuple[int, float]]] = None,
+                 default: Tuple[int, float] = DEFAULT_LIMIT):
+        self.limits = dict(HOST_LIMITS if limits is None else limits)
+        self.default = default
+        self._hosts: Dict[str, _Host] = {}
+        self._lock = threading.Lock()
+
+    def _host(self, host: str) -> _Host:
+        with self._lock:
+            h = self._hosts.get(host)
+            if h is None:
+                h = self._hosts[host] = _Host(*self.limits.get(host, self.default))
+            return h
+
+    @contextmanager
+    def slot(self, url_or_host: str):
+        """占用一个并发槽位，并保证与同主机上一个请求的间隔"""
+        h = self._host(host_of(url_or_host))
+        h.sem.acquire()
+        try:
+            with h.lock:
+                now = time.monotonic()
+                start = max(now, h.next_at)
+                h.next_at = start + h.interval
+            if start > now:
+                time.sleep(start - now)
+            yield
+        finally:
+            h.sem.release()
+
+
+# 进程内共享实例
+_limiter = HostLimiter()
+
+
+def throttle(url_or_host: str):
+    return _limiter.slot(url_or_host)
@@ -16,12 +16,17 @@ kalshi_pipeline - Kalshi 完整分析流水线
     python kalshi_pipeline.py --dry-run          # 只列出候选
     python kalshi_pipeline.py --top 5            # 只分析前 5 个
     python kalshi_pipeline.py --notify           # 发送 Telegram 通知
+    python kalshi_pipeline.py --columnar         # 额外导出列式快照 (data/snapshots/pipeline)
+    python kalshi_pipeline.py --llm              # 候选按类型批量做 LLM 多角色分析 (带 checklist 校验)
+    python kalshi_pipeline.py --llm-sources      # 深度研究时用 LLM 识别额外数据源 (默认只用规则)
     
 依赖：
     - market_researcher_v2.py
     - nowcast_fetcher.py
     - source_detector.py
     - position_calculator.py
+    - market_analyzer_v3.py (--llm，需要 ANTHROPIC_API_KEY)
+    - llm_source_identifier.py (--llm-sources，需要 GEMINI_API_KEY)
 """
 
 import os
@@ -43,13 +48,19 @@ except ImportError:
     sys.exit(1)
 
 from source_detector import detect_sources
+from market_cache import get_market, log_dedup_stats
 from market_researcher_v2 import MarketResearcherV2
+from page_cache import log_page_stats
+from llm_cache import flush_llm_cache
+from llm_pool import log_pool_stats
 from nowcast_fetcher import NowcastFetcher
 from market_validator import classify_market, get_checklist_prompt, validate_output, enforce_output
 
 API_BASE = "https://api.elections.kalshi.com/trade-api/v2"
 WATCHLIST_FILE = Path(__file__).parent / "data" / "watchlist_series.json"
 RESULTS_FILE = Path(__file__).parent / "data" / "pipeline_results.json"
+RESULTS_COLUMNS_DIR = Path(__file__).parent / "data" / "snapshots" / "pipeline"
+RESEARCH_DEADLINE_SECONDS = 60  # 深度研究整批时限；未完成的候选按无数据处理
 
 # 置信度分级 (动态仓位由 position_calculator 计算)
 CONFIDENCE_THRESHOLDS = {
@@ -111,6 +122,14 @@ def fetch_markets_by_series(series: str) -> List[Dict]:
     return markets
 
 
+def _fetch_market(ticker: str) -> Optional[Dict]:
+    """GET /markets/{ticker} (失败返回 None)"""
+    resp = requests.get(f"{API_BASE}/markets/{ticker}", timeout=15)
+    if resp.status_code != 200:
+        return None
+    return resp.json().get("market", {})
+
+
 def quick_filter(markets: List[Dict], min_volume: int = 100) -> List[Dict]:
     """
     快速筛选候选
@@ -174,9 +193,13 @@ def extract_threshold(title: str) -> Optional[float]:
     # "Will real GDP increase by more than 2.0%..." → 2.0
     # "Will CPI increase by more than 0.3%..." → 0.3
     # "Will the upper bound... above 4.25%..." → 4.25
-    match = re.search(r'(?:more than|above|over|below|under)\s*([0-9]+\.?[0-9]*)\s*%?', title, re.IGNORECASE)
+    # "Will initial jobless claims be above 220,000 / 220K..." → 220000.0
+    match = re.search(r'(?:more than|above|over|below|under)\s*\$?((?:[0-9]{1,3}(?:,[0-9]{3})+|[0-9]+)(?:\.[0-9]+)?)'
+                      r'\s*([KkMm](?![A-Za-z]))?', title, re.IGNORECASE)
     if match:
-        return float(match.group(1))
+        value = float(match.group(1).replace(",", ""))
+        suffix = (match.group(2) or "").upper()
+        return value * {"K": 1e3, "M": 1e6}.get(suffix, 1)
     return None
 
 
@@ -329,7 +352,8 @@ def format_recommendation(market: Dict, research: Dict) -> str:
     return "\n".join(lines)
 
 
-def run_pipeline(top_n: int = 10, dry_run: bool = False, verbose: bool = False) -> List[Dict]:
+def run_pipeline(top_n: int = 10, dry_run: bool = False, verbose: bool = False,
+                 columnar: bool = False, llm: bool = False, llm_sources: bool = False) -> List[Dict]:
     """
     运行完整流水线
     
@@ -382,19 +406,19 @@ def run_pipeline(top_n: int = 10, dry_run: bool = False, verbose: bool = False)
     
     # Step 4: 深度研究 + Nowcast 数据
     print(f"\n🔬 深度研究 {len(candidates)} 个候选...", file=sys.stderr)
-    researcher = MarketResearcherV2()
+    researcher = MarketResearcherV2(use_llm=llm_sources)
     nowcast_fetcher = NowcastFetcher()
     results = []
     
+    nowcasts = []
     for i, market in enumerate(candidates):
         ticker = market.get("ticker", "")
         print(f"  [{i+1}/{len(candidates)}] {ticker}...", file=sys.stderr)
         
-        # 获取详细规则
+        # 获取详细规则 (与 report_v2 / notify 共享 single-flight 缓存)
         try:
-            resp = requests.get(f"{API_BASE}/markets/{ticker}", timeout=15)
-            if resp.status_code == 200:
-                details = resp.json().get("market", {})
+            details = get_market(ticker, lambda: _fetch_market(ticker))
+            if details:
                 market["rules_primary"] = details.get("rules_primary", "")
                 market["rules_secondary"] = details.get("rules_secondary", "")
         except:
@@ -411,10 +435,16 @@ def run_pipeline(top_n: int = 10, dry_run: bool = False, verbose: bool = False)
             if nowcast_data:
                 market["_nowcast"] = nowcast_data
                 print(f"    📊 Nowcast: {nowcast_data.get('nowcast_value')} vs {threshold} → {nowcast_data.get('direction')}", file=sys.stderr)
-        
-        # 研究
-        research = researcher.research(market)
-        
+        nowcasts.append(nowcast_data)
+    
+    # 研究 (所有候选并行，各自的数据源也并发抓取)
+    t0 = time.time()
+    researches = researcher.research_many(candidates, deadline=RESEARCH_DEADLINE_SECONDS)
+    timed_out = sum(1 for r in researches if r.get("timed_out"))
+    slow = sum(1 for r in researches for t in r.get("source_timings", []) if t["status"] == "timeout")
+    print(f"  🔬 研究完成 {time.time() - t0:.1f}s (未完成 {timed_out}, 数据源超时 {slow})", file=sys.stderr)
+    
+    for market, research, nowcast_data in zip(candidates, researches, nowcasts):
         # 用 Nowcast 数据更新置信度
         if nowcast_data:
             confidence, _ = calculate_confidence_with_nowcast(market, nowcast_data)
@@ -429,8 +459,18 @@ def run_pipeline(top_n: int = 10, dry_run: bool = False, verbose: bool = False)
             "research": research,
             "nowcast": nowcast_data,
         })
-        
-        time.sleep(0.3)
+    
+    # LLM 多角色分析：同类型候选打包成一个 prompt，结果逐个过 checklist 校验
+    if llm:
+        from market_analyzer_v3 import MarketAnalyzerV3
+        analyses = MarketAnalyzerV3().analyze_batch(candidates)
+        for r, analysis in zip(results, analyses):
+            r["analysis"] = analysis
+    
+    log_dedup_stats("pipeline")
+    log_page_stats("pipeline")
+    log_pool_stats("pipeline")
+    flush_llm_cache("pipeline")
     
     # Step 5: 生成报告
     print("\n" + "=" * 60)
@@ -465,23 +505,32 @@ def run_pipeline(top_n: int = 10, dry_run: bool = False, verbose: bool = False)
         
         recommendation = format_recommendation(market, research)
         print("\n" + recommendation)
+        analysis = r.get("analysis")
+        if analysis and "error" not in analysis:
+            print(f"🧠 LLM: {analysis.get('recommendation', 'SKIP')} {analysis.get('direction', '?')} "
+                  f"@ {analysis.get('confidence', 0) * 100:.0f}% | {analysis.get('key_risk', '')}")
         print("\n" + "-" * 40)
     
     # 保存结果
+    rows = [
+        {
+            "ticker": r["market"].get("ticker"),
+            "confidence": calculate_confidence(r["research"]),
+            "direction": "YES" if r["market"].get("last_price", 50) >= 85 else "NO",
+        }
+        for r in results
+    ]
     RESULTS_FILE.parent.mkdir(parents=True, exist_ok=True)
     with open(RESULTS_FILE, "w") as f:
         json.dump({
             "generated_at": datetime.now(timezone.utc).isoformat(),
-            "results": [
-                {
-                    "ticker": r["market"].get("ticker"),
-                    "confidence": calculate_confidence(r["research"]),
-                    "direction": "YES" if r["market"].get("last_price", 50) >= 85 else "NO",
-                }
-                for r in results
-            ]
+            "results": rows,
         }, f, indent=2)
     
+    if columnar:
+        from snapshot_columns import write_snapshot
+        write_snapshot(rows, RESULTS_COLUMNS_DIR, source="kalshi_pipeline")
+    
     return results
 
 
@@ -519,9 +568,13 @@ def main():
     parser.add_argument("--dry-run", action="store_true", help="只筛选不研究")
     parser.add_argument("--verbose", action="store_true", help="详细输出")
     parser.add_argument("--notify", action="store_true", help="发送 Telegram 通知")
+    parser.add_argument("--columnar", action="store_true", help="额外导出列式快照")
+    parser.add_argument("--llm", action="store_true", help="批量 LLM 多角色分析")
+    parser.add_argument("--llm-sources", action="store_true", help="用 LLM 识别额外数据源")
     args = parser.parse_args()
     
-    results = run_pipeline(top_n=args.top, dry_run=args.dry_run, verbose=args.verbose)
+    results = run_pipeline(top_n=args.top, dry_run=args.dry_run, verbose=args.verbose,
+                           columnar=args.columnar, llm=args.llm, llm_sources=args.llm_sources)
     
     if args.notify and results:
         # 生成简洁通知
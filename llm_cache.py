@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+llm_cache - LLM 调用结果缓存 (按 prompt 模板去重)
+
+功能：
+    - prompt 归一化：小写、压缩空白；template=True 时把数字 (阈值/价格/日期) 抽象成 <n>
+      (同一事件下 "GDP above 2.5%" / "GDP above 3.0%" 的规则共用一次数据源识别)
+    - 持久 TTL 缓存 (data/llm_cache.json)，只缓存成功结果
+    - 同一 prompt 的并发请求合并 (single-flight)
+    - 统计每轮的调用次数、命中数和节省的 token，flush_llm_cache() 打印
+    - 本地替身 LLM 服务器 (Anthropic /v1/messages 格式)，离线调试 / 测试
+
+用法：
+    from llm_cache import cached_llm_call, flush_llm_cache
+    text = cached_llm_call("sources", prompt, lambda: call_api(prompt), template=True)
+    # call_api 返回 text 或 (text, {"input_tokens": .., "output_tokens": ..})；失败返回 None
+    flush_llm_cache("pipeline")                 # 写盘 + 打印本轮统计
+
+    python llm_cache.py --serve --port 8766     # 替身服务器
+    ANTHROPIC_API_URL=http://127.0.0.1:8766/v1/messages ANTHROPIC_API_KEY=x python market_analyzer_v3.py
+    python llm_cache.py --stats                 # 缓存条目统计
+
+依赖：
+    - market_cache.py (SingleFlight)
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import threading
+from typing import Callable, Dict, Optional, Tuple, Union
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from market_cache import SingleFlight
+
+CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "llm_cache.json")
+
+DEFAULT_TTL = 24 * 3600     # 规则/数据源不常变
+ANALYSIS_TTL = 3600         # 多角色分析含价格，过期快
+
+_NUMBER = re.compile(r'[$€£]?\d[\d,]*(?:\.\d+)?(?:\s*(?:%|¢|percent\b|cents?\b)|(?:k|m|bn|b)\b)?',
+                     re.IGNORECASE)
+_SPACE = re.compile(r'\s+')
+
+CallResult = Union[None, str, Tuple[str, Dict]]
+
+
+def normalize_prompt(prompt: str, template: bool = False) -> str:
+    text = _SPACE.sub(" ", (prompt or "").lower()).strip()
+    if template:
+        text = _NUMBER.sub("<n>", text)
+    return text
+
+
+def prompt_key(kind: str, prompt: str, template: bool = False) -> str:
+    norm = normalize_prompt(prompt, template)
+    return f"{kind}:{hashlib.sha1(norm.encode('utf-8')).hexdigest()}"
+
+
+def estimate_tokens(text: str) -> int:
+    """没有 usage 字段时的粗略估计 (~4 字符/token)"""
+    return max(1, len(text or "") // 4)
+
+
+class LLMCache:
+    """归一化 prompt + TTL 缓存 + single-flight 的 LLM 调用"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or CACHE_FILE
+        self._flight = SingleFlight()
+        self._lock = threading.Lock()
+        self._cache: Optional[Dict[str, Dict]] = None   # key → {ts, ttl, text, tokens}
+        self._dirty = False
+        self.stats = {"requests": 0, "cache_hits": 0, "coalesced": 0, "calls": 0, "errors": 0,
+                      "tokens_used": 0, "tokens_saved": 0}
+
+    def _entries(self) -> Dict[str, Dict]:
+        if self._cache is None:
+            try:
+                with open(self.path) as f:
+                    self._cache = json.load(f)
+            except (OSError, ValueError):
+                self._cache = {}
+        return self._cache
+
+    def _fresh(self, key: str) -> Optional[Dict]:
+        entry = self._entries().get(key)
+        if entry and time.time() - entry["ts"] < entry["ttl"]:
+            return entry
+        return None
+
+    def call(self, kind: str, prompt: str, fn: Callable[[], CallResult],
+             template: bool = False, ttl: int = DEFAULT_TTL) -> Optional[str]:
+        key = prompt_key(kind, prompt, template)
+        with self._lock:
+            self.stats["requests"] += 1
+            entry = self._fresh(key)
+            if entry is not None:
+                self.stats["cache_hits"] += 1
+                self.stats["tokens_saved"] += entry["tokens"]
+                return entry["text"]
+
+        def _call():
+            with self._lock:
+                self.stats["calls"] += 1
+            try:
+                result = fn()
+            except Exception:
+                with self._lock:
+                    self.stats["errors"] += 1
+                raise
+            return self.store(kind, prompt, result, template, ttl)
+
+        (text, tokens), shared = self._flight.do(key, _call)
+        if shared:
+            with self._lock:
+                self.stats["coalesced"] += 1
+                self.stats["tokens_saved"] += tokens
+        return text
+
+    def store(self, kind: str, prompt: str, result: CallResult, template: bool = False,
+              ttl: int = DEFAULT_TTL) -> Tuple[Optional[str], int]:
+        """记录一次实际调用的结果 (失败不缓存) → (text, tokens)"""
+        text, usage = result if isinstance(result, tuple) else (result, None)
+        with self._lock:
+            if not text:
+                self.stats["errors"] += 1
+                return None, 0
+            usage = usage or {}
+            tokens = (usage.get("input_tokens") or estimate_tokens(prompt)) + \
+                     (usage.get("output_tokens") or estimate_tokens(text))
+            self.stats["tokens_used"] += tokens
+            self._entries()[prompt_key(kind, prompt, template)] = {
+                "ts": time.time(), "ttl": ttl, "text": text, "tokens": tokens}
+            self._dirty = True
+        return text, tokens
+
+    def peek(self, kind: str, prompt: str, template: bool = False) -> Optional[str]:
+        """只查缓存 (不调用)；未命中返回 None"""
+        with self._lock:
+            entry = self._fresh(prompt_key(kind, prompt, template))
+        return None if entry is None else entry["text"]
+
+    def save(self):
+        """写盘 (顺便清掉过期条目)；无变化时不写"""
+        with self._lock:
+            if not self._dirty:
+                return
+            now = time.time()
+            live = {k: e for k, e in self._entries().items() if now - e["ts"] < e["ttl"]}
+            self._cache = live
+            self._dirty = False
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(live, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    def reset_stats(self):
+        with self._lock:
+            for k in self.stats:
+                self.stats[k] = 0
+
+    def format_stats(self, label: str = "") -> str:
+        s = self.stats
+        tag = f"[{label}] " if label else ""
+        return (f"🤖 {tag}LLM: {s['requests']} 次 → {s['calls']} 次调用 "
+                f"(缓存 {s['cache_hits']}, 合并 {s['coalesced']}, 失败 {s['errors']}) | "
+                f"tokens 用 {s['tokens_used']}, 省 {s['tokens_saved']}")
+
+
+# 进程内共享实例 (market_analyzer_v3 / llm_source_identifier)
+_cache = LLMCache()
+
+
+def cached_llm_call(kind: str, prompt: str, fn: Callable[[], CallResult],
+                    template: bool = False, ttl: int = DEFAULT_TTL) -> Optional[str]:
+    """
+    kind: 调用类别 (不同 system prompt / 模型分开缓存)
+    template: 数字抽象掉再做 key —— 只用于结果与阈值无关的调用
+    """
+    return _cache.call(kind, prompt, fn, template, ttl)
+
+
+def cached_llm_text(kind: str, prompt: str, template: bool = False) -> Optional[str]:
+    return _cache.peek(kind, prompt, template)
+
+
+def store_llm_result(kind: str, prompt: str, result: CallResult, template: bool = False,
+                     ttl: int = DEFAULT_TTL) -> Optional[str]:
+    """写入不经 cached_llm_call 发出的调用结果 (llm_pool 的后台/对冲请求)"""
+    return _cache.store(kind, prompt, result, template, ttl)[0]
+
+
+def flush_llm_cache(label: str = "", reset: bool = True):
+    """写盘并打印本轮统计到 stderr (无调用时不打印)"""
+    _cache.save()
+    if _cache.stats["requests"]:
+        print(_cache.format_stats(label), file=sys.stderr, flush=True)
+    if reset:
+        _cache.reset_stats()
+
+
+# ── 本地替身 LLM 服务器 ──
+
+STUB_REPLY = """【分析师】(替身回复)
+```json
+{"market_summary": "stub", "recommendation": "WATCH", "direction": "NO", "confidence": 0.5,
+ "position_size": 0, "key_risk": "stub", "fact_check_passed": false,
+ "devil_advocate_concern": "stub", "risk_reward_favorable": false,
+ "market_type": "other", "verifiable": true, "reason": "stub", "sources": [],
+ "recommended_action": "research"}
+```"""
+
+
+def stub_reply(prompt: str) -> str:
+    """
+    替身回复：批量分析 prompt (market_analyzer_v3.analyze_batch) 按 ticker 逐段回复，
+    checklist 各项答 "stub"；其他 prompt 返回 STUB_REPLY
+    """
+    tickers = re.findall(r'^### \[\d+\] (\S+)', prompt, re.MULTILINE)
+    if not tickers:
+        return STUB_REPLY
+    items = re.findall(r'^\d+\. \*\*(\w+)\*\*', prompt, re.MULTILINE)
+    sections = []
+    for t in tickers:
+        answers = "\n".join(f"{item}: stub" for item in items)
+        verdict = json.dumps({"ticker": t, "market_summary": "stub", "recommendation": "WATCH",
+                              "direction": "NO", "confidence": 0.5, "position_size": 0,
+                              "key_risk": "stub", "fact_check_passed": False,
+                              "devil_advocate_concern": "stub", "risk_reward_favorable": False})
+        sections.append(f"=== MARKET {t} ===\n{answers}\n### 验证结果\n全部 ✅\n```json\n{verdict}\n```")
+    return "\n\n".join(sections)
+
+
+def serve_stub(port: int = 8766, delay: float = 0.0, reply: Callable[[str], str] = stub_reply):
+    """Anthropic /v1/messages 格式的替身服务器：reply(prompt) 回复 + 估算 usage，可模拟延迟"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            try:
+                req = json.loads(body)
+                prompt = "".join(m.get("content", "") if isinstance(m.get("content"), str) else ""
+                                 for m in req.get("messages", []))
+            except ValueError:
+                self.send_error(400)
+                return
+            if delay:
+                time.sleep(delay)
+            text = reply(prompt)
+            out = json.dumps({
+                "content": [{"type": "text", "text": text}],
+                "usage": {"input_tokens": estimate_tokens(prompt), "output_tokens": estimate_tokens(text)},
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(out)))
+            self.end_headers()
+            self.wfile.write(out)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    print(f"🧪 LLM 替身服务器: http://127.0.0.1:{port}/v1/messages (延迟 {delay}s)", file=sys.stderr)
+    server.serve_forever()
+
+
+def main():
+    args = sys.argv[1:]
+
+    def _arg(flag, default=None):
+        return args[args.index(flag) + 1] if flag in args and args.index(flag) + 1 < len(args) else default
+
+    if "--serve" in args:
+        serve_stub(int(_arg("--port", "8766")), float(_arg("--delay", "0")))
+    elif "--stats" in args:
+        entries = _cache._entries()
+        now = time.time()
+        live = sum(1 for e in entries.values() if now - e["ts"] < e["ttl"])
+        print(f"{len(entries)} entries ({live} fresh) in {_cache.path}")
+    else:
+        print(__doc__)
+
+
+if __name__ == "__main__":
+    main()
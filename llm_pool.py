@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+llm_pool - 带时限和对冲请求的 LLM 后台工作池
+
+功能：
+    - 固定数量的后台线程 (daemon，不拖住进程退出) 执行 LLM 调用
+    - 每次调用有时限：到时没有结果立即返回规则回退，LLM 请求继续在后台跑，
+      完成后写入 llm_cache，后续同模板的市场直接命中
+    - 对冲请求：超过 hedge_after 秒还没返回就再发一份，先到先用
+    - 同一 prompt 的在途调用共享 (不重复排队)
+
+用法：
+    from llm_pool import llm_call, log_pool_stats
+    text, source = llm_call("sources:gemini", prompt, lambda: generate(prompt),
+                            template=True, deadline=8)
+    # source: cache / llm / timeout / error —— 后两种 text 为 None，调用方走规则回退
+    log_pool_stats("pipeline")
+
+依赖：
+    - llm_cache.py
+"""
+
+import os
+import sys
+import time
+import queue
+import threading
+from concurrent.futures import Future, wait, FIRST_COMPLETED
+from typing import Callable, Dict, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from llm_cache import cached_llm_text, store_llm_result, prompt_key, CallResult, DEFAULT_TTL
+
+LLM_WORKERS = int(os.environ.get("LLM_WORKERS", "4"))
+LLM_DEADLINE_SECONDS = float(os.environ.get("LLM_DEADLINE_SECONDS", "8"))
+HEDGE_AFTER_SECONDS = 3.0    # 超过这个时间还没返回就发对冲请求 (0 = 不对冲)
+
+
+class LLMPool:
+    def __init__(self, workers: int = LLM_WORKERS, deadline: float = LLM_DEADLINE_SECONDS,
+                 hedge_after: float = HEDGE_AFTER_SECONDS):
+        self.deadline = deadline
+        self.hedge_after = hedge_after
+        self._queue: "queue.Queue[Tuple[Callable, Future]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self.stats = {"requests": 0, "cache_hits": 0, "joined": 0, "attempts": 0, "hedged": 0,
+                      "timeouts": 0, "late": 0, "errors": 0}
+        for i in range(workers):
+            threading.Thread(target=self._worker, name=f"llm-pool-{i}", daemon=True).start()
+
+    def _worker(self):
+        while True:
+            fn, fut = self._queue.get()
+            if not fut.set_running_or_notify_cancel():
+                continue
+            try:
+                fut.set_result(fn())
+            except Exception as e:
+                fut.set_exception(e)
+
+    def _bump(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _attempt(self, fn: Callable[[], CallResult]) -> Future:
+        fut: Future = Future()
+        self._bump("attempts")
+        self._queue.put((fn, fut))
+        return fut
+
+    def _start(self, key: str, kind: str, prompt: str, fn: Callable[[], CallResult],
+               template: bool, ttl: int) -> Tuple[Future, Callable[[], None]]:
+        """
+        启动 (或加入) 一个 prompt 的调用 → (结果 Future, 发对冲请求的函数)
+
+        结果 Future 由第一个成功的尝试完成，并同时写入 llm_cache；全部失败则结果为 None。
+        """
+        with self._lock:
+            result = self._inflight.get(key)
+            if result is not None:
+                self.stats["joined"] += 1
+                return result, lambda: None
+            result = self._inflight[key] = Future()
+        state = {"pending": 0}
+        state_lock = threading.Lock()
+
+        def _done(attempt: Future):
+            text = None
+            try:
+                text = store_llm_result(kind, prompt, attempt.result(), template, ttl)
+            except Exception:
+                self._bump("errors")
+            with state_lock:
+                state["pending"] -= 1
+                finish = not result.done() and (text is not None or state["pending"] == 0)
+                if finish:
+                    result.set_result(text)
+            if finish:
+                with self._lock:
+                    self._inflight.pop(key, None)
+
+        def _launch():
+            with state_lock:
+                if result.done():
+                    return
+                state["pending"] += 1
+            self._attempt(fn).add_done_callback(_done)
+
+        _launch()
+        return result, _launch
+
+    def call(self, kind: str, prompt: str, fn: Callable[[], CallResult], template: bool = False,
+             deadline: Optional[float] = None, ttl: int = DEFAULT_TTL) -> Tuple[Optional[str], str]:
+        """
+        Returns:
+            (text, source)  source: cache / llm / timeout / error
+        """
+        self._bump("requests")
+        text = cached_llm_text(kind, prompt, template)
+        if text is not None:
+            self._bump("cache_hits")
+            return text, "cache"
+
+        deadline = self.deadline if deadline is None else deadline
+        result, hedge = self._start(prompt_key(kind, prompt, template), kind, prompt, fn, template, ttl)
+        t_end = time.monotonic() + deadline
+        if self.hedge_after and self.hedge_after < deadline:
+            wait([result], timeout=self.hedge_after, return_when=FIRST_COMPLETED)
+            if not result.done():
+                self._bump("hedged")
+                hedge()
+        wait([result], timeout=max(0.0, t_end - time.monotonic()))
+        if not result.done():
+            self._bump("timeouts")
+            result.add_done_callback(lambda f: self._bump("late"))
+            return None, "timeout"
+        text = result.result()
+        return text, "llm" if text is not None else "error"
+
+    def reset_stats(self):
+        with self._lock:
+            for k in self.stats:
+                self.stats[k] = 0
+
+    def format_stats(self, label: str = "") -> str:
+        s = self.stats
+        tag = f"[{label}] " if label else ""
+        return (f"⏱️ {tag}LLM 工作池: {s['requests']} 次 (缓存 {s['cache_hits']}, 共享 {s['joined']}) → "
+                f"{s['attempts']} 次请求 (对冲 {s['hedged']}) | 超时回退 {s['timeouts']} "
+                f"(后台补完 {s['late']}), 失败 {s['errors']}")
+
+
+_pool: Optional[LLMPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> LLMPool:
+    """进程内共享实例 (第一次用到时才启动线程)"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = LLMPool()
+        return _pool
+
+
+def llm_call(kind: str, prompt: str, fn: Callable[[], CallResult], template: bool = False,
+             deadline: Optional[float] = None, ttl: int = DEFAULT_TTL) -> Tuple[Optional[str], str]:
+    return get_pool().call(kind, prompt, fn, template, deadline, ttl)
+
+
+def log_pool_stats(label: str = "", reset: bool = True):
+    """打印本轮统计到 stderr (没用过工作池时不打印)"""
+    if _pool is None or not _pool.stats["requests"]:
+        return
+    print(_pool.format_stats(label), file=sys.stderr, flush=True)
+    if reset:
+        _pool.reset_stats()
@@ -1,6 +1,22 @@
 #!/usr/bin/env python3
 """
 market_analyzer_v3 - 多角色分析框架
+
+功能：
+    - 4 个角色 (分析师/事实核查/魔鬼代言人/风控) 一次 prompt 完成
+    - 调用结果走 llm_cache：相同 prompt (含价格) 1 小时内不重复请求，并发重复请求合并
+    - 批量模式：同一 classify_market 类型的多个市场打包成一个 prompt (共享 checklist)，
+      按市场拆出结果，逐个 validate_output / enforce_output；解析失败的市场拆开单独重试
+
+用法：
+    python market_analyzer_v3.py
+    analyzer.analyze_batch(markets)       # [result, ...]，顺序与输入一致
+    ANTHROPIC_API_URL=http://127.0.0.1:8766/v1/messages python market_analyzer_v3.py   # 替身服务器
+
+依赖：
+    - requests
+    - llm_cache.py
+    - market_validator.py (checklist + 输出校验)
 """
 
 import sys
@@ -25,12 +41,22 @@ Date: 2026-02-22
 import os
 import json
 import re
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 
 # Use requests for API calls (simpler, no SDK dependency issues)
 import requests
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from llm_cache import cached_llm_call, ANALYSIS_TTL
+from market_validator import classify_market, get_checklist_prompt, validate_output, enforce_output
+
+MODEL = "claude-3-haiku-20240307"
+MODEL_MAX_TOKENS = 4096     # MODEL 单次输出上限，超过 API 直接返回 400
+BATCH_RULES_CHARS = 600     # 批量模式每个市场的规则截断长度
+BATCH_MAX_TOKENS = 1200     # 每个市场的输出 token 预算
+BATCH_SIZE = MODEL_MAX_TOKENS // BATCH_MAX_TOKENS   # 每个批量 prompt 最多几个市场 (= 3，输出预算放得下)
+
 MULTI_ROLE_PROMPT = """你要扮演4个角色分析这个预测市场。每个角色必须发言，不能跳过。
 
 ## 市场信息
@@ -97,19 +123,91 @@ MULTI_ROLE_PROMPT = """你要扮演4个角色分析这个预测市场。每个
 ```
 """
 
+BATCH_PROMPT = """你要分析下面 {n} 个同类预测市场。每个市场都要独立完成 4 个角色的讨论
+(分析师 → 事实核查员 → 魔鬼代言人 → 风控官)，但只写结论要点。
+
+{checklist}
+
+## 市场列表
+{markets}
+
+---
+
+输出格式 (严格遵守，每个市场一段，按列表顺序，不能合并或跳过)：
+
+=== MARKET <ticker> ===
+<逐项回答 checklist，每行 `item_id: 答案`，答不上来写 UNKNOWN>
+### 验证结果
+<每项 ✅/❌>
+```json
+{{
+  "ticker": "<ticker>",
+  "market_summary": "一句话总结",
+  "recommendation": "BUY/WATCH/SKIP",
+  "direction": "YES/NO",
+  "confidence": 0.0-1.0,
+  "position_size": 0-100,
+  "key_risk": "主要风险",
+  "fact_check_passed": true/false,
+  "devil_advocate_concern": "魔鬼代言人的主要担忧",
+  "risk_reward_favorable": true/false
+}}
+```
+"""
+
+BATCH_MARKET = """### [{i}] {ticker}
+标题: {title}
+当前价格: {price}¢ ({direction} 方向) | $50 仓位: 赚 ${profit:.2f} / 亏 ${loss:.2f} | 到期天数: {days_left}
+结算规则: {rules}
+"""
+
+_SECTION = re.compile(r'^=== MARKET (\S+) ===\s*$', re.MULTILINE)
+
+
+def _parse_json(text: str) -> Optional[Dict]:
+    """从 ```json 块 (或裸 JSON) 中取结论"""
+    json_match = re.search(r'```json\s*([\s\S]*?)\s*```', text)
+    if not json_match:
+        json_match = re.search(r'\{[\s\S]*"recommendation"[\s\S]*\}', text)
+    if not json_match:
+        return None
+    try:
+        return json.loads(json_match.group(1) if json_match.re.groups else json_match.group())
+    except ValueError:
+        return None
+
+
+def split_sections(text: str) -> Dict[str, str]:
+    """批量回复 → {ticker: 该市场的那一段}"""
+    heads = list(_SECTION.finditer(text or ""))
+    sections = {}
+    for i, m in enumerate(heads):
+        end = heads[i + 1].start() if i + 1 < len(heads) else len(text)
+        sections[m.group(1)] = text[m.end():end].strip()
+    return sections
+
 
 class MarketAnalyzerV3:
     """多角色分析器 - 使用 HTTP 直接调用 Claude API"""
     
     def __init__(self):
         self.api_key = os.environ.get("ANTHROPIC_API_KEY")
-        self.api_url = "https://api.anthropic.com/v1/messages"
+        self.api_url = os.environ.get("ANTHROPIC_API_URL", "https://api.anthropic.com/v1/messages")
+        self.batch_stats = {"calls": 0, "retried": 0}
     
-    def _call_claude(self, prompt: str) -> Optional[str]:
-        """直接调用 Claude API"""
+    def _call_claude(self, prompt: str, max_tokens: int = 2500) -> Optional[str]:
+        """
+        调用 Claude API (经 llm_cache)
+        
+        prompt 里有价格和阈值，所以按完整 prompt 缓存，不做模板抽象
+        """
         if not self.api_key:
             return None
-        
+        return cached_llm_call(f"analyzer:{MODEL}", prompt, lambda: self._post(prompt, max_tokens),
+                               ttl=ANALYSIS_TTL)
+    
+    def _post(self, prompt: str, max_tokens: int = 2500):
+        """直接调用 Claude API → (text, usage) 或 None"""
         headers = {
             "x-api-key": self.api_key,
             "content-type": "application/json",
@@ -117,15 +215,16 @@ class MarketAnalyzerV3:
         }
         
         data = {
-            "model": "claude-3-haiku-20240307",
-            "max_tokens": 2500,
+            "model": MODEL,
+            "max_tokens": max_tokens,
             "messages": [{"role": "user", "content": prompt}]
         }
         
         try:
             resp = requests.post(self.api_url, headers=headers, json=data, timeout=60)
             if resp.status_code == 200:
-                return resp.json()["content"][0]["text"]
+                body = resp.json()
+                return body["content"][0]["text"], body.get("usage")
             else:
                 print(f"API error: {resp.status_code} - {resp.text[:200]}")
                 return None
@@ -133,20 +232,9 @@ class MarketAnalyzerV3:
             print(f"Request error: {e}")
             return None
     
-    def analyze(self, market: Dict) -> Dict:
-        """
-        分析市场
-        
-        Args:
-            market: 包含 title, rules_primary, last_price 等字段
-            
-        Returns:
-            分析结果 dict
-        """
-        if not self.api_key:
-            return {"error": "ANTHROPIC_API_KEY not set"}
-        
-        # 提取信息
+    @staticmethod
+    def _prepare(market: Dict) -> Dict:
+        """提取 prompt 需要的字段 (方向、风险收益、到期天数)"""
         title = market.get('title', '')
         rules = market.get('rules_primary', '') + '\n' + market.get('rules_secondary', '')
         price = market.get('last_price', 50)
@@ -174,17 +262,27 @@ class MarketAnalyzerV3:
             except:
                 pass
         
+        return {"ticker": market.get("ticker", ""), "title": title, "rules": rules, "price": price,
+                "direction": direction, "profit": profit, "loss": loss, "odds": odds,
+                "days_left": days_left}
+    
+    def analyze(self, market: Dict) -> Dict:
+        """
+        分析市场
+        
+        Args:
+            market: 包含 title, rules_primary, last_price 等字段
+            
+        Returns:
+            分析结果 dict
+        """
+        if not self.api_key:
+            return {"error": "ANTHROPIC_API_KEY not set"}
+        
+        info = self._prepare(market)
+        
         # 构建 prompt
-        prompt = MULTI_ROLE_PROMPT.format(
-            title=title,
-            price=price,
-            direction=direction,
-            rules=rules[:1500],  # 限制长度
-            days_left=days_left,
-            profit=profit,
-            loss=loss,
-            odds=odds
-        )
+        prompt = MULTI_ROLE_PROMPT.format(**dict(info, rules=info["rules"][:1500]))  # 限制长度
         
         text = self._call_claude(prompt)
         if not text:
@@ -212,6 +310,86 @@ class MarketAnalyzerV3:
         except Exception as e:
             return {"error": str(e), "raw": text[:500] if text else ""}
     
+    def analyze_batch(self, markets: List[Dict], batch_size: int = BATCH_SIZE) -> List[Dict]:
+        """
+        批量分析：按 classify_market 类型分组，每组每 batch_size 个市场一次调用
+        (batch_size 不超过 BATCH_SIZE，保证 batch_size × BATCH_MAX_TOKENS ≤ MODEL_MAX_TOKENS)
+        
+        每个结果都经过 validate_output / enforce_output (验证不通过 → recommendation 强制 SKIP)。
+        结构性失败 (缺段落 / JSON 解析失败 / 没有验证块) 的市场拆开单独重试。
+        
+        Returns:
+            与 markets 顺序一致的结果列表 (字段同 analyze，另有 market_type / validation / batch_size)
+        """
+        if not self.api_key:
+            return [{"error": "ANTHROPIC_API_KEY not set"} for _ in markets]
+        
+        self.batch_stats = {"calls": 0, "retried": 0}
+        batch_size = max(1, min(batch_size, BATCH_SIZE))
+        groups: Dict[str, List[int]] = {}
+        for i, m in enumerate(markets):
+            groups.setdefault(classify_market(m.get("ticker", "")), []).append(i)
+        
+        results: List[Optional[Dict]] = [None] * len(markets)
+        for market_type, idxs in groups.items():
+            for start in range(0, len(idxs), batch_size):
+                chunk = idxs[start:start + batch_size]
+                self._run_batch([markets[i] for i in chunk], market_type, chunk, results)
+        
+        calls = self.batch_stats
+        print(f"🧠 批量分析: {len(markets)} 个市场 → {calls['calls']} 次调用 "
+              f"({len(groups)} 类, 单独重试 {calls['retried']})", file=sys.stderr)
+        return results
+    
+    def _run_batch(self, batch: List[Dict], market_type: str, idxs: List[int], results: List):
+        parsed = self._call_batch(batch, market_type)
+        failed = []
+        for market, i in zip(batch, idxs):
+            result = parsed.get(market.get("ticker", ""))
+            if result is None or "error" in result:
+                failed.append((market, i, result))
+            else:
+                results[i] = result
+        
+        for market, i, result in failed:
+            if len(batch) == 1:
+                results[i] = result or {"error": "batch item failed", "market_ticker": market.get("ticker", "")}
+                continue
+            self.batch_stats["retried"] += 1
+            self._run_batch([market], market_type, [i], results)
+    
+    def _call_batch(self, batch: List[Dict], market_type: str) -> Dict[str, Dict]:
+        """一次调用分析 batch 里的所有市场 → {ticker: result}"""
+        blocks = []
+        for i, market in enumerate(batch, 1):
+            info = self._prepare(market)
+            blocks.append(BATCH_MARKET.format(i=i, **dict(info, rules=info["rules"][:BATCH_RULES_CHARS])))
+        prompt = BATCH_PROMPT.format(n=len(batch), checklist=get_checklist_prompt(market_type),
+                                     markets="\n".join(blocks))
+        
+        self.batch_stats["calls"] += 1
+        text = self._call_claude(prompt, max_tokens=min(MODEL_MAX_TOKENS, BATCH_MAX_TOKENS * len(batch)))
+        if not text:
+            return {}
+        
+        out = {}
+        for ticker, section in split_sections(text).items():
+            result = _parse_json(section)
+            check = validate_output(section, market_type)
+            if result is None or not check["has_validation_block"]:
+                out[ticker] = {"error": "Failed to parse batch item", "raw": section[:500],
+                               "market_ticker": ticker}
+                continue
+            if not check["valid"]:
+                result["recommendation"] = "SKIP"
+            result["full_analysis"] = enforce_output(section, market_type, check)
+            result["market_ticker"] = ticker
+            result["market_type"] = market_type
+            result["validation"] = check
+            result["batch_size"] = len(batch)
+            out[ticker] = result
+        return out
+    
     def format_report(self, result: Dict) -> str:
         """格式化分析报告"""
         if "error" in result:
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+market_cache - /markets/{ticker} 请求合并 (single-flight) + 短 TTL 缓存
+
+功能：
+    - 同一 ticker 的并发请求共享一次在途调用 (线程池里的重复请求只打一次 API)
+    - 短 TTL 结果缓存，覆盖同一轮扫描中的顺序重复
+    - 统计请求 / 缓存命中 / 合并次数，每轮结束打印去重日志
+
+用法：
+    from market_cache import get_market, log_dedup_stats
+    market = get_market(ticker, lambda: api_get(f"/markets/{ticker}"))
+    ...
+    log_dedup_stats("report_v2")     # stderr: 🔁 [report_v2] /markets 去重: ...
+
+依赖：
+    - 无 (标准库)
+"""
+
+import sys
+import time
+import threading
+from typing import Callable, Dict, Optional
+
+DEFAULT_TTL = 60  # 秒；一轮扫描内价格/规则变化可忽略
+
+
+class SingleFlight:
+    """同 key 的并发调用合并为一次 (Go singleflight 语义)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, "_Call"] = {}
+
+    def do(self, key: str, fn: Callable):
+        """
+        执行 fn()，若 key 已有在途调用则等待其结果
+
+        Returns:
+            (result, shared)  shared=True 表示复用了别人的调用
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+        if call.error is not None:
+            raise call.error
+        return call.result, False
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MarketCache:
+    """single-flight + TTL 缓存 (失败结果 None 不缓存)"""
+
+    def __init__(self, ttl: float = DEFAULT_TTL):
+        self.ttl = ttl
+        self._flight = SingleFlight()
+        self._lock = threading.Lock()
+        self._cache: Dict[str, tuple] = {}  # key → (expires_at, value)
+        self.stats = {"requests": 0, "cache_hits": 0, "coalesced": 0, "fetches": 0}
+
+    def get(self, key: str, fetch: Callable[[], Optional[Dict]]) -> Optional[Dict]:
+        now = time.time()
+        with self._lock:
+            self.stats["requests"] += 1
+            entry = self._cache.get(key)
+            if entry and entry[0] > now:
+                self.stats["cache_hits"] += 1
+                return dict(entry[1])
+
+        def _fetch():
+            with self._lock:
+                self.stats["fetches"] += 1
+            value = fetch()
+            if value:
+                with self._lock:
+                    self._cache[key] = (time.time() + self.ttl, value)
+            return value
+
+        value, shared = self._flight.do(key, _fetch)
+        if shared:
+            with self._lock:
+                self.stats["coalesced"] += 1
+        # 返回副本，调用方 (score_market 等) 可以随意修改
+        return dict(value) if value else value
+
+    def invalidate(self, key: Optional[str] = None):
+        with self._lock:
+            if key is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(key, None)
+
+    def reset_stats(self):
+        with self._lock:
+            for k in self.stats:
+                self.stats[k] = 0
+
+    def format_stats(self, label: str = "") -> str:
+        s = self.stats
+        saved = s["cache_hits"] + s["coalesced"]
+        tag = f"[{label}] " if label else ""
+        return (f"🔁 {tag}/markets 去重: {s['requests']} 请求 → {s['fetches']} 次调用 "
+                f"(缓存 {s['cache_hits']}, 合并 {s['coalesced']}, 省 {saved})")
+
+
+# 进程内共享实例 (report_v2 / endgame_scanner / notify / kalshi_pipeline / get_positions)
+_markets = MarketCache()
+
+
+def get_market(ticker: str, fetch: Callable[[], Optional[Dict]]) -> Optional[Dict]:
+    """按 ticker 获取市场详情；fetch() 返回 market dict (失败返回 None)"""
+    return _markets.get(ticker, fetch)
+
+
+def dedup_stats() -> Dict[str, int]:
+    return dict(_markets.stats)
+
+
+def log_dedup_stats(label: str = "", reset: bool = True):
+    """打印本轮去重统计到 stderr (无请求时不打印)"""
+    if _markets.stats["requests"]:
+        print(_markets.format_stats(label), file=sys.stderr, flush=True)
+    if reset:
+        _markets.reset_stats()
@@ -11,6 +11,7 @@ market_census - Kalshi 市场普查工具
 用法：
     python market_census.py                      # 运行普查
     python market_census.py --output watchlist.json
+    python market_census.py --columnar           # 额外导出列式快照 (data/snapshots/census)
     
 依赖：
     - requests
@@ -35,6 +36,7 @@ API_BASE = "https://api.elections.kalshi.com/trade-api/v2"
 DATA_DIR = Path(__file__).parent / "data"
 CENSUS_FILE = DATA_DIR / "market_census.json"
 WATCHLIST_FILE = DATA_DIR / "watchlist_series.json"
+CENSUS_COLUMNS_DIR = DATA_DIR / "snapshots" / "census"
 
 # 已知的重要 series (优先扫描)
 # 分层: Tier 1 有 Nowcast, Tier 2 有官方数据源
@@ -72,7 +74,8 @@ PRIORITY_SERIES = [
 class MarketCensus:
     """Kalshi 市场普查"""
     
-    def __init__(self):
+    def __init__(self, columnar: bool = False):
+        self.columnar = columnar
         self.markets = []
         self.events = []
         self.series = defaultdict(lambda: {
@@ -398,6 +401,27 @@ class MarketCensus:
         with open(WATCHLIST_FILE, "w") as f:
             json.dump(watchlist, f, indent=2, ensure_ascii=False)
         print(f"💾 Watchlist 已保存: {WATCHLIST_FILE}")
+        
+        if self.columnar:
+            self.save_columnar()
+    
+    def save_columnar(self):
+        """按市场展开 series，导出列式快照 (data/snapshots/census)"""
+        from snapshot_columns import write_snapshot
+        rows = []
+        for series_ticker, s in self.series.items():
+            for m in s["markets"]:
+                rows.append({
+                    "ticker": m["ticker"],
+                    "series_ticker": series_ticker,
+                    "category": s["category"],
+                    "tier": m["tier"],
+                    "series_tier": s["tier"],
+                    "volume": m["volume"],
+                    "close_time": m["close_time"],
+                })
+        write_snapshot(rows, CENSUS_COLUMNS_DIR, source="market_census")
+        print(f"💾 列式快照已保存: {CENSUS_COLUMNS_DIR} ({len(rows)} 个市场)")
     
     def print_summary(self, report: Dict):
         """打印摘要"""
@@ -618,6 +642,9 @@ class MarketCensus:
             json.dump(watchlist, f, indent=2, ensure_ascii=False, default=str)
         print(f"💾 Watchlist 已保存: {WATCHLIST_FILE}")
         
+        if self.columnar:
+            self.save_columnar()
+        
         # 6. 打印摘要
         self.print_summary(report)
         
@@ -672,10 +699,11 @@ def main():
     parser = argparse.ArgumentParser(description="Kalshi 市场普查")
     parser.add_argument("--summary", action="store_true", help="只显示现有报告摘要")
     parser.add_argument("--update", action="store_true", help="更新 watchlist")
+    parser.add_argument("--columnar", action="store_true", help="额外导出列式快照")
     
     args = parser.parse_args()
     
-    census = MarketCensus()
+    census = MarketCensus(columnar=args.columnar)
     census.run(summary_only=args.summary)
 
 
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+market_matcher - Kalshi ↔ Polymarket 标题匹配引擎 (倒排索引分块 + 带宽编辑距离)
+
+功能：
+    - 评分公式与 crossplatform.similarity 相同：60% Jaccard + 40% Levenshtein
+    - 用词倒排索引生成候选 (只走低频词，高频词如 "will"/"2026" 不参与分块)，
+      不再是 Kalshi × Polymarket 全配对
+    - 候选按 Jaccard 排序，只对前 K 个且理论上限能超过当前最优的算编辑距离
+    - 编辑距离：装了 rapidfuzz 用 C 实现，否则纯 Python 带宽 DP (超出带宽提前退出)
+
+用法：
+    from market_matcher import MarketMatcher
+    matcher = MarketMatcher(poly_events)
+    matcher.best("Will the Fed cut rates in March?", threshold=0.45)  # (score, event, market) 或 None
+    matcher.match_all(kalshi_markets, threshold=0.45)                  # 同 auto_match_markets 输出
+
+    python market_matcher.py --bench 2000 5000    # 合成数据：对比旧全配对 (抽样) 的速度和结果
+
+依赖：
+    - rapidfuzz (可选)
+"""
+
+import re
+import sys
+import time
+import random
+from typing import Dict, List, Optional, Set, Tuple
+
+try:
+    from rapidfuzz.distance import Levenshtein as _RFLevenshtein
+    HAVE_RAPIDFUZZ = True
+except ImportError:
+    HAVE_RAPIDFUZZ = False
+
+JACCARD_WEIGHT = 0.6
+LEVENSHTEIN_WEIGHT = 0.4
+MAX_DF = 0.05          # 出现在超过 5% 标题里的词不用于分块
+TOP_CANDIDATES = 20    # 每个 Kalshi 标题最多对多少个候选算编辑距离
+
+
+def tokenize(text: str) -> Set[str]:
+    text = re.sub(r'[^a-z0-9\s]', '', (text or "").lower())
+    return set(text.split())
+
+
+def jaccard_sets(sa: Set[str], sb: Set[str]) -> float:
+    if not sa or not sb:
+        return 0.0
+    inter = len(sa & sb)
+    return inter / (len(sa) + len(sb) - inter)
+
+
+def levenshtein_ratio(a: str, b: str, min_ratio: float = 0.0) -> float:
+    """
+    1 - 编辑距离 / 较长串长度；低于 min_ratio 时可能直接返回 0.0
+
+    带宽 DP：只算 |i - j| <= k 的格子 (k = 允许的最大距离)，整行都超过 k 就提前退出。
+    """
+    a, b = (a or "").lower(), (b or "").lower()
+    if not a or not b:
+        return 0.0
+    if HAVE_RAPIDFUZZ:
+        return _RFLevenshtein.normalized_similarity(a, b, score_cutoff=min_ratio)
+    n, m = len(a), len(b)
+    if n > m:
+        a, b, n, m = b, a, m, n
+    k = int((1.0 - min_ratio) * m) if min_ratio > 0 else m
+    if m - n > k:
+        return 0.0
+    inf = k + 1
+    prev = [i if i <= k else inf for i in range(n + 1)]
+    for j in range(1, m + 1):
+        lo, hi = max(1, j - k), min(n, j + k)
+        curr = [inf] * (n + 1)
+        curr[0] = j if j <= k else inf
+        bj = b[j - 1]
+        for i in range(lo, hi + 1):
+            cost = 0 if a[i - 1] == bj else 1
+            curr[i] = min(curr[i - 1] + 1, prev[i] + 1, prev[i - 1] + cost)
+        if min(curr[lo - 1:hi + 1]) > k:
+            return 0.0
+        prev = curr
+    dist = prev[n]
+    if dist > k:
+        return 0.0
+    return 1.0 - dist / m
+
+
+def similarity(text_a: str, text_b: str) -> float:
+    """Weighted similarity: 60% Jaccard + 40% Levenshtein (与 crossplatform.similarity 一致)"""
+    return (JACCARD_WEIGHT * jaccard_sets(tokenize(text_a), tokenize(text_b))
+            + LEVENSHTEIN_WEIGHT * levenshtein_ratio(text_a, text_b))
+
+
+class MarketMatcher:
+    """Polymarket 一侧建索引，Kalshi 标题逐个查询"""
+
+    def __init__(self, poly_events: List[Dict], max_df: float = MAX_DF,
+                 top_candidates: int = TOP_CANDIDATES):
+        self.top_candidates = top_candidates
+        self.entries: List[Tuple[Dict, Dict, str, Set[str]]] = []
+        for pe in poly_events:
+            for pm in pe.get("markets", []) or []:
+                title = pm.get("question", "") or pe.get("title", "")
+                self.entries.append((pe, pm, title, tokenize(title)))
+
+        self.postings: Dict[str, List[int]] = {}
+        for idx, (_, _, _, toks) in enumerate(self.entries):
+            for tok in toks:
+                self.postings.setdefault(tok, []).append(idx)
+        limit = max(1, int(max_df * len(self.entries)))
+        self.blocking = {tok for tok, ids in self.postings.items() if len(ids) <= limit}
+
+    def candidates(self, toks: Set[str]) -> List[Tuple[float, int]]:
+        """共享至少一个低频词的条目，按 Jaccard 降序 (只含高频词时退回全部词)"""
+        keys = [t for t in toks if t in self.blocking] or [t for t in toks if t in self.postings]
+        seen = set()
+        for t in keys:
+            seen.update(self.postings[t])
+        scored = [(jaccard_sets(toks, self.entries[i][3]), i) for i in seen]
+        scored.sort(reverse=True)
+        return scored[:self.top_candidates]
+
+    def best(self, title: str, threshold: float = 0.0) -> Optional[Tuple[float, Dict, Dict]]:
+        toks = tokenize(title)
+        best_score, best_idx = 0.0, None
+        for jac, idx in self.candidates(toks):
+            floor = max(threshold, best_score)
+            # Levenshtein 最多贡献 0.4；需要的最低比例不可能达到就跳过
+            need = (floor - JACCARD_WEIGHT * jac) / LEVENSHTEIN_WEIGHT
+            if need > 1.0:
+                continue
+            lev = levenshtein_ratio(title, self.entries[idx][2], max(0.0, need))
+            score = JACCARD_WEIGHT * jac + LEVENSHTEIN_WEIGHT * lev
+            if score > best_score:
+                best_score, best_idx = score, idx
+        if best_idx is None or best_score < threshold:
+            return None
+        pe, pm, _, _ = self.entries[best_idx]
+        return best_score, pe, pm
+
+    def match_all(self, kalshi_markets: List[Dict], threshold: float = 0.45) -> List[Dict]:
+        """与 crossplatform.auto_match_markets 相同的输出格式"""
+        matches = []
+        for km in kalshi_markets:
+            hit = self.best(km.get("title", ""), threshold)
+            if hit:
+                score, pe, pm = hit
+                matches.append({"kalshi": km, "poly_event": pe, "poly_market": pm, "score": score})
+        return sorted(matches, key=lambda x: x["score"], reverse=True)
+
+
+# ── benchmark ──
+
+def _synthetic(n_kalshi: int, n_poly: int, seed: int = 0):
+    """合成标题：常用词 + 大词表里的主题词 (接近真实的词频分布)"""
+    rng = random.Random(seed)
+    vocab = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(3, 9)))
+             for _ in range(max(500, n_poly))]
+    poly = []
+    for i in range(n_poly):
+        words = rng.sample(vocab, 5)
+        poly.append({"title": "", "markets": [{"question": f"Will {' '.join(words)} by {2026 + i % 3}?"}]})
+    kalshi = []
+    for i in range(n_kalshi):
+        q = poly[rng.randrange(n_poly)]["markets"][0]["question"]
+        words = q[5:-9].split()
+        rng.shuffle(words)
+        kalshi.append({"title": f"Will {' '.join(words[:4])} {rng.choice(vocab)} before {2026 + i % 3}?"})
+    return kalshi, poly
+
+
+def _legacy_best(title, poly):
+    best_score, best = 0.0, None
+    for pe in poly:
+        for pm in pe["markets"]:
+            s = similarity(title, pm.get("question", "") or pe.get("title", ""))
+            if s > best_score:
+                best_score, best = s, pm
+    return best_score, best
+
+
+def main():
+    args = sys.argv[1:]
+    if "--bench" not in args:
+        print(__doc__)
+        return
+    i = args.index("--bench")
+    n_kalshi = int(args[i + 1]) if i + 1 < len(args) else 2000
+    n_poly = int(args[i + 2]) if i + 2 < len(args) else 5000
+    kalshi, poly = _synthetic(n_kalshi, n_poly)
+
+    t0 = time.time()
+    matcher = MarketMatcher(poly)
+    t1 = time.time()
+    results = [matcher.best(k["title"], 0.0) for k in kalshi]
+    t2 = time.time()
+
+    sample = kalshi[:5]
+    t3 = time.time()
+    legacy = [_legacy_best(k["title"], poly) for k in sample]
+    legacy_s = (time.time() - t3) / len(sample)
+    agree = sum(1 for r, (_, pm) in zip(results, legacy) if r and r[2] is pm)
+
+    print(f"⚡ {n_kalshi} × {n_poly} | rapidfuzz={HAVE_RAPIDFUZZ}", file=sys.stderr)
+    print(f"   索引 {t1 - t0:.2f}s, 匹配 {t2 - t1:.2f}s ({(t2 - t1) / n_kalshi * 1000:.2f}ms/条)", file=sys.stderr)
+    print(f"   旧全配对: {legacy_s * 1000:.0f}ms/条 → 全量约 {legacy_s * n_kalshi:.0f}s", file=sys.stderr)
+    print(f"   抽样 {len(sample)} 条与旧结果一致: {agree}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
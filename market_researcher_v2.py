@@ -7,34 +7,135 @@ market_researcher_v2 - 基于官方结算源的深度研究
     - 官方数据源验证
     - 置信度评估
     - 结构化研究报告
+    - 数据源并发抓取 (按域名限速 + 总时限)，多个市场并行研究
+    - 数据源页面走共享磁盘缓存 (ETag/Last-Modified)，页面没变不重新解析
+    - 页面流式解析：预编译模式，找够目标值即停止读取，单页内存/下载量有上限
+    - LLM 数据源识别 (可选，use_llm=True 开启；默认只用规则)：走后台工作池 (llm_pool)，
+      有时限 + 对冲请求，超时直接用规则回退
 
 用法：
     from market_researcher_v2 import MarketResearcherV2
     researcher = MarketResearcherV2()
     result = researcher.research(market_dict)
+    results = researcher.research_many(markets, deadline=60)   # 并行 + 总时限
     
 依赖：
     - source_detector.py
+    - page_cache.py (条件 GET 页面缓存，内部按主机限速)
+    - llm_pool.py (经 backup/llm_source_identifier.py，仅 use_llm=True)
 """
 
 import os
 import sys
 import json
 import re
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime, timezone
 from typing import Optional, Dict, List, Any, Tuple
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from page_cache import get_page
+from llm_pool import LLM_DEADLINE_SECONDS   # LLM 数据源识别的等待上限
+
 try:
     import requests
 except ImportError:
     requests = None
 
+# 单个市场所有数据源的抓取上限 (秒)；超时的源记为 timeout，用已到的数据做判断
+SOURCE_DEADLINE_SECONDS = 20
+SOURCE_WORKERS = 6
+RESEARCH_WORKERS = 4
+
+STREAM_OVERLAP = 2048   # 块之间至少保留的字符数
+
+# data_type → (预编译模式, 需要的匹配数, 锚点, 匹配跨度上限)；找够就停止读取/解析页面
+# 锚点 = 模式的字面开头；跨度上限 None 表示含 .*? (不跨行)，匹配止于锚点所在行
+EXTRACT_PATTERNS = {
+    "gas_price": (re.compile(r'\$(\d+\.\d{3})'), 5, re.compile(r'\$'), 64),                     # AAA 格式
+    "gdp": (re.compile(r'expanded?\s+(\d+\.?\d*)\s*percent', re.IGNORECASE), 1,                    # Trading Economics
+            re.compile(r'expand', re.IGNORECASE), STREAM_OVERLAP),
+    "gdp_history": (re.compile(r'expanded?\s+(\d+\.?\d*)\s*percent', re.IGNORECASE), 1,
+                    re.compile(r'expand', re.IGNORECASE), STREAM_OVERLAP),
+    "unemployment": (re.compile(r'unemployment rate.*?(\d+\.?\d*)\s*percent', re.IGNORECASE), 1,  # BLS
+                     re.compile(r'unemployment rate', re.IGNORECASE), None),
+    "inflation": (re.compile(r'inflation.*?(\d+\.?\d*)\s*percent', re.IGNORECASE), 1,
+                  re.compile(r'inflation', re.IGNORECASE), None),
+}
+
+
+class StreamExtractor:
+    """
+    按块增量提取数值 (page_cache 的流式提取器接口)
+
+    feed(chunk) 返回 True 表示已找够匹配，调用方可以停止下载/解压。
+    结果与整页 finditer 一致：还可能随后续内容匹配成功的锚点 (例如压缩成一行的
+    HTML 里 "unemployment rate" 之后还没出现 "percent") 之前的文本一律保留，
+    该锚点之后的匹配也要等它有定论才确认。所以行很长时缓冲区会跟着变大
+    (上限是 page_cache.MAX_PAGE_BYTES)；没有未决锚点时只保留最后 STREAM_OVERLAP 个字符。
+    前提：模式里的空白段 (\\s*, \\s+) 短于 STREAM_OVERLAP 个字符。
+    """
+
+    def __init__(self, data_type: str):
+        self.data_type = data_type
+        self.pattern, self.wanted, self.anchor, self.span = EXTRACT_PATTERNS.get(data_type, (None, 0, None, 0))
+        self.found: List[str] = []
+        self._buf = ""
+
+    def _is_open(self, buf: str, start: int) -> bool:
+        """从 start 的锚点在 buf 里匹配失败后，补上后续内容是否还可能成功"""
+        if self.span is not None:
+            return start + self.span > len(buf)
+        newline = buf.find("\n", start)
+        return newline < 0 or newline + STREAM_OVERLAP > len(buf)
+
+    def feed(self, chunk: str, final: bool = False) -> bool:
+        if self.pattern is None or len(self.found) >= self.wanted:
+            return True
+        buf = self._buf + chunk
+        limit = len(buf) - STREAM_OVERLAP
+        pos = 0
+        # 匹配只能从锚点开始：按顺序逐个锚点尝试 (= 整页 finditer 的最左匹配)，
+        # 遇到还没定论的锚点就停下，从它开始保留到下一块
+        for a in self.anchor.finditer(buf):
+            if a.start() < pos:
+                continue
+            m = self.pattern.match(buf, a.start())
+            if not final and (m.end() > limit if m else self._is_open(buf, a.start())):
+                self._buf = buf[a.start():]
+                return False
+            if m is None:
+                continue
+            self.found.append(m.group(1))
+            pos = m.end()
+            if len(self.found) >= self.wanted:
+                self._buf = ""
+                return True
+        self._buf = "" if final else buf[max(pos, limit):]
+        return final
+
+    def values(self) -> Dict:
+        result = {}
+        if self.found:
+            result["current"] = float(self.found[0])
+            if self.data_type == "gas_price":
+                result["values"] = [float(p) for p in self.found]
+        return result
+
+
 # 导入 LLM 数据源识别器
 try:
     from llm_source_identifier import LLMSourceIdentifier
     HAS_LLM_IDENTIFIER = True
 except ImportError:
-    HAS_LLM_IDENTIFIER = False
+    try:
+        sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backup"))
+        from llm_source_identifier import LLMSourceIdentifier
+        HAS_LLM_IDENTIFIER = True
+    except ImportError:
+        HAS_LLM_IDENTIFIER = False
 
 
 class MarketResearcherV2:
@@ -82,17 +183,29 @@ class MarketResearcherV2:
         "gas_te": "https://tradingeconomics.com/commodity/gasoline",
     }
     
-    def __init__(self, use_llm=True):
-        self.research_log = []
+    def __init__(self, use_llm=False):
+        """use_llm: 开启 LLM 数据源识别 (每个市场一次付费 Gemini 调用，需要 GEMINI_API_KEY)"""
+        self._tls = threading.local()
         self.use_llm = use_llm and HAS_LLM_IDENTIFIER
         if self.use_llm:
             self.llm_identifier = LLMSourceIdentifier(provider="gemini")
         else:
             self.llm_identifier = None
         
-    def log(self, msg: str):
+    @property
+    def research_log(self) -> List[str]:
+        """当前线程正在做的研究的日志 (research_many 并行时互不干扰)"""
+        if not hasattr(self._tls, "log"):
+            self._tls.log = []
+        return self._tls.log
+    
+    @research_log.setter
+    def research_log(self, value: List[str]):
+        self._tls.log = value
+    
+    def log(self, msg: str, buf: Optional[List[str]] = None):
         ts = datetime.now().strftime("%H:%M:%S")
-        self.research_log.append(f"[{ts}] {msg}")
+        (self.research_log if buf is None else buf).append(f"[{ts}] {msg}")
     
     def extract_official_sources(self, market: Dict) -> List[Dict]:
         """
@@ -139,11 +252,17 @@ class MarketResearcherV2:
         LLM 动态识别需要查询的额外数据源
         
         优先使用 LLM，回退到规则
+        
+        LLM 经 llm_pool 调用，最多等 LLM_DEADLINE_SECONDS；超时立即走规则回退，
+        LLM 结果在后台写入缓存，同模板的后续市场直接命中
         """
         # 尝试使用 LLM
         if self.use_llm and self.llm_identifier:
             try:
-                llm_result = self.llm_identifier.identify_sources(market)
+                llm_result = self.llm_identifier.identify_sources(market, deadline=LLM_DEADLINE_SECONDS)
+                status = llm_result.get('llm_status')
+                if status in ("timeout", "error"):
+                    raise TimeoutError(f">{LLM_DEADLINE_SECONDS:.0f}s" if status == "timeout" else "无结果")
                 additional = []
                 
                 # 转换 LLM 输出格式
@@ -242,74 +361,97 @@ class MarketResearcherV2:
         self.log(f"识别到 {len(additional)} 个额外数据源")
         return additional
     
-    def fetch_source(self, source: Dict) -> Optional[Dict]:
+    def fetch_source(self, source: Dict, log_buf: Optional[List[str]] = None) -> Optional[Dict]:
         """
         获取单个数据源的数据
+        
+        log_buf: 写日志的列表 (线程池里调用时传入发起研究那个线程的日志)
         """
         url = source.get('url')
-        if not url or not requests:
+        if not url:
             return None
         
         try:
-            headers = {"User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7)"}
-            resp = requests.get(url, headers=headers, timeout=15)
-            if resp.status_code != 200:
-                self.log(f"获取失败 {source['source']}: HTTP {resp.status_code}")
+            # 共享页面缓存：新鲜期内不联网，过期后条件 GET；提取结果按正文哈希缓存
+            data_type = source.get('data_type')
+            # 流式提取：找够目标值就停止下载，单页最多读 page_cache.MAX_PAGE_BYTES；
+            # 没有提取模式的类型 (gdp_forecast, speeches, …) 整页读取，raw_length 为全文长度
+            if data_type in EXTRACT_PATTERNS:
+                page = get_page(url, extract_key=f"researcher:{data_type}",
+                                stream=lambda: StreamExtractor(data_type))
+            else:
+                page = get_page(url)
+            if page.status_code != 200:
+                self.log(f"获取失败 {source['source']}: HTTP {page.status_code}", log_buf)
                 return None
             
-            content = resp.text
             result = {
                 "source": source['source'],
                 "url": url,
-                "data_type": source.get('data_type'),
+                "data_type": data_type,
                 "is_official": source.get('is_official', False),
-                "raw_length": len(content),
-                "content": content[:3000],
+                "raw_length": page.length,
+                "content": page.preview,
+                "extracted": page.values or {},
+                "cache": page.cache,
             }
             
-            # 尝试提取数值
-            result["extracted"] = self._extract_values(content, source.get('data_type'))
-            
-            self.log(f"获取成功 {source['source']}: {len(content)} chars, extracted={result['extracted']}")
+            self.log(f"获取成功 {source['source']}: {page.length} chars ({page.cache}), extracted={result['extracted']}", log_buf)
             return result
             
         except Exception as e:
-            self.log(f"获取错误 {source['source']}: {e}")
+            self.log(f"获取错误 {source['source']}: {e}", log_buf)
             return None
     
+    def fetch_sources(self, sources: List[Dict],
+                      deadline: float = SOURCE_DEADLINE_SECONDS) -> Tuple[List[Dict], List[Dict]]:
+        """
+        并发抓取一个市场的所有数据源 (按域名限速见 host_limiter)
+        
+        Returns:
+            (data, timings)  timings = [{"source", "url", "status", "elapsed_ms"}]
+            status: ok / failed / timeout；超时的源不等待，直接用已到的数据
+        """
+        buf = self.research_log
+        todo = [s for s in sources if not s.get('warning') and s.get('url')]
+        if not todo:
+            return [], []
+        
+        def _timed(source):
+            t0 = time.monotonic()
+            result = self.fetch_source(source, buf)
+            return result, (time.monotonic() - t0) * 1000
+        
+        t_start = time.monotonic()
+        pool = ThreadPoolExecutor(max_workers=min(SOURCE_WORKERS, len(todo)))
+        futures = [pool.submit(_timed, s) for s in todo]
+        wait(futures, timeout=deadline)
+        pool.shutdown(wait=False, cancel_futures=True)
+        
+        data, timings = [], []
+        for source, fut in zip(todo, futures):
+            timing = {"source": source['source'], "url": source['url']}
+            if fut.done() and not fut.cancelled():
+                result, elapsed = fut.result()
+                timing.update(status="ok" if result else "failed", elapsed_ms=round(elapsed))
+                if result:
+                    result["elapsed_ms"] = round(elapsed)
+                    data.append(result)
+            else:
+                timing.update(status="timeout", elapsed_ms=round((time.monotonic() - t_start) * 1000))
+                self.log(f"获取超时 {source['source']}: >{deadline:.0f}s")
+            timings.append(timing)
+        return data, timings
+    
     def _extract_values(self, content: str, data_type: str) -> Dict:
         """
-        从内容中提取数值
+        从内容中提取数值 (整段文本；流式抓取见 StreamExtractor)
         """
-        result = {}
-        
-        if data_type == "gas_price":
-            # AAA 格式
-            prices = re.findall(r'\$(\d+\.\d{3})', content)
-            if prices:
-                result["current"] = float(prices[0])
-                result["values"] = [float(p) for p in prices[:5]]
-        
-        elif data_type in ["gdp", "gdp_history"]:
-            # Trading Economics 格式
-            match = re.search(r'expanded?\s+(\d+\.?\d*)\s*percent', content.lower())
-            if match:
-                result["current"] = float(match.group(1))
-        
-        elif data_type == "unemployment":
-            # BLS 格式
-            match = re.search(r'unemployment rate.*?(\d+\.?\d*)\s*percent', content.lower())
-            if match:
-                result["current"] = float(match.group(1))
-        
-        elif data_type == "inflation":
-            match = re.search(r'inflation.*?(\d+\.?\d*)\s*percent', content.lower())
-            if match:
-                result["current"] = float(match.group(1))
-        
-        return result
+        extractor = StreamExtractor(data_type)
+        extractor.feed(content, final=True)
+        return extractor.values()
     
-    def research(self, market: Dict) -> Dict:
+    def research(self, market: Dict, deadline: float = SOURCE_DEADLINE_SECONDS) -> Dict:
         """
         对市场进行完整研究
         
@@ -319,6 +461,7 @@ class MarketResearcherV2:
                 "official_sources": [...],
                 "additional_sources": [...],
                 "data": [...],
+                "source_timings": [...],
                 "judgment": {...},
                 "research_log": [...]
             }
@@ -340,14 +483,8 @@ class MarketResearcherV2:
         if warnings:
             self.log(f"⚠️ 发现不可核查项: {[w['source'] for w in warnings]}")
         
-        # Step 4: 获取数据
-        data = []
-        for source in all_sources:
-            if source.get('warning'):
-                continue
-            fetched = self.fetch_source(source)
-            if fetched:
-                data.append(fetched)
+        # Step 4: 获取数据 (所有源并发)
+        data, timings = self.fetch_sources(all_sources, deadline)
         
         # Step 5: 做出判断
         judgment = self._make_judgment(market, data, warnings)
@@ -359,10 +496,45 @@ class MarketResearcherV2:
             "official_sources": official,
             "additional_sources": additional,
             "data": data,
+            "source_timings": timings,
             "judgment": judgment,
             "research_log": self.research_log.copy(),
         }
     
+    def research_many(self, markets: List[Dict], deadline: Optional[float] = None,
+                      source_deadline: float = SOURCE_DEADLINE_SECONDS,
+                      max_workers: int = RESEARCH_WORKERS) -> List[Dict]:
+        """
+        并行研究多个市场，结果顺序与 markets 一致
+        
+        deadline: 整批的总时限 (秒)；到时还没完成的市场返回 timed_out=True 的空报告
+        """
+        if not markets:
+            return []
+        pool = ThreadPoolExecutor(max_workers=min(max_workers, len(markets)))
+        futures = [pool.submit(self.research, m, source_deadline) for m in markets]
+        wait(futures, timeout=deadline)
+        pool.shutdown(wait=False, cancel_futures=True)
+        
+        reports = []
+        for market, fut in zip(markets, futures):
+            if fut.done() and not fut.cancelled() and fut.exception() is None:
+                reports.append(fut.result())
+                continue
+            self.research_log = []
+            self.log(f"研究未完成: {market.get('ticker', '?')} (总时限 {deadline}s)")
+            reports.append({
+                "market": market,
+                "official_sources": [],
+                "additional_sources": [],
+                "data": [],
+                "source_timings": [],
+                "judgment": self._make_judgment(market, [], []),
+                "research_log": self.research_log.copy(),
+                "timed_out": True,
+            })
+        return reports
+    
     def _make_judgment(self, market: Dict, data: List[Dict], warnings: List[Dict]) -> Dict:
         """
         基于收集的数据做出判断
@@ -5,6 +5,12 @@ market_validator.py - Kalshi Market Validation System
 Classifies markets by type, enforces checklist completion,
 and blocks recommendations when validation is incomplete.
 
+The YAML checklists are compiled once at load: one keyword regex per
+market type (classification is memoized by series prefix) and one
+matcher per type that finds every required item ID in a single pass
+over the analysis text, so validating a batch of analyses does no
+per-call YAML walking, pattern building or per-item rescans.
+
 Usage:
     from market_validator import classify_market, validate_output, get_checklist_prompt
 
@@ -12,16 +18,100 @@ Usage:
     prompt = get_checklist_prompt(market_type)
     # ... run LLM analysis with prompt ...
     validated = validate_output(analysis_text, market_type)
+
+    python market_validator.py --bench 300   # single-pass scan vs per-item search (parity + timing)
 """
 
 import re
+import time
+import random
 import yaml
 from pathlib import Path
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 
 CHECKLISTS_PATH = Path(__file__).parent / "market_checklists.yaml"
 
+# Order matters: more specific first
+TYPE_ORDER = ["weather", "economic", "event"]
+
+_VALIDATION_BLOCK = re.compile(r'###?\s*验证结果|###?\s*VALIDATION', re.IGNORECASE)
+
+# "<id> ...: <answer>" after an item ID: the answer runs to the end of its line
+_ANSWER_TAIL = r'.*?[:：]\s*(.+?)(?:\n|$)'
+_answer_tail = re.compile(_ANSWER_TAIL)
+
+# Characters that re.IGNORECASE folds to an ASCII letter but str.lower() does
+# not (İ also changes length); texts containing them use the IGNORECASE scan
+_FOLD_SPECIAL = ("\u0130", "\u0131", "\u017f")
+
 _checklists_cache: Optional[dict] = None
+_compiled_cache: Optional[Dict[str, "_CompiledChecklist"]] = None
+_keyword_patterns: Optional[List[Tuple[str, "re.Pattern"]]] = None
+_type_by_series: Dict[str, str] = {}
+
+
+def _fold(s: str) -> str:
+    """Lowercase the way re.IGNORECASE compares ASCII letters."""
+    return s.lower().replace("i\u0307", "i").replace("\u0131", "i").replace("\u017f", "s")
+
+
+def _overlaps(a: str, b: str) -> bool:
+    """True if an occurrence of b can start inside an occurrence of a."""
+    return (a != b and b in a) or any(a.endswith(b[:k]) for k in range(1, min(len(a), len(b))))
+
+
+class _CompiledChecklist:
+    """One market type's checklist with a single-pass matcher for its required IDs."""
+    
+    def __init__(self, items: list):
+        self.items = items
+        self.required = [item["id"] for item in items if item.get("fail_if_empty", False)]
+        self._ids_by_key: Dict[str, List[str]] = {}
+        for item_id in self.required:
+            self._ids_by_key.setdefault(item_id.lower(), []).append(item_id)
+        # One regex for all IDs (longest first) with the answer in a lookahead,
+        # so a match consumes only the ID and re skips occurrences that have
+        # no answer. Normally run case-sensitively on text.lower(), which keeps
+        # re's literal-prefix scan. When IDs can overlap each other the scan
+        # resumes one character after each hit, and a hit also answers any
+        # shorter ID that is its prefix.
+        self._keys = sorted(self._ids_by_key, key=len, reverse=True)
+        body = "(?:%s)(?=%s)" % ("|".join(map(re.escape, self._keys)), _ANSWER_TAIL)
+        self._overlapping = any(_overlaps(a, b) for a in self._keys for b in self._keys)
+        self._prefixes = {k: [p for p in self._keys if p != k and k.startswith(p)] for k in self._keys}
+        self._scan_lower = re.compile(body) if self._keys else None
+        self._scan_fold = re.compile(body, re.IGNORECASE) if self._keys else None
+    
+    def scan(self, text: str) -> Tuple[bool, Dict[str, str]]:
+        """→ (has validation block, {required id: first answer}).
+        
+        IDs match case-insensitively; for each ID the first occurrence that
+        is followed by "...: <answer>" on its line wins.
+        """
+        answers: Dict[str, str] = {}
+        if self._keys:
+            fold = any(c in text for c in _FOLD_SPECIAL)
+            haystack, pattern = (text, self._scan_fold) if fold else (text.lower(), self._scan_lower)
+            done = set()
+            match = pattern.search(haystack)
+            while match:
+                key = _fold(match.group()) if fold else match.group()
+                start = match.start()
+                hits = [(key, match.span(1))]
+                for k in self._prefixes[key]:
+                    if k not in done:
+                        answer = _answer_tail.match(text, start + len(k))
+                        if answer:
+                            hits.append((k, answer.span(1)))
+                for k, (a, b) in hits:
+                    if k not in done:
+                        done.add(k)
+                        for item_id in self._ids_by_key[k]:
+                            answers[item_id] = text[a:b]
+                if len(done) == len(self._keys):
+                    break
+                match = pattern.search(haystack, start + 1 if self._overlapping else match.end())
+        return bool(_VALIDATION_BLOCK.search(text)), answers
 
 
 def _load_checklists() -> dict:
@@ -33,27 +123,42 @@ def _load_checklists() -> dict:
     return _checklists_cache
 
 
+def _compiled(market_type: str) -> _CompiledChecklist:
+    """Compiled checklist for a type (unknown types use "other")."""
+    global _compiled_cache
+    if _compiled_cache is None:
+        _compiled_cache = {t: _CompiledChecklist(config.get("checklist", []))
+                           for t, config in _load_checklists().items()}
+    return _compiled_cache.get(market_type, _compiled_cache["other"])
+
+
 def classify_market(ticker: str) -> str:
     """Classify a Kalshi market ticker into a type.
     
+    Classification uses the series prefix (text before the first "-"),
+    so results are memoized per series.
+    
     Args:
         ticker: Kalshi ticker string (e.g. "KXHIGHTEMP-26FEB23-BOS-B42")
     
     Returns:
         One of: "economic", "event", "weather", "other"
     """
-    checklists = _load_checklists()
-    ticker_upper = ticker.upper()
+    global _keyword_patterns
+    series = ticker.partition("-")[0].upper()
+    market_type = _type_by_series.get(series)
+    if market_type is not None:
+        return market_type
     
-    # Check each type's keywords (order matters: more specific first)
-    for market_type in ["weather", "economic", "event"]:
-        config = checklists.get(market_type, {})
-        keywords = config.get("keywords", [])
-        for kw in keywords:
-            if kw in ticker_upper:
-                return market_type
+    if _keyword_patterns is None:
+        checklists = _load_checklists()
+        _keyword_patterns = [
+            (t, re.compile("|".join(map(re.escape, checklists.get(t, {}).get("keywords", [])))))
+            for t in TYPE_ORDER if checklists.get(t, {}).get("keywords")]
     
-    return "other"
+    market_type = next((t for t, pattern in _keyword_patterns if pattern.search(series)), "other")
+    _type_by_series[series] = market_type
+    return market_type
 
 
 def get_checklist_prompt(market_type: str) -> str:
@@ -106,26 +211,12 @@ def validate_output(analysis_text: str, market_type: str) -> dict:
             - has_validation_block: bool
             - recommendation_allowed: bool
     """
-    checklists = _load_checklists()
-    config = checklists.get(market_type, checklists["other"])
-    items = config.get("checklist", [])
+    checklist = _compiled(market_type)
+    has_validation, answers = checklist.scan(analysis_text)
     
-    text_upper = analysis_text.upper()
-    
-    # Check for validation block
-    has_validation = bool(re.search(r'###?\s*验证结果|###?\s*VALIDATION', analysis_text, re.IGNORECASE))
-    
-    # Check each required item
-    missing = []
-    for item in items:
-        if not item.get("fail_if_empty", False):
-            continue
-        item_id = item["id"]
-        # Check if the item ID appears in the output with a non-UNKNOWN answer
-        pattern = rf'{item_id}.*?[:：]\s*(.+?)(?:\n|$)'
-        match = re.search(pattern, analysis_text, re.IGNORECASE)
-        if not match or "UNKNOWN" in match.group(1).upper():
-            missing.append(item_id)
+    # A required item needs a non-UNKNOWN answer
+    missing = [item_id for item_id in checklist.required
+               if item_id not in answers or "UNKNOWN" in answers[item_id].upper()]
     
     return {
         "valid": len(missing) == 0 and has_validation,
@@ -135,7 +226,7 @@ def validate_output(analysis_text: str, market_type: str) -> dict:
     }
 
 
-def enforce_output(analysis_text: str, market_type: str) -> str:
+def enforce_output(analysis_text: str, market_type: str, result: Optional[dict] = None) -> str:
     """Post-process LLM output: append warning if validation is incomplete.
     
     This is the final gate. If validation is missing or incomplete,
@@ -144,11 +235,13 @@ def enforce_output(analysis_text: str, market_type: str) -> str:
     Args:
         analysis_text: The LLM's analysis output
         market_type: Market classification
+        result: validate_output() result for this text, if already computed
     
     Returns:
         Original text (if valid) or text with appended warning + forced SKIP
     """
-    result = validate_output(analysis_text, market_type)
+    if result is None:
+        result = validate_output(analysis_text, market_type)
     
     if result["valid"]:
         return analysis_text
@@ -174,12 +267,72 @@ def enforce_output(analysis_text: str, market_type: str) -> str:
     return analysis_text + "\n".join(warning_lines)
 
 
+def _legacy_answers(text: str, ids: List[str]) -> Dict[str, str]:
+    """Reference: one anchored search per required item (the pre-compiled behaviour)."""
+    answers = {}
+    for item_id in ids:
+        match = re.search(rf'{re.escape(item_id)}.*?[:：]\s*(.+?)(?:\n|$)', text, re.IGNORECASE)
+        if match:
+            answers[item_id] = match.group(1)
+    return answers
+
+
+def _synthetic_analysis(rng: random.Random, ids: List[str]) -> str:
+    """LLM-like analysis: four role sections, IDs mentioned in prose, then the checklist."""
+    words = ["数据", "市场", "分析", "the", "rate", "official", "source", "风险", "预测", "价格", ":"]
+    if rng.random() < 0.05:
+        words += ["ſ", "İ", "ı"]     # IGNORECASE-only folds
+    def mention():
+        item_id = rng.choice(ids)
+        return rng.choice([item_id, item_id.upper(), item_id.title()])
+    lines = []
+    for role in range(4):
+        lines.append(f"## 角色 {role}")
+        for _ in range(rng.randint(5, 15)):
+            line = [rng.choice(words) for _ in range(rng.randint(5, 30))]
+            if rng.random() < 0.02:
+                line.insert(rng.randrange(len(line)), mention())
+            lines.append(" ".join(line))
+    lines.append(rng.choice(["### 验证结果", "### VALIDATION", "## 总结"]))
+    for n, item_id in enumerate(ids, 1):
+        if rng.random() < 0.9:
+            answer = rng.choice(["BLS 2026-10", "UNKNOWN", "2.4%", "", "\n  见上文"])
+            lines.append(f"{n}. **{rng.choice([item_id, item_id.upper()])}** [必填]{rng.choice([':', '：', ''])} {answer}")
+    return "\n".join(lines)
+
+
+def bench(n: int = 300, seed: int = 0) -> bool:
+    """Single-pass scan vs per-item search on synthetic analyses of every type."""
+    _compiled("other")
+    rng = random.Random(seed)
+    ok = True
+    for market_type, checklist in _compiled_cache.items():
+        if not checklist.required:
+            continue
+        texts = [_synthetic_analysis(rng, checklist.required) for _ in range(n)]
+        t0 = time.perf_counter()
+        old = [_legacy_answers(t, checklist.required) for t in texts]
+        t1 = time.perf_counter()
+        new = [checklist.scan(t)[1] for t in texts]
+        t2 = time.perf_counter()
+        mismatches = sum(a != b for a, b in zip(old, new))
+        ok = ok and not mismatches
+        print(f"{'✅' if not mismatches else '❌'} {market_type}: {n} texts, {mismatches} mismatches | "
+              f"per-item {(t1 - t0) * 1000:.0f}ms, single-pass {(t2 - t1) * 1000:.0f}ms "
+              f"({(t1 - t0) / max(t2 - t1, 1e-9):.1f}x)")
+    return ok
+
+
 # --- CLI for testing ---
 if __name__ == "__main__":
     import sys
     
+    if len(sys.argv) > 1 and sys.argv[1] == "--bench":
+        sys.exit(0 if bench(int(sys.argv[2]) if len(sys.argv) > 2 else 300) else 1)
+    
     if len(sys.argv) < 2:
         print("Usage: python market_validator.py <ticker> [--prompt] [--test-output <file>]")
+        print("       python market_validator.py --bench [N]")
         print("\nExamples:")
         print("  python market_validator.py KXCPI-26MAR25 --prompt")
         print("  python market_validator.py KXSHUTDOWN-26MAR25 --prompt")
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+news_cache - 带持久缓存的新闻查询服务 (Google News RSS)
+
+功能：
+    - 查询归一化：小写、去标点/数字/停用词、词排序去重，只用作缓存 key
+      (同一 series 的 "GDP above 2.5%" / "GDP above 3.0%" 归为同一个查询)；
+      实际抓取用原始查询 (归一化后的 key 丢了数字和短词，不能当搜索词)
+    - 持久 TTL 缓存 (data/news_cache.json)：突发类话题 15 分钟，其余 6 小时
+    - 同一查询的并发请求合并 (single-flight)，按主机限速 (host_limiter)
+    - prefetch_news() 一次性并发预取整轮扫描的查询
+    - 同一轮扫描里的重复查询不产生网络请求
+
+用法：
+    from news_cache import search_news, prefetch_news, cached_news, flush_news_cache
+    prefetch_news(queries)                    # 可选：扫描开始时批量预取
+    news = search_news("gdp q4 growth", 5)    # [{title, date}, ...]
+    cached_news("gdp q4 growth")              # 只查缓存，未命中返回 None
+    flush_news_cache("report_v2")             # 写盘 + 打印命中统计
+
+    python news_cache.py "fed rate cut"       # 单次查询 (显示是否命中缓存)
+    python news_cache.py --stats              # 缓存条目统计
+
+依赖：
+    - requests (可选，缺失时用 urllib)
+    - host_limiter.py, market_cache.py (SingleFlight)
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import quote
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from host_limiter import throttle
+from market_cache import SingleFlight
+
+try:
+    import requests
+except ImportError:
+    requests = None
+
+CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "news_cache.json")
+NEWS_URL = "https://news.google.com/rss/search?q={q}&hl=en-US&gl=US&ceid=US:en"
+
+BREAKING_TTL = 15 * 60      # 政策/突发类话题
+DEFAULT_TTL = 6 * 3600
+FETCH_RESULTS = 10          # 每次抓取保存的条数 (调用方再截取 max_results)
+PREFETCH_WORKERS = 4        # 实际并发由 host_limiter 的 news.google.com 上限决定
+
+BREAKING_KEYWORDS = {
+    "shutdown", "tariff", "tariffs", "trump", "fed", "fomc", "strike", "war",
+    "impeach", "impeachment", "election", "breaking", "today", "ceasefire",
+}
+
+STOPWORDS = {
+    "will", "the", "a", "an", "in", "on", "at", "to", "for", "of", "by", "be",
+    "more", "than", "less", "increase", "decrease", "above", "below", "before",
+    "after", "between", "and", "or", "is", "are", "what", "how", "this", "that",
+}
+
+
+def normalize_query(query: str) -> str:
+    """归一化查询 → 缓存 key"""
+    clean = re.sub(r'\*\*', '', query or "")
+    clean = re.sub(r'[^a-z\s]', ' ', clean.lower())
+    terms = sorted({t for t in clean.split() if len(t) > 2 and t not in STOPWORDS})
+    return " ".join(terms)
+
+
+def fetch_query(query: str) -> str:
+    """实际发给 Google News 的查询：原文去掉 markdown 加粗"""
+    return " ".join(re.sub(r'\*\*', '', query or "").split())
+
+
+def ttl_for(key: str) -> int:
+    return BREAKING_TTL if BREAKING_KEYWORDS.intersection(key.split()) else DEFAULT_TTL
+
+
+def fetch_rss(query: str, max_results: int = FETCH_RESULTS) -> Optional[List[Dict]]:
+    """抓取 Google News RSS；网络失败返回 None (不缓存)"""
+    url = NEWS_URL.format(q=quote(query))
+    try:
+        with throttle(url):
+            if requests is not None:
+                text = requests.get(url, timeout=10).text
+            else:
+                import urllib.request
+                with urllib.request.urlopen(urllib.request.Request(url), timeout=10) as resp:
+                    text = resp.read().decode("utf-8")
+    except Exception:
+        return None
+    titles = re.findall(r'<title>(.*?)</title>', text)
+    dates = re.findall(r'<pubDate>(.*?)</pubDate>', text)
+    return [{"title": title, "date": dates[i] if i < len(dates) else ""}
+            for i, title in enumerate(titles[1:max_results + 1])]  # 跳过 feed 标题
+
+
+class NewsService:
+    """归一化 + TTL 缓存 + single-flight 的新闻查询"""
+
+    def __init__(self, path: Optional[str] = None, fetch=fetch_rss):
+        self.path = path or CACHE_FILE
+        self.fetch = fetch
+        self._flight = SingleFlight()
+        self._lock = threading.Lock()
+        self._cache: Optional[Dict[str, Dict]] = None   # key → {ts, ttl, results}
+        self._dirty = False
+        self.stats = {"requests": 0, "cache_hits": 0, "coalesced": 0, "fetches": 0, "errors": 0}
+
+    def _entries(self) -> Dict[str, Dict]:
+        if self._cache is None:
+            try:
+                with open(self.path) as f:
+                    self._cache = json.load(f)
+            except (OSError, ValueError):
+                self._cache = {}
+        return self._cache
+
+    def _fresh(self, key: str) -> Optional[List[Dict]]:
+        entry = self._entries().get(key)
+        if entry and time.time() - entry["ts"] < entry["ttl"]:
+            return entry["results"]
+        return None
+
+    def search(self, query: str, max_results: int = 5) -> List[Dict]:
+        key = normalize_query(query)
+        if not key:
+            return []
+        with self._lock:
+            self.stats["requests"] += 1
+            results = self._fresh(key)
+            if results is not None:
+                self.stats["cache_hits"] += 1
+                return results[:max_results]
+
+        def _fetch():
+            with self._lock:
+                self.stats["fetches"] += 1
+            fetched = self.fetch(fetch_query(query))
+            with self._lock:
+                if fetched is None:
+                    self.stats["errors"] += 1
+                else:
+                    self._entries()[key] = {"ts": time.time(), "ttl": ttl_for(key), "results": fetched}
+                    self._dirty = True
+            return fetched
+
+        results, shared = self._flight.do(key, _fetch)
+        if shared:
+            with self._lock:
+                self.stats["coalesced"] += 1
+        return (results or [])[:max_results]
+
+    def peek(self, query: str, max_results: int = 5) -> Optional[List[Dict]]:
+        """只查缓存 (不联网)；未命中返回 None"""
+        with self._lock:
+            results = self._fresh(normalize_query(query))
+        return None if results is None else results[:max_results]
+
+    def prefetch(self, queries: Iterable[str], workers: int = PREFETCH_WORKERS) -> int:
+        """并发预取未命中的查询 (同一 key 只抓第一个原始查询)，返回实际抓取的数量"""
+        with self._lock:
+            by_key: Dict[str, str] = {}
+            for q in queries:
+                by_key.setdefault(normalize_query(q), q)
+            missing = [q for k, q in by_key.items() if k and self._fresh(k) is None]
+        if missing:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(self.search, missing))
+        return len(missing)
+
+    def save(self):
+        """写盘 (顺便清掉过期条目)；无变化时不写"""
+        with self._lock:
+            if not self._dirty:
+                return
+            now = time.time()
+            live = {k: e for k, e in self._entries().items() if now - e["ts"] < e["ttl"]}
+            self._cache = live
+            self._dirty = False
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(live, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    def reset_stats(self):
+        with self._lock:
+            for k in self.stats:
+                self.stats[k] = 0
+
+    def format_stats(self, label: str = "") -> str:
+        s = self.stats
+        tag = f"[{label}] " if label else ""
+        return (f"📰 {tag}新闻查询: {s['requests']} 次 → {s['fetches']} 次抓取 "
+                f"(缓存 {s['cache_hits']}, 合并 {s['coalesced']}, 失败 {s['errors']})")
+
+
+# 进程内共享实例 (report_v2 / endgame_scanner / notify)
+_service = NewsService()
+
+
+def search_news(query: str, max_results: int = 5) -> List[Dict]:
+    """缓存版 Google News 查询，返回 [{title, date}]"""
+    return _service.search(query, max_results)
+
+
+def cached_news(query: str, max_results: int = 5) -> Optional[List[Dict]]:
+    return _service.peek(query, max_results)
+
+
+def prefetch_news(queries: Iterable[str]) -> int:
+    return _service.prefetch(queries)
+
+
+def flush_news_cache(label: str = "", reset: bool = True):
+    """写盘并打印本轮统计到 stderr (无查询时不打印)"""
+    _service.save()
+    if _service.stats["requests"]:
+        print(_service.format_stats(label), file=sys.stderr, flush=True)
+    if reset:
+        _service.reset_stats()
+
+
+def main():
+    args = sys.argv[1:]
+    if not args:
+        print(__doc__)
+        return
+    if args[0] == "--stats":
+        entries = _service._entries()
+        now = time.time()
+        live = sum(1 for e in entries.values() if now - e["ts"] < e["ttl"])
+        print(f"{len(entries)} entries ({live} fresh) in {_service.path}")
+        return
+    query = " ".join(args)
+    for n in _service.search(query, 10):
+        print(f"  • {n['title']}  ({n['date']})")
+    flush_news_cache(normalize_query(query))
+
+
+if __name__ == "__main__":
+    main()
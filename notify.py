@@ -20,6 +20,7 @@ notify - Telegram 格式化通知
 import requests
 import json
 import os
+import re
 import sys
 import time
 from datetime import datetime, timezone
@@ -30,6 +31,8 @@ from report_v2 import (
     fetch_market_details, analyze_rules, score_market,
     search_news, format_vol, kalshi_url
 )
+from market_cache import log_dedup_stats
+from page_cache import get_page
 
 API_BASE = "https://api.elections.kalshi.com/trade-api/v2"
 
@@ -43,55 +46,65 @@ POLITICAL_SERIES = [
 ]
 
 # --- Fact Verification (official sources) ---
+def _gdp_facts(text):
+    text = text.lower()
+    facts = {}
+    if "fourth quarter" in text or "4th quarter" in text:
+        facts["gdp_q4_status"] = "✅ Released"
+    else:
+        facts["gdp_q4_status"] = "⏳ Not yet (Feb 20)"
+    pct = re.findall(r'(\d+\.\d+)\s*percent', text)
+    if pct:
+        facts["gdp_latest_pct"] = pct[0]
+    if "third quarter" in text:
+        facts["gdp_latest_q"] = "Q3 2025"
+    elif "fourth quarter" in text:
+        facts["gdp_latest_q"] = "Q4 2025"
+    return facts
+
+
+def _cpi_facts(text):
+    text = text.lower()
+    if "january 2026" in text:
+        return {"cpi_jan_status": "✅ Jan 2026 released"}
+    elif "december 2025" in text:
+        return {"cpi_jan_status": "⏳ Jan CPI not yet (Feb ~12)"}
+    return {"cpi_jan_status": "⚠️ Check bls.gov/cpi"}
+
+
+def _shutdown_facts(text):
+    text = text.lower()
+    if "shut down" in text or "shutdown" in text or "lapse" in text:
+        return {"shutdown": "✅ Shutdown active"}
+    elif "open" in text:
+        return {"shutdown": "✅ Govt open"}
+    return {"shutdown": "⚠️ Check opm.gov"}
+
+
+FACT_SOURCES = [
+    ("https://www.bea.gov/data/gdp/gross-domestic-product", "notify:gdp", _gdp_facts,
+     {"gdp_q4_status": "⚠️ Could not verify"}),
+    ("https://www.bls.gov/cpi/", "notify:cpi", _cpi_facts,
+     {"cpi_jan_status": "⚠️ Could not verify"}),
+    ("https://www.opm.gov/policy-data-oversight/snow-dismissal-procedures/current-status/",
+     "notify:shutdown", _shutdown_facts, {"shutdown": "⚠️ Could not verify"}),
+]
+
+
 def verify_facts():
-    """Fetch key data points from official sources."""
+    """
+    Fetch key data points from official sources.
+
+    Pages go through the shared page cache (conditional GET); the extracted
+    facts are cached per page version, so unchanged pages are not re-parsed.
+    """
     facts = {}
-    
-    # GDP - BEA
-    try:
-        r = requests.get("https://www.bea.gov/data/gdp/gross-domestic-product", timeout=10)
-        text = r.text.lower()
-        import re
-        if "fourth quarter" in text or "4th quarter" in text:
-            facts["gdp_q4_status"] = "✅ Released"
-        else:
-            facts["gdp_q4_status"] = "⏳ Not yet (Feb 20)"
-        pct = re.findall(r'(\d+\.\d+)\s*percent', text)
-        if pct:
-            facts["gdp_latest_pct"] = pct[0]
-        if "third quarter" in text:
-            facts["gdp_latest_q"] = "Q3 2025"
-        elif "fourth quarter" in text:
-            facts["gdp_latest_q"] = "Q4 2025"
-    except:
-        facts["gdp_q4_status"] = "⚠️ Could not verify"
-    
-    # CPI - BLS
-    try:
-        r = requests.get("https://www.bls.gov/cpi/", timeout=10)
-        text = r.text.lower()
-        if "january 2026" in text:
-            facts["cpi_jan_status"] = "✅ Jan 2026 released"
-        elif "december 2025" in text:
-            facts["cpi_jan_status"] = "⏳ Jan CPI not yet (Feb ~12)"
-        else:
-            facts["cpi_jan_status"] = "⚠️ Check bls.gov/cpi"
-    except:
-        facts["cpi_jan_status"] = "⚠️ Could not verify"
-    
-    # Govt shutdown - OPM
-    try:
-        r = requests.get("https://www.opm.gov/policy-data-oversight/snow-dismissal-procedures/current-status/", timeout=10)
-        text = r.text.lower()
-        if "shut down" in text or "shutdown" in text or "lapse" in text:
-            facts["shutdown"] = "✅ Shutdown active"
-        elif "open" in text:
-            facts["shutdown"] = "✅ Govt open"
-        else:
-            facts["shutdown"] = "⚠️ Check opm.gov"
-    except:
-        facts["shutdown"] = "⚠️ Could not verify"
-    
+    for url, key, extract, fallback in FACT_SOURCES:
+        try:
+            page = get_page(url, extract_key=key, extract=extract, timeout=10)
+            facts.update(page.values if page.status_code == 200 and page.values else fallback)
+        except Exception:
+            facts.update(fallback)
     return facts
 
 def fact_tag(ticker, facts):
@@ -139,6 +152,15 @@ def scan():
         if data:
             all_markets.extend(data.get("markets", []))
     
+    # Record snapshot into price history (price_store candles)
+    try:
+        from price_store import PriceStore
+        store = PriceStore()
+        store.record_snapshot(all_markets, now.timestamp())
+        store.flush(include_open=True)
+    except Exception as e:
+        print(f"⚠️ price_store: {e}", file=sys.stderr)
+    
     # Step 2: Verify facts from official sources
     facts = verify_facts()
     
@@ -290,6 +312,7 @@ def scan():
         lines.append("😴 Nothing notable right now")
     
     report = "\n".join(lines)
+    log_dedup_stats("notify")
     
     # Save state
     new_state = {
@@ -4,23 +4,70 @@ nowcast_fetcher - 实时经济数据获取
 
 功能：
     - GDPNow: Atlanta Fed RSS
-    - CPI: Cleveland Fed JSON API
-    - 统一接口 get_for_market()
+    - CPI / PCE: Cleveland Fed JSON API
+    - 初请失业金 / 失业率 / 汽油价格: FRED 公开 CSV (最新公布值)
+    - provider 注册表：每个源声明服务的 series、刷新周期和解析器 (register_provider)，
+      按 series 前缀 O(1) 查找；到期的 provider 并行刷新
+    - 统一接口 get_for_market() / distribution() (纯内存查询，不联网)
+    - 持久化 nowcast 库 (data/nowcast_store.json)：保存每个 vintage 及时间，
+      条件 GET (ETag/Last-Modified)，后台定时刷新；新进程直接读盘
+    - vintage 修正幅度统计 (--calibrate)，用于校准 historical_std
+    - 录制原始响应 (--refresh --record) 后可离线回放解析器 (--replay)，新增数据源不用联网调试
 
 用法：
     from nowcast_fetcher import NowcastFetcher
     fetcher = NowcastFetcher()
     result = fetcher.get_for_market("KXGDP", 2.5)
     
+    python nowcast_fetcher.py                # 打印最新 nowcast (直接抓取)
+    python nowcast_fetcher.py --refresh      # 并行刷新所有 provider (--record 同时保存原始响应)
+    python nowcast_fetcher.py --replay       # 用 data/nowcast_payloads/ 里的录制响应跑解析器
+    python nowcast_fetcher.py --providers    # 列出注册的 provider
+    python nowcast_fetcher.py --vintages     # 列出保存的 vintage
+    python nowcast_fetcher.py --calibrate    # vintage 修正幅度 vs 代码里的 historical_std
+    
 依赖：
     - urllib.request
+    - host_limiter.py
 """
 
+import os
+import sys
 import json
 import re
+import time
+import threading
+import statistics
+import urllib.error
 import urllib.request
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from host_limiter import throttle
+
+GDPNOW_RSS_URL = "https://www.atlantafed.org/rss/GDPNow"
+CLEVELAND_CPI_URL = "https://www.clevelandfed.org/-/media/files/webcharts/inflationnowcasting/nowcast_quarter.json"
+FRED_CSV_URL = "https://fred.stlouisfed.org/graph/fredgraph.csv?id={}"
+STORE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "nowcast_store.json")
+RECORD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "nowcast_payloads")
+
+REFRESH_SECONDS = 30 * 60    # 默认刷新间隔 (GDPNow 每周几次、Cleveland Fed 每天一次更新)
+RETRY_BASE_SECONDS = 60      # 抓取失败后的重试间隔：60s 起指数退避，不超过该 provider 的刷新间隔
+STALE_FACTOR = 2             # 超过 STALE_FACTOR × 刷新间隔没检查过 → 同步刷新，不用旧值
+CPI_QUARTERS = 4
+FRED_OBSERVATIONS = 8        # FRED vintage 保留最近几期 (修正统计用)
+NOWCAST_WORKERS = 6
+
+# z-score 用的标准差 (按 provider)；--calibrate 可对比 vintage 修正幅度
+HISTORICAL_STD = {
+    "gdpnow": 0.5,            # %
+    "cleveland_cpi": 0.3,     # %
+    "fred_claims": 15000,     # 人，周度变化 (阈值由 extract_threshold 按人数解析 "220,000"/"220K")
+    "fred_unrate": 0.15,      # 百分点，月度变化
+    "fred_gas": 0.05,         # $/gal，周度变化
+}
 
 
 def fetch_gdpnow() -> Dict[str, Any]:
@@ -30,38 +77,50 @@ def fetch_gdpnow() -> Dict[str, Any]:
     Returns:
         Dict with 'value' (float), 'date' (str), 'quarter' (str), 'source' (str)
     """
-    url = "https://www.atlantafed.org/rss/GDPNow"
+    url = GDPNOW_RSS_URL
     
     try:
         req = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
         with urllib.request.urlopen(req, timeout=15) as resp:
             content = resp.read().decode('utf-8')
         
-        # Parse RSS content for latest GDPNow estimate
-        # Look for pattern like "3.1 percent" in description
-        match = re.search(r'([+-]?\d+\.?\d*)\s*percent', content, re.IGNORECASE)
-        if match:
-            value = float(match.group(1))
-            
-            # Extract date from pubDate
-            date_match = re.search(r'<pubDate>([^<]+)</pubDate>', content)
-            pub_date = date_match.group(1) if date_match else datetime.now().strftime('%Y-%m-%d')
-            
-            # Extract quarter info
-            quarter_match = re.search(r'(Q[1-4]\s*\d{4}|\d{4}:Q[1-4])', content)
-            quarter = quarter_match.group(1) if quarter_match else "Current"
-            
-            return {
-                'value': value,
-                'date': pub_date,
-                'quarter': quarter,
-                'source': 'Atlanta Fed GDPNow RSS',
-                'url': url
-            }
+        parsed = parse_gdpnow_rss(content)
+        if parsed:
+            return parsed
     except Exception as e:
         print(f"[GDPNow] Error fetching RSS: {e}")
     
-    # Fallback: scrape the main page
+    return fetch_gdpnow_page()
+
+
+def parse_gdpnow_rss(content: str) -> Optional[Dict[str, Any]]:
+    """GDPNow RSS → {'value', 'date', 'quarter', 'source', 'url'}；解析不到返回 None"""
+    # Parse RSS content for latest GDPNow estimate
+    # Look for pattern like "3.1 percent" in description
+    match = re.search(r'([+-]?\d+\.?\d*)\s*percent', content, re.IGNORECASE)
+    if not match:
+        return None
+    value = float(match.group(1))
+    
+    # Extract date from pubDate
+    date_match = re.search(r'<pubDate>([^<]+)</pubDate>', content)
+    pub_date = date_match.group(1) if date_match else datetime.now().strftime('%Y-%m-%d')
+    
+    # Extract quarter info
+    quarter_match = re.search(r'(Q[1-4]\s*\d{4}|\d{4}:Q[1-4])', content)
+    quarter = quarter_match.group(1) if quarter_match else "Current"
+    
+    return {
+        'value': value,
+        'date': pub_date,
+        'quarter': quarter,
+        'source': 'Atlanta Fed GDPNow RSS',
+        'url': GDPNOW_RSS_URL
+    }
+
+
+def fetch_gdpnow_page() -> Dict[str, Any]:
+    """RSS 失败时的回退：抓 GDPNow 主页"""
     try:
         page_url = "https://www.atlantafed.org/cqer/research/gdpnow"
         req = urllib.request.Request(page_url, headers={'User-Agent': 'Mozilla/5.0'})
@@ -99,66 +158,14 @@ def fetch_cleveland_fed_cpi(recent_only: bool = True, num_quarters: int = 4) ->
     Returns:
         Dict with CPI, Core CPI, PCE, Core PCE nowcasts and metadata
     """
-    url = "https://www.clevelandfed.org/-/media/files/webcharts/inflationnowcasting/nowcast_quarter.json"
+    url = CLEVELAND_CPI_URL
     
     try:
         req = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
         with urllib.request.urlopen(req, timeout=15) as resp:
             content = resp.read().decode('utf-8')
         
-        # Parse JSON - it's an array of quarters
-        data = json.loads(content)
-        
-        # Get only recent quarters if requested
-        if recent_only:
-            data = data[-num_quarters:]
-        
-        result = {
-            'quarters': [],
-            'source': 'Cleveland Fed Inflation Nowcasting',
-            'url': url,
-            'fetched_at': datetime.now().isoformat()
-        }
-        
-        for quarter_data in data:
-            chart = quarter_data.get('chart', {})
-            quarter_name = chart.get('subcaption', 'Unknown')
-            
-            quarter_result = {
-                'quarter': quarter_name,
-                'cpi': None,
-                'core_cpi': None,
-                'pce': None,
-                'core_pce': None
-            }
-            
-            # Parse dataset to extract latest values
-            dataset = quarter_data.get('dataset', [])
-            for series in dataset:
-                series_name = series.get('seriesname', '').lower()
-                data_points = series.get('data', [])
-                
-                # Get the last non-empty value
-                for point in reversed(data_points):
-                    value = point.get('value', '')
-                    if value and value.strip():
-                        try:
-                            val = float(value)
-                            if 'core cpi' in series_name and 'actual' not in series_name:
-                                quarter_result['core_cpi'] = val
-                            elif 'cpi' in series_name and 'actual' not in series_name:
-                                quarter_result['cpi'] = val
-                            elif 'core pce' in series_name and 'actual' not in series_name:
-                                quarter_result['core_pce'] = val
-                            elif 'pce' in series_name and 'actual' not in series_name:
-                                quarter_result['pce'] = val
-                            break
-                        except ValueError:
-                            continue
-            
-            result['quarters'].append(quarter_result)
-        
-        return result
+        return parse_cleveland_cpi(content, recent_only, num_quarters)
         
     except Exception as e:
         print(f"[Cleveland Fed] Error: {e}")
@@ -168,6 +175,63 @@ def fetch_cleveland_fed_cpi(recent_only: bool = True, num_quarters: int = 4) ->
         }
 
 
+def parse_cleveland_cpi(content: str, recent_only: bool = True, num_quarters: int = 4) -> Dict[str, Any]:
+    """Cleveland Fed nowcast_quarter.json → {'quarters': [...], 'source', 'url', 'fetched_at'}"""
+    # Parse JSON - it's an array of quarters
+    data = json.loads(content)
+    
+    # Get only recent quarters if requested
+    if recent_only:
+        data = data[-num_quarters:]
+    
+    result = {
+        'quarters': [],
+        'source': 'Cleveland Fed Inflation Nowcasting',
+        'url': CLEVELAND_CPI_URL,
+        'fetched_at': datetime.now().isoformat()
+    }
+    
+    for quarter_data in data:
+        chart = quarter_data.get('chart', {})
+        quarter_name = chart.get('subcaption', 'Unknown')
+        
+        quarter_result = {
+            'quarter': quarter_name,
+            'cpi': None,
+            'core_cpi': None,
+            'pce': None,
+            'core_pce': None
+        }
+        
+        # Parse dataset to extract latest values
+        dataset = quarter_data.get('dataset', [])
+        for series in dataset:
+            series_name = series.get('seriesname', '').lower()
+            data_points = series.get('data', [])
+            
+            # Get the last non-empty value
+            for point in reversed(data_points):
+                value = point.get('value', '')
+                if value and value.strip():
+                    try:
+                        val = float(value)
+                        if 'core cpi' in series_name and 'actual' not in series_name:
+                            quarter_result['core_cpi'] = val
+                        elif 'cpi' in series_name and 'actual' not in series_name:
+                            quarter_result['cpi'] = val
+                        elif 'core pce' in series_name and 'actual' not in series_name:
+                            quarter_result['core_pce'] = val
+                        elif 'pce' in series_name and 'actual' not in series_name:
+                            quarter_result['pce'] = val
+                        break
+                    except ValueError:
+                        continue
+        
+        result['quarters'].append(quarter_result)
+    
+    return result
+
+
 def get_latest_cpi_nowcast() -> Optional[float]:
     """Get the latest CPI inflation nowcast value."""
     data = fetch_cleveland_fed_cpi()
@@ -194,106 +258,503 @@ def fetch_all_nowcasts() -> Dict[str, Any]:
     }
 
 
-class NowcastFetcher:
-    """Wrapper class for compatibility with kalshi_pipeline.py"""
+def _conditional_get(url: str, meta: Dict, timeout: float = 15) -> Tuple[int, str, Optional[str], Optional[str]]:
+    """条件 GET → (status, content, etag, last_modified)；未变化返回 304"""
+    headers = {'User-Agent': 'Mozilla/5.0'}
+    if meta.get('etag'):
+        headers['If-None-Match'] = meta['etag']
+    if meta.get('last_modified'):
+        headers['If-Modified-Since'] = meta['last_modified']
+    try:
+        with throttle(url):
+            with urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=timeout) as resp:
+                return (resp.status, resp.read().decode('utf-8'),
+                        resp.headers.get('ETag'), resp.headers.get('Last-Modified'))
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return 304, "", meta.get('etag'), meta.get('last_modified')
+        raise
+
+
+# ============================================================
+# Provider 注册表：每个 nowcast 源声明服务的 series、刷新周期和解析器
+# ============================================================
+
+class NowcastProvider:
+    """
+    一个 nowcast 数据源
+    
+    series: {series 前缀: 字段}，value() 按字段从 vintage 里取值
+    parse(content) 是纯函数：录制的 payload 可离线回放 (--record / --replay)
+    """
+    
+    def __init__(self, name: str, url: str, series: Dict[str, str], label: str,
+                 refresh_seconds: float = REFRESH_SECONDS, digits: Optional[int] = None):
+        self.name = name
+        self.url = url
+        self.series = series
+        self.label = label
+        self.refresh_seconds = refresh_seconds
+        self.digits = digits              # nowcast_value 的显示精度 (None = 原值)
     
+    @property
+    def std(self) -> float:
+        return HISTORICAL_STD[self.name]
+    
+    @property
+    def primary_field(self) -> str:
+        return next(iter(self.series.values()))
+    
+    def parse(self, content: str) -> Optional[Dict]:
+        """原始响应 → vintage (不含 ts)；解析不到返回 None"""
+        raise NotImplementedError
+    
+    def fallback(self) -> Optional[Dict]:
+        """主 URL 不可用时的备用抓取 (不走条件 GET)；默认没有"""
+        return None
+    
+    def value(self, vintage: Dict, field: str) -> Optional[Tuple[float, str]]:
+        """vintage → (值, 来源说明)；没有该字段返回 None"""
+        v = vintage.get(field)
+        return None if v is None else (v, self.label)
+    
+    def history(self, vintage: Dict) -> List[Tuple[str, float]]:
+        """vintage 里的 (期, 值)，用于 vintage 修正幅度统计"""
+        v = vintage.get(self.primary_field)
+        return [] if v is None else [(vintage.get("quarter") or vintage.get("date") or "?", v)]
+
+
+class GDPNowProvider(NowcastProvider):
     def __init__(self):
-        self._gdp_cache = None
-        self._cpi_cache = None
-        self._cache_time = None
-    
-    def _refresh_cache(self):
-        """Refresh cache if older than 5 minutes."""
-        now = datetime.now()
-        if self._cache_time and (now - self._cache_time).seconds < 300:
-            return
+        super().__init__("gdpnow", GDPNOW_RSS_URL, {"KXGDP": "value"}, "Atlanta Fed GDPNow")
+    
+    def parse(self, content: str) -> Optional[Dict]:
+        parsed = parse_gdpnow_rss(content)
+        return {k: parsed[k] for k in ("value", "date", "quarter")} if parsed else None
+    
+    def fallback(self) -> Optional[Dict]:
+        page = fetch_gdpnow_page()
+        return {k: page[k] for k in ("value", "date", "quarter")} if page.get("value") is not None else None
+
+
+class ClevelandProvider(NowcastProvider):
+    def __init__(self):
+        super().__init__("cleveland_cpi", CLEVELAND_CPI_URL,
+                         {"KXCPI": "cpi", "KXCPICORE": "core_cpi", "KXPCE": "pce", "KXPCECORE": "core_pce"},
+                         "Cleveland Fed", digits=2)
+    
+    def parse(self, content: str) -> Optional[Dict]:
+        parsed = parse_cleveland_cpi(content, recent_only=True, num_quarters=CPI_QUARTERS)
+        return {"quarters": parsed["quarters"]} if parsed.get("quarters") else None
+    
+    def value(self, vintage: Dict, field: str) -> Optional[Tuple[float, str]]:
+        # 最近一个有该字段的季度
+        for q in reversed(vintage.get("quarters", [])):
+            if q.get(field) is not None:
+                return q[field], f"{self.label} ({q['quarter']})"
+        return None
+    
+    def history(self, vintage: Dict) -> List[Tuple[str, float]]:
+        field = self.primary_field
+        return [(q["quarter"], q[field]) for q in vintage.get("quarters", []) if q.get(field) is not None]
+
+
+def parse_fred_csv(content: str, keep: int = FRED_OBSERVATIONS) -> Optional[Dict]:
+    """FRED fredgraph.csv → {'value', 'date', 'observations': [[date, value], ...最近 keep 个]}"""
+    lines = content.lstrip().splitlines()
+    if not lines or not lines[0].lower().startswith(("date", "observation_date")):
+        return None
+    rows = []
+    for line in lines[1:]:
+        date, _, val = line.partition(",")
+        try:
+            rows.append([date.strip(), float(val)])
+        except ValueError:
+            continue    # "." = 缺失值
+    if not rows:
+        return None
+    rows = rows[-keep:]
+    return {"value": rows[-1][1], "date": rows[-1][0], "observations": rows}
+
+
+class FredProvider(NowcastProvider):
+    """FRED 公开 CSV (不需要 API key)；最新一期公布值作为下一期的锚点"""
+    
+    def __init__(self, name: str, fred_id: str, series: List[str], label: str,
+                 refresh_seconds: float = 6 * 3600):
+        super().__init__(name, FRED_CSV_URL.format(fred_id), {s: "value" for s in series},
+                         f"{label} (FRED {fred_id})", refresh_seconds)
+    
+    def parse(self, content: str) -> Optional[Dict]:
+        return parse_fred_csv(content)
+    
+    def value(self, vintage: Dict, field: str) -> Optional[Tuple[float, str]]:
+        v = vintage.get(field)
+        return None if v is None else (v, f"{self.label} {vintage.get('date', '')}".rstrip())
+    
+    def history(self, vintage: Dict) -> List[Tuple[str, float]]:
+        # 同一观测日期的值在后续 vintage 里被修正
+        return [(d, v) for d, v in vintage.get("observations", [])]
+
+
+PROVIDERS: Dict[str, NowcastProvider] = {}
+SERIES_INDEX: Dict[str, Tuple[NowcastProvider, str]] = {}     # series 前缀 → (provider, 字段)
+_resolved: Dict[str, Optional[Tuple[NowcastProvider, str]]] = {}
+
+
+def register_provider(provider: NowcastProvider) -> NowcastProvider:
+    """注册 (或替换同名) provider；series 冲突时后注册的优先"""
+    old = PROVIDERS.get(provider.name)
+    if old is not None:
+        for s in old.series:
+            SERIES_INDEX.pop(s, None)
+    PROVIDERS[provider.name] = provider
+    for s, field in provider.series.items():
+        SERIES_INDEX[s.upper()] = (provider, field)
+    _resolved.clear()
+    return provider
+
+
+def provider_for(series: str) -> Optional[Tuple[NowcastProvider, str]]:
+    """
+    series (或完整 ticker) → (provider, 字段)；没有对应数据源返回 None
+    
+    精确匹配优先，否则取最长的已注册前缀 (KXCPIYOY → KXCPI)；结果按 series 记住，之后 O(1)
+    """
+    key = series.upper().split("-")[0]
+    try:
+        return _resolved[key]
+    except KeyError:
+        pass
+    hit = SERIES_INDEX.get(key)
+    if hit is None:
+        prefixes = [s for s in SERIES_INDEX if key.startswith(s)]
+        hit = SERIES_INDEX[max(prefixes, key=len)] if prefixes else None
+    _resolved[key] = hit
+    return hit
+
+
+register_provider(GDPNowProvider())
+register_provider(ClevelandProvider())
+register_provider(FredProvider("fred_claims", "ICSA", ["KXJOBLESS"], "DOL initial claims",
+                               refresh_seconds=3 * 3600))
+# 只注册问"某一期数值"的 series；KXGASMAX / KXU3MAX 问的是一段时间内的最大值，单点值模型不适用
+register_provider(FredProvider("fred_unrate", "UNRATE", ["KXUNEMPLOY"], "BLS unemployment rate"))
+register_provider(FredProvider("fred_gas", "GASREGW", ["KXAAGAS", "KXGASAVG"], "EIA regular gasoline"))
+
+
+class NowcastStore:
+    """
+    持久化 nowcast 库：每个 provider 保存全部 vintage
+    
+    {provider: {"etag", "last_modified", "checked_at", "failures", "retry_at", "vintages": [{"ts", ...解析结果}]}}
+    值变化时才追加 vintage；未变化 (304 或内容相同) 只更新 checked_at。
+    各 provider 按自己的刷新周期到期，到期的并行刷新；抓取失败的按 retry_at 退避。
+    """
+    
+    def __init__(self, path: Optional[str] = None, providers: Optional[Dict[str, NowcastProvider]] = None):
+        self.path = path or STORE_FILE
+        self.providers = PROVIDERS if providers is None else providers
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.data: Dict[str, Dict] = self._load()
+    
+    def _load(self) -> Dict[str, Dict]:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    def save(self):
+        with self._lock:
+            payload = json.dumps(self.data)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(payload)
+        os.replace(tmp, self.path)
+    
+    def latest(self, source: str) -> Optional[Dict]:
+        vintages = self.data.get(source, {}).get("vintages")
+        return vintages[-1] if vintages else None
+    
+    def vintages(self, source: str) -> List[Dict]:
+        return list(self.data.get(source, {}).get("vintages", []))
+    
+    def _next_due(self, name: str) -> float:
+        entry = self.data.get(name, {})
+        if entry.get("retry_at"):
+            return entry["retry_at"]
+        return (entry.get("checked_at") or 0.0) + self.providers[name].refresh_seconds
+    
+    def due(self) -> List[str]:
+        """到了刷新周期的 provider"""
+        now = time.time()
+        return [name for name in self.providers if self._next_due(name) <= now]
+    
+    def next_due_in(self) -> float:
+        """距下一个 provider 到期的秒数 (≤0 表示已有到期的)"""
+        return min((self._next_due(name) for name in self.providers), default=float("inf")) - time.time()
+    
+    def refresh_source(self, source: str, record: bool = False) -> str:
+        """
+        条件 GET 一个 provider → new / unchanged / not_modified / error
         
-        self._gdp_cache = fetch_gdpnow()
-        self._cpi_cache = fetch_cleveland_fed_cpi(recent_only=True, num_quarters=4)
-        self._cache_time = now
+        record: 同时把原始响应存到 data/nowcast_payloads/ (供 --replay 离线回放)
+        """
+        provider = self.providers[source]
+        with self._lock:
+            meta = dict(self.data.get(source, {}))
+        try:
+            status, content, etag, last_modified = _conditional_get(provider.url, meta)
+            vintage = provider.parse(content) if status == 200 else None
+        except Exception as e:
+            print(f"[NowcastStore] {source} error: {e}", file=sys.stderr)
+            status, content, vintage = 0, "", None
+        if record and status == 200:
+            _record_payload(source, content)
+        if status == 200 and vintage is None:
+            status = 0
+        if status not in (200, 304):
+            vintage = provider.fallback()
+            if vintage is None:
+                self._backoff(source)
+                return "error"
+            status, etag, last_modified = 200, None, None
+        
+        now = time.time()
+        with self._lock:
+            entry = self.data.setdefault(source, {"vintages": []})
+            entry.update(etag=etag, last_modified=last_modified, checked_at=now, failures=0, retry_at=None)
+            if status == 304:
+                return "not_modified"
+            last = entry["vintages"][-1] if entry["vintages"] else None
+            if last is not None and {k: v for k, v in last.items() if k != "ts"} == vintage:
+                return "unchanged"
+            entry["vintages"].append(dict(vintage, ts=now))
+            return "new"
     
-    def get_for_market(self, series: str, threshold: float) -> Optional[Dict[str, Any]]:
+    def _backoff(self, source: str):
+        """记录失败：下次重试 = now + min(刷新间隔, RETRY_BASE_SECONDS · 2^(连续失败数-1))；checked_at 不动"""
+        with self._lock:
+            entry = self.data.setdefault(source, {"vintages": []})
+            entry["failures"] = failures = entry.get("failures", 0) + 1
+            delay = min(self.providers[source].refresh_seconds, RETRY_BASE_SECONDS * 2 ** min(failures - 1, 16))
+            entry["retry_at"] = time.time() + delay
+    
+    def refresh(self, sources: Optional[List[str]] = None, record: bool = False) -> Dict[str, str]:
         """
-        Get nowcast data for a specific market.
+        并行刷新 (默认全部 provider) 并写盘；并发调用只跑一次
         
-        Args:
-            series: Series ticker (e.g., "KXGDP", "KXCPI")
-            threshold: Market threshold (e.g., 2.5 for "above 2.5%")
+        同主机的请求由 host_limiter 限流，总耗时约等于最慢的一个源
+        """
+        sources = list(self.providers) if sources is None else sources
+        if not sources or not self._refresh_lock.acquire(blocking=False):
+            return {}
+        try:
+            with ThreadPoolExecutor(max_workers=min(NOWCAST_WORKERS, len(sources))) as pool:
+                results = dict(zip(sources, pool.map(lambda s: self.refresh_source(s, record), sources)))
+            self.save()
+            return results
+        finally:
+            self._refresh_lock.release()
+    
+    def is_stale(self, name: str) -> bool:
+        """从没检查过，或上次检查已超过 STALE_FACTOR × 刷新间隔"""
+        checked = self.data.get(name, {}).get("checked_at")
+        return not checked or time.time() - checked > STALE_FACTOR * self.providers[name].refresh_seconds
+    
+    def ensure_fresh(self, block: bool = False):
+        """
+        刷新到期的 provider；block=False 时在后台线程刷新
         
-        Returns:
-            Dict with nowcast_value, threshold, direction, z_score, confidence, source
+        有 provider 从没抓过或已过期太久 (见 STALE_FACTOR) 时同步刷新，
+        短命进程 (cron 跑的 pipeline) 不会拿着任意旧的值直接算信号
         """
-        self._refresh_cache()
+        due = self.due()
+        if not due:
+            return
+        if block or any(self.is_stale(name) for name in due):
+            self.refresh(due)
+        else:
+            threading.Thread(target=self.refresh, args=(due,), name="nowcast-refresh", daemon=True).start()
+    
+    def start_background(self):
+        """后台按各 provider 的周期刷新 (daemon 线程，进程内只启动一次)"""
+        if self._thread is not None:
+            return
+        
+        def _loop():
+            while True:
+                time.sleep(max(1.0, self.next_due_in()))
+                self.refresh(self.due())
         
-        series_upper = series.upper()
+        self._thread = threading.Thread(target=_loop, name="nowcast-schedule", daemon=True)
+        self._thread.start()
+    
+    def revision_std(self, source: str) -> Optional[Tuple[float, int]]:
+        """
+        vintage 修正幅度：同一期各 vintage 与该期最后一个 vintage 的差的标准差
         
-        if "GDP" in series_upper:
-            return self._get_gdp_nowcast(threshold)
-        elif "CPI" in series_upper:
-            return self._get_cpi_nowcast(threshold)
-        elif "FED" in series_upper:
-            # Fed rate decisions - would need CME FedWatch
+        Returns:
+            (std, 样本数)；样本不足返回 None
+        """
+        provider = self.providers[source]
+        by_period: Dict[str, List[float]] = {}
+        for v in self.vintages(source):
+            for period, value in provider.history(v):
+                values = by_period.setdefault(period, [])
+                if not values or values[-1] != value:
+                    values.append(value)
+        diffs = [x - values[-1] for values in by_period.values() if len(values) > 1 for x in values[:-1]]
+        if len(diffs) < 2:
             return None
+        return statistics.pstdev(diffs), len(diffs)
+
+
+def _record_payload(source: str, content: str):
+    os.makedirs(RECORD_DIR, exist_ok=True)
+    with open(os.path.join(RECORD_DIR, f"{source}.payload"), "w") as f:
+        f.write(content)
+
+
+def replay(record_dir: Optional[str] = None) -> Dict[str, Optional[Dict[str, Any]]]:
+    """
+    用录制的 payload 离线跑每个 provider 的解析器
+    
+    Returns:
+        {provider: {series: 值} 或 None (解析失败)}；没有录制文件的 provider 不出现
+    """
+    record_dir = record_dir or RECORD_DIR
+    results = {}
+    for name, provider in PROVIDERS.items():
+        path = os.path.join(record_dir, f"{name}.payload")
+        if not os.path.exists(path):
+            continue
+        with open(path) as f:
+            vintage = provider.parse(f.read())
+        results[name] = None if vintage is None else {
+            s: (provider.value(vintage, field) or (None,))[0] for s, field in provider.series.items()}
+    return results
+
+
+# 进程内共享实例
+_store: Optional[NowcastStore] = None
+
+
+def get_store() -> NowcastStore:
+    global _store
+    if _store is None:
+        _store = NowcastStore()
+    return _store
+
+
+class NowcastFetcher:
+    """Wrapper class for compatibility with kalshi_pipeline.py"""
+    
+    def __init__(self, store: Optional[NowcastStore] = None, background: bool = True):
+        """
+        读盘即可用；到期的 provider 后台刷新 (从没抓过或过期太久的同步刷新)
         
-        return None
+        background: 同时启动定时刷新线程 (常驻进程用)
+        """
+        self.store = store or get_store()
+        self.store.ensure_fresh()
+        if background:
+            self.store.start_background()
     
-    def _get_gdp_nowcast(self, threshold: float) -> Optional[Dict[str, Any]]:
-        """Get GDP nowcast signal."""
-        if not self._gdp_cache or self._gdp_cache.get('value') is None:
+    def _latest(self, series: str) -> Optional[Tuple[NowcastProvider, float, str, Dict[str, Any]]]:
+        """series → (provider, 最新值, 来源说明, 时效信息)；纯内存查询"""
+        hit = provider_for(series)
+        if hit is None:
             return None
+        provider, field = hit
+        vintage = self.store.latest(provider.name)
+        got = provider.value(vintage, field) if vintage else None
+        if got is None:
+            return None
+        checked = self.store.data.get(provider.name, {}).get("checked_at") or vintage["ts"]
+        age = {"vintage_ts": vintage["ts"], "as_of": checked, "age_seconds": time.time() - checked}
+        return provider, got[0], got[1], age
+    
+    def get_for_market(self, series: str, threshold: float) -> Optional[Dict[str, Any]]:
+        """
+        Get nowcast data for a specific market.
         
-        nowcast_value = self._gdp_cache['value']
+        Args:
+            series: Series ticker (e.g., "KXGDP", "KXCPI")
+            threshold: Market threshold (e.g., 2.5 for "above 2.5%")
         
-        # Calculate z-score (assuming ~0.5% historical std)
-        historical_std = 0.5
-        z_score = (nowcast_value - threshold) / historical_std
+        Returns:
+            Dict with nowcast_value, threshold, direction, z_score, confidence, source,
+            vintage_ts (值出现的时间), as_of (上次确认的时间), age_seconds
+            (没有注册 provider 的 series，如 KXFED，返回 None)
+        """
+        latest = self._latest(series)
+        if latest is None:
+            return None
+        provider, nowcast_value, source, age = latest
         
+        z_score = (nowcast_value - threshold) / provider.std
         direction = "yes" if nowcast_value > threshold else "no"
         confidence = min(1.0, abs(z_score) / 2)
         
         return {
-            "nowcast_value": nowcast_value,
+            "nowcast_value": nowcast_value if provider.digits is None else round(nowcast_value, provider.digits),
             "threshold": threshold,
             "direction": direction,
             "z_score": z_score,
             "confidence": confidence,
-            "source": "Atlanta Fed GDPNow"
+            "source": source,
+            **age,
         }
     
-    def _get_cpi_nowcast(self, threshold: float) -> Optional[Dict[str, Any]]:
-        """Get CPI nowcast signal."""
-        if not self._cpi_cache or 'quarters' not in self._cpi_cache:
+    def distribution(self, series: str) -> Optional[Dict[str, Any]]:
+        """
+        nowcast 分布 {"mean", "sigma", "bias", "source", "vintage_ts", "as_of", "age_seconds"}，
+        供 fair_value.price_ladder 一次给整个阶梯定价
+        """
+        latest = self._latest(series)
+        if latest is None:
             return None
-        
-        # Get most recent quarter with CPI data
-        for q in reversed(self._cpi_cache['quarters']):
-            if q.get('cpi') is not None:
-                nowcast_value = q['cpi']
-                
-                # Calculate z-score (assuming ~0.3% historical std for CPI)
-                historical_std = 0.3
-                z_score = (nowcast_value - threshold) / historical_std
-                
-                direction = "yes" if nowcast_value > threshold else "no"
-                confidence = min(1.0, abs(z_score) / 2)
-                
-                return {
-                    "nowcast_value": round(nowcast_value, 2),
-                    "threshold": threshold,
-                    "direction": direction,
-                    "z_score": z_score,
-                    "confidence": confidence,
-                    "source": f"Cleveland Fed ({q['quarter']})"
-                }
-        
-        return None
+        provider, mean, source, age = latest
+        return {"mean": mean, "sigma": provider.std, "bias": 0.0, "source": source, **age}
 
 
 if __name__ == "__main__":
-    import sys
-    
     if len(sys.argv) > 1 and sys.argv[1] == '--json':
         print(json.dumps(fetch_all_nowcasts(), indent=2))
+    elif len(sys.argv) > 1 and sys.argv[1] == '--refresh':
+        store = get_store()
+        t0 = time.time()
+        print(store.refresh(record='--record' in sys.argv))
+        print(f"  ({time.time() - t0:.1f}s, {len(store.providers)} providers 并行)")
+        for source in store.providers:
+            print(f"  {source}: {len(store.vintages(source))} vintages")
+    elif len(sys.argv) > 1 and sys.argv[1] == '--replay':
+        for name, values in replay(sys.argv[2] if len(sys.argv) > 2 else None).items():
+            print(f"{'✅' if values else '❌'} {name}: {values}")
+    elif len(sys.argv) > 1 and sys.argv[1] == '--providers':
+        for name, p in PROVIDERS.items():
+            print(f"{name}: {', '.join(p.series)} | 每 {p.refresh_seconds / 60:.0f} 分钟 | std {p.std} | {p.url}")
+    elif len(sys.argv) > 1 and sys.argv[1] == '--vintages':
+        store = get_store()
+        for source, provider in store.providers.items():
+            print(f"{source}:")
+            for v in store.vintages(source):
+                ts = datetime.fromtimestamp(v['ts']).strftime('%Y-%m-%d %H:%M')
+                values = [(s, provider.value(v, field)) for s, field in provider.series.items()]
+                print(f"  {ts}  " + ", ".join(f"{s}: {got[0]}" for s, got in values if got))
+    elif len(sys.argv) > 1 and sys.argv[1] == '--calibrate':
+        store = get_store()
+        for source, default in HISTORICAL_STD.items():
+            est = store.revision_std(source)
+            if est:
+                print(f"{source}: vintage 修正 std = {est[0]:.3f} ({est[1]} 个样本) | 当前 historical_std = {default}")
+            else:
+                print(f"{source}: vintage 不足 | 当前 historical_std = {default}")
     else:
         print("=" * 60)
         print("ECONOMIC NOWCAST REPORT")
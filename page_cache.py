@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+page_cache - 官方数据源页面的磁盘 HTTP 缓存 (条件 GET + 值 sidecar)
+
+功能：
+    - 按 URL 的新鲜度策略：新鲜期内完全不联网 (bls/bea 这类一个月只变几次)
+    - 过期后带 If-None-Match / If-Modified-Since 重新验证，304 直接用本地副本
+    - 正文 gzip 压缩存盘；元数据里保存预览 (前 3000 字符) 和长度
+    - 值 sidecar：提取结果 (MarketResearcherV2._extract_values 等) 按正文哈希缓存，
+      页面没变就不重新解析
+    - 网络失败时退回过期副本 (标记 stale)
+    - 正文按块流式读取，单页上限 MAX_PAGE_BYTES；流式提取器找到目标值即停止下载/解压
+    - 同一 URL 的并发请求合并 (single-flight)，按主机限速 (host_limiter)
+
+用法：
+    from page_cache import get_page
+    page = get_page(url, extract_key="unemployment", extract=lambda text: {...})
+    page = get_page(url, extract_key="u3", stream=lambda: StreamExtractor("unemployment"))
+    page.status_code, page.cache, page.values, page.preview, page.text   # text 按需解压
+
+    python page_cache.py https://www.bls.gov/cpi/     # 抓取一次，显示缓存状态
+    python page_cache.py --stats                      # 缓存条目
+
+依赖：
+    - requests (可选，缺失时用 urllib)
+    - host_limiter.py, market_cache.py (SingleFlight)
+"""
+
+import os
+import sys
+import gzip
+import codecs
+import json
+import time
+import hashlib
+import threading
+from typing import Callable, Dict, Optional
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from host_limiter import throttle
+from market_cache import SingleFlight
+
+try:
+    import requests
+except ImportError:
+    requests = None
+
+PAGE_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "page_cache")
+PREVIEW_CHARS = 3000
+MAX_PAGE_BYTES = 2 * 1024 * 1024   # 单页最多读 2MB，超出部分丢弃
+CHUNK_BYTES = 64 * 1024
+USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7)"
+
+# 新鲜期 (秒)，按主机后缀匹配；新鲜期内不发任何请求
+FRESHNESS = {
+    "bls.gov": 6 * 3600,
+    "bea.gov": 6 * 3600,
+    "federalreserve.gov": 6 * 3600,
+    "eia.gov": 3 * 3600,
+    "atlantafed.org": 3600,
+    "tradingeconomics.com": 3600,
+    "aaa.com": 1800,          # 油价每天更新
+    "opm.gov": 900,           # 停摆状态
+    "weather.gov": 900,
+}
+DEFAULT_FRESHNESS = 1800
+
+
+def freshness_for(url: str) -> int:
+    host = urlsplit(url).hostname or ""
+    for suffix, ttl in FRESHNESS.items():
+        if host == suffix or host.endswith("." + suffix):
+            return ttl
+    return DEFAULT_FRESHNESS
+
+
+def _feed_all(extractor, chunks) -> bool:
+    """逐块喂给提取器，找到目标值即停止 (返回是否提前停止)"""
+    for chunk in chunks:
+        if extractor.feed(chunk):
+            return True
+    extractor.feed("", final=True)
+    return False
+
+
+def _read_stream(byte_chunks, encoding: str, extractor=None):
+    """
+    按块解码正文，最多 MAX_PAGE_BYTES；提取器找到目标值后不再读取
+
+    Returns:
+        (text, truncated)
+    """
+    try:
+        decoder = codecs.getincrementaldecoder(encoding)("replace")
+    except LookupError:
+        decoder = codecs.getincrementaldecoder("utf-8")("replace")
+    parts = []
+    read = 0
+    for raw in byte_chunks:
+        if not raw:
+            continue
+        raw = raw[:MAX_PAGE_BYTES - read]
+        read += len(raw)
+        chunk = decoder.decode(raw)
+        parts.append(chunk)
+        if extractor is not None and extractor.feed(chunk):
+            return "".join(parts), True
+        if read >= MAX_PAGE_BYTES:
+            return "".join(parts) + decoder.decode(b"", final=True), True
+    parts.append(decoder.decode(b"", final=True))
+    if extractor is not None:
+        extractor.feed(parts[-1], final=True)
+    return "".join(parts), False
+
+
+class Page:
+    """一次 get_page 的结果；text 首次访问时才解压"""
+
+    __slots__ = ("url", "status_code", "cache", "length", "preview", "truncated", "values",
+                 "_body_path", "_text")
+
+    def __init__(self, url: str, status_code: int, cache: str, meta: Optional[Dict] = None,
+                 body_path: Optional[str] = None, text: Optional[str] = None, values=None):
+        meta = meta or {}
+        self.url = url
+        self.status_code = status_code
+        self.cache = cache                # fresh / revalidated / unchanged / changed / miss / stale / error
+        self.length = meta.get("length", len(text) if text is not None else 0)
+        self.preview = meta.get("preview", (text or "")[:PREVIEW_CHARS])
+        self.truncated = meta.get("truncated", False)   # 提前停止读取或超过 MAX_PAGE_BYTES
+        self.values = values
+        self._body_path = body_path
+        self._text = text
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            try:
+                with gzip.open(self._body_path, "rt", encoding="utf-8") as f:
+                    self._text = f.read()
+            except (OSError, TypeError):
+                self._text = ""
+        return self._text
+
+
+class PageCache:
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or PAGE_CACHE_DIR
+        self._flight = SingleFlight()
+        self._lock = threading.RLock()   # _values 持锁时还会更新 stats
+        self.stats = {"requests": 0, "fresh": 0, "revalidated": 0, "downloads": 0, "reparsed": 0}
+
+    def _paths(self, url: str):
+        key = hashlib.sha1(url.encode()).hexdigest()[:24]
+        return os.path.join(self.root, key + ".json"), os.path.join(self.root, key + ".body.gz")
+
+    def _load_meta(self, meta_path: str) -> Optional[Dict]:
+        try:
+            with open(meta_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_meta(self, meta_path: str, meta: Dict):
+        os.makedirs(self.root, exist_ok=True)
+        tmp = meta_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp, meta_path)
+
+    def _bump(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _request(self, url: str, meta: Optional[Dict], timeout: float, extractor=None):
+        """
+        条件 GET，正文按块流式读取 → (status, text, etag, last_modified, truncated)
+
+        读满 MAX_PAGE_BYTES 或 extractor 已找到全部目标值时停止读取 (truncated=True)。
+        """
+        headers = {"User-Agent": USER_AGENT}
+        if meta:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+        with throttle(url):
+            if requests is not None:
+                resp = requests.get(url, headers=headers, timeout=timeout, stream=True)
+                with resp:
+                    if resp.status_code != 200:
+                        return resp.status_code, "", None, None, False
+                    text, truncated = _read_stream(resp.iter_content(CHUNK_BYTES),
+                                                   resp.encoding or "utf-8", extractor)
+                    return 200, text, resp.headers.get("ETag"), resp.headers.get("Last-Modified"), truncated
+            import urllib.request
+            import urllib.error
+            try:
+                with urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=timeout) as r:
+                    charset = r.headers.get_content_charset() or "utf-8"
+                    text, truncated = _read_stream(iter(lambda: r.read(CHUNK_BYTES), b""), charset, extractor)
+                    return r.status, text, r.headers.get("ETag"), r.headers.get("Last-Modified"), truncated
+            except urllib.error.HTTPError as e:
+                return e.code, "", None, None, False
+
+    def _values(self, meta: Dict, meta_path: str, body_path: str, text: Optional[str],
+                extract_key: Optional[str], extract=None, stream=None):
+        """
+        sidecar 命中 (正文哈希相同) 直接返回，否则解析并写回
+
+        stream 提取器从正文 (内存或 gzip 文件) 按块喂入，找到目标值即停止解压。
+        """
+        if not extract_key or (extract is None and stream is None):
+            return None
+        sidecar = meta.setdefault("values", {})
+        entry = sidecar.get(extract_key)
+        if entry and entry.get("hash") == meta.get("hash"):
+            return entry["values"]
+        if stream is not None:
+            extractor = stream()
+            if text is not None:
+                _feed_all(extractor, (text[i:i + CHUNK_BYTES] for i in range(0, len(text), CHUNK_BYTES)))
+            else:
+                try:
+                    with gzip.open(body_path, "rt", encoding="utf-8") as f:
+                        _feed_all(extractor, iter(lambda: f.read(CHUNK_BYTES), ""))
+                except OSError:
+                    pass
+            values = extractor.values()
+        else:
+            values = extract(Page(meta["url"], 200, "", meta, body_path, text).text)
+        sidecar[extract_key] = {"hash": meta.get("hash"), "values": values}
+        self._save_meta(meta_path, meta)
+        self._bump("reparsed")
+        return values
+
+    def get(self, url: str, extract_key: Optional[str] = None,
+            extract: Optional[Callable[[str], Dict]] = None,
+            timeout: float = 15, max_age: Optional[float] = None, stream=None) -> Page:
+        """
+        extract(text) → dict：整页解析
+        stream() → 提取器 (feed(chunk, final) -> done, values())：流式解析，
+                   首次下载时找到目标值就停止读取
+        """
+        self._bump("requests")
+        result, _ = self._flight.do(url, lambda: self._get(url, timeout, max_age, stream, extract_key))
+        status, cache, meta, text = result
+        meta_path, body_path = self._paths(url)
+        if status == 200 and meta and meta.get("truncated") and extract_key \
+                and extract_key not in meta.get("values", {}) and not meta.get("capped") \
+                and meta.get("stopped_by") != extract_key:
+            # 之前的下载因别的提取器提前停止；这个提取器需要完整正文
+            result, _ = self._flight.do(url + "#full", lambda: self._get(url, timeout, 0, full=True))
+            status, cache, meta, text = result
+        if status != 200 or meta is None:
+            return Page(url, status, cache, text=text or "")
+        with self._lock:
+            values = self._values(meta, meta_path, body_path, text, extract_key, extract, stream)
+        return Page(url, 200, cache, meta, body_path, text, values)
+
+    def _get(self, url: str, timeout: float, max_age: Optional[float], stream=None,
+             extract_key: Optional[str] = None, full: bool = False):
+        meta_path, body_path = self._paths(url)
+        meta = self._load_meta(meta_path)
+        now = time.time()
+        ttl = freshness_for(url) if max_age is None else max_age
+
+        if meta and not full and now - meta.get("checked_at", 0) < ttl:
+            self._bump("fresh")
+            return 200, "fresh", meta, None
+
+        try:
+            status, text, etag, last_modified, truncated = self._request(
+                url, None if full else meta, timeout, stream() if stream else None)
+        except Exception:
+            if meta:
+                return 200, "stale", meta, None
+            return 0, "error", None, None
+
+        if status == 304 and meta:
+            meta["checked_at"] = now
+            self._save_meta(meta_path, meta)
+            self._bump("revalidated")
+            return 200, "revalidated", meta, None
+        if status != 200:
+            if meta:
+                return 200, "stale", meta, None
+            return status, "error", None, None
+
+        self._bump("downloads")
+        digest = hashlib.sha1(text.encode("utf-8", "replace")).hexdigest()
+        changed = not meta or meta.get("hash") != digest
+        if changed:
+            os.makedirs(self.root, exist_ok=True)
+            tmp = body_path + ".tmp"
+            with gzip.open(tmp, "wt", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp, body_path)
+        new_meta = {
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched_at": now,
+            "checked_at": now,
+            "hash": digest,
+            "length": len(text),
+            "truncated": truncated,
+            "stopped_by": extract_key if truncated and stream else None,
+            "capped": len(text.encode("utf-8", "replace")) >= MAX_PAGE_BYTES,
+            "preview": text[:PREVIEW_CHARS],
+            "values": (meta or {}).get("values", {}) if not changed else {},
+        }
+        self._save_meta(meta_path, new_meta)
+        return 200, ("changed" if meta else "miss") if changed else "unchanged", new_meta, text
+
+    def format_stats(self, label: str = "") -> str:
+        s = self.stats
+        tag = f"[{label}] " if label else ""
+        return (f"🗂️ {tag}页面缓存: {s['requests']} 次 → 下载 {s['downloads']} "
+                f"(新鲜 {s['fresh']}, 304 {s['revalidated']}, 重新解析 {s['reparsed']})")
+
+
+# 进程内共享实例 (market_researcher_v2 / notify)
+_pages = PageCache()
+
+
+def get_page(url: str, extract_key: Optional[str] = None,
+             extract: Optional[Callable[[str], Dict]] = None, timeout: float = 15,
+             stream=None) -> Page:
+    return _pages.get(url, extract_key, extract, timeout, stream=stream)
+
+
+def log_page_stats(label: str = ""):
+    if _pages.stats["requests"]:
+        print(_pages.format_stats(label), file=sys.stderr, flush=True)
+    for k in _pages.stats:
+        _pages.stats[k] = 0
+
+
+def main():
+    args = sys.argv[1:]
+    if not args:
+        print(__doc__)
+        return
+    if args[0] == "--stats":
+        root = _pages.root
+        metas = [f for f in os.listdir(root) if f.endswith(".json")] if os.path.isdir(root) else []
+        for name in metas:
+            meta = _pages._load_meta(os.path.join(root, name)) or {}
+            age = (time.time() - meta.get("checked_at", 0)) / 60
+            print(f"  {meta.get('url', name)[:70]:70s} {meta.get('length', 0):>8} chars, "
+                  f"checked {age:.0f}m ago, sidecar {list(meta.get('values', {}))}")
+        return
+    page = get_page(args[0])
+    print(f"{page.status_code} {page.cache} {page.length} chars")
+    print(page.preview[:300])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+param_sweep - 策略阈值并行网格回测
+
+功能：
+    - 对决策阈值做网格扫描 (价格带、volume、spread、Tier、年化门槛、
+      endgame min_probability、PositionCalculator kelly_fraction)
+    - 用 backtest_engine 在本地已结算历史上评估每组参数
+    - 进程池跑满所有核心；历史列放在共享内存，worker 只读零拷贝
+    - 输出按指标排序的结果表 (data/sweep_results.json)
+
+用法：
+    python param_sweep.py                                   # 默认网格
+    python param_sweep.py --grid yes_min_price=85,88,90 --grid kelly_fraction=0.1,0.25
+    python param_sweep.py --rank roi --top 20
+    python param_sweep.py --bench 100000                    # 合成数据性能测试
+
+依赖：
+    - backtest_engine.py
+    - position_calculator.py
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import itertools
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from backtest_engine import (
+    BacktestEngine, SettledHistory, DEFAULT_RULES, synthetic_records,
+)
+from position_calculator import PositionCalculator, DEFAULT_RISK_CONFIG
+
+RESULTS_FILE = Path(__file__).parent / "data" / "sweep_results.json"
+
+# 共享内存中的列 (顺序即布局顺序)
+SHARED_COLUMNS = ("category_codes",) + SettledHistory.INT_COLUMNS
+
+# PositionCalculator 配置项 (其余参数都是 backtest 筛选规则)
+CALCULATOR_KEYS = {"kelly_fraction", "max_single_position_pct", "min_cash_reserve_pct"}
+
+DEFAULT_GRID = {
+    "yes_min_price": [85, 88, 90],
+    "no_max_price": [10, 12, 15],
+    "min_volume": [100, 200, 500],
+    "max_spread": [3, 5],
+    "min_probability": [0, 95],
+    "kelly_fraction": [0.1, 0.25, 0.5],
+}
+
+RANK_METRICS = ("pnl", "roi", "hit_rate", "calmar")
+
+# worker 进程内的只读视图 (initializer 设置)
+_worker_history: Optional[SettledHistory] = None
+_worker_shm: Optional[shared_memory.SharedMemory] = None
+
+
+def expand_grid(grid: Dict[str, List]) -> List[Dict]:
+    """网格 → 参数组合列表"""
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def parse_grid_args(specs: List[str]) -> Dict[str, List]:
+    """解析 --grid key=v1,v2,... (数值自动转 int/float)"""
+    grid = {}
+    for spec in specs:
+        key, _, values = spec.partition("=")
+        if not values:
+            raise ValueError(f"无效的 --grid: {spec}")
+        parsed = []
+        for v in values.split(","):
+            v = v.strip()
+            parsed.append(float(v) if "." in v else int(v))
+        grid[key.strip()] = parsed
+    unknown = set(grid) - set(DEFAULT_RULES) - CALCULATOR_KEYS
+    if unknown:
+        raise ValueError(f"未知参数: {', '.join(sorted(unknown))}")
+    return grid
+
+
+def export_shared(history: SettledHistory) -> Tuple[shared_memory.SharedMemory, List[Tuple]]:
+    """
+    把历史列拷贝进一块共享内存
+
+    Returns:
+        (shm, layout)，layout = [(列名, typecode, 偏移, 长度), ...]
+    """
+    layout = []
+    offset = 0
+    for name in SHARED_COLUMNS:
+        col = getattr(history, name)
+        typecode = col.typecode if isinstance(col, array) else col.format  # memoryview (列式快照)
+        layout.append((name, typecode, offset, len(col)))
+        offset += len(col) * col.itemsize
+        offset = (offset + 7) & ~7  # 8 字节对齐
+    shm = shared_memory.SharedMemory(create=True, size=max(offset, 8))
+    for name, typecode, start, n in layout:
+        raw = getattr(history, name).tobytes()
+        shm.buf[start:start + len(raw)] = raw
+    return shm, layout
+
+
+def attach_shared(shm: shared_memory.SharedMemory, layout: List[Tuple], categories: List[str]) -> SettledHistory:
+    """在共享内存上构建只读 SettledHistory (memoryview，不拷贝)"""
+    h = SettledHistory()
+    h.categories = list(categories)
+    for name, typecode, start, n in layout:
+        itemsize = array(typecode).itemsize
+        view = shm.buf[start:start + n * itemsize].cast(typecode)
+        setattr(h, name, view)
+    return h
+
+
+def _init_worker(shm_name: str, layout: List[Tuple], categories: List[str]):
+    global _worker_history, _worker_shm
+    _worker_shm = shared_memory.SharedMemory(name=shm_name)
+    _worker_history = attach_shared(_worker_shm, layout, categories)
+
+
+def _evaluate(params: Dict, starting_balance: float = 1000.0, history: Optional[SettledHistory] = None) -> Dict:
+    """评估一组参数 (worker 中运行)"""
+    history = history if history is not None else _worker_history
+    rules = {k: v for k, v in params.items() if k not in CALCULATOR_KEYS}
+    calc_overrides = {k: v for k, v in params.items() if k in CALCULATOR_KEYS}
+    calculator = PositionCalculator(config={**DEFAULT_RISK_CONFIG, **calc_overrides})
+    result = BacktestEngine(history, calculator=calculator, starting_balance=starting_balance).run(rules)
+    dd = result["max_drawdown"]
+    return {
+        "params": params,
+        "trades": result["trades"],
+        "hit_rate": round(result["hit_rate"], 4),
+        "pnl": result["pnl"],
+        "roi": round(result["roi"], 4),
+        "max_drawdown": dd,
+        "calmar": round(result["roi"] / dd, 3) if dd > 0 else result["roi"],
+    }
+
+
+def run_sweep(
+    history: SettledHistory,
+    grid: Dict[str, List],
+    workers: Optional[int] = None,
+    starting_balance: float = 1000.0,
+    rank_by: str = "pnl",
+) -> List[Dict]:
+    """
+    并行评估网格中所有参数组合，返回按 rank_by 降序的结果
+    """
+    combos = expand_grid(grid)
+    workers = workers or os.cpu_count() or 1
+
+    if workers <= 1 or len(combos) <= 1:
+        results = [_evaluate(p, starting_balance, history) for p in combos]
+    else:
+        shm, layout = export_shared(history)
+        try:
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_worker,
+                initargs=(shm.name, layout, history.categories),
+            ) as executor:
+                chunksize = max(1, len(combos) // (workers * 4))
+                results = list(executor.map(
+                    _evaluate, combos, itertools.repeat(starting_balance), chunksize=chunksize,
+                ))
+        finally:
+            shm.close()
+            shm.unlink()
+
+    results.sort(key=lambda r: -r[rank_by])
+    for rank, r in enumerate(results, 1):
+        r["rank"] = rank
+    return results
+
+
+def format_table(results: List[Dict], top: int = 15) -> str:
+    """格式化排名表"""
+    if not results:
+        return "😴 无结果"
+    keys = list(results[0]["params"])
+    header = ["#"] + keys + ["trades", "hit", "pnl", "roi", "maxDD", "calmar"]
+    rows = []
+    for r in results[:top]:
+        rows.append(
+            [str(r["rank"])]
+            + [str(r["params"][k]) for k in keys]
+            + [str(r["trades"]), f"{r['hit_rate']:.1%}", f"{r['pnl']:+.0f}",
+               f"{r['roi']:+.1%}", f"{r['max_drawdown']:.1%}", f"{r['calmar']:.2f}"]
+        )
+    widths = [max(len(h), *(len(row[i]) for row in rows)) for i, h in enumerate(header)]
+    lines = ["  ".join(h.rjust(w) for h, w in zip(header, widths))]
+    lines.append("  ".join("-" * w for w in widths))
+    for row in rows:
+        lines.append("  ".join(c.rjust(w) for c, w in zip(row, widths)))
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="策略阈值并行网格回测")
+    parser.add_argument("--grid", action="append", default=[], help="key=v1,v2,... (可重复)")
+    parser.add_argument("--workers", type=int, default=0, help="进程数 (默认全部核心)")
+    parser.add_argument("--rank", choices=RANK_METRICS, default="pnl", help="排序指标")
+    parser.add_argument("--top", type=int, default=15, help="显示前 N 组")
+    parser.add_argument("--balance", type=float, default=1000.0, help="初始资金 ($)")
+    parser.add_argument("--bench", type=int, default=0, help="用 N 个合成市场测试性能")
+    parser.add_argument("--json", action="store_true", help="输出JSON")
+    args = parser.parse_args()
+
+    grid = parse_grid_args(args.grid) if args.grid else DEFAULT_GRID
+
+    if args.bench:
+        history = SettledHistory.from_records(synthetic_records(args.bench))
+    else:
+        history = SettledHistory.load()
+        if not len(history):
+            print("⚠️ 本地历史为空，先运行 python backtest_engine.py --sync", file=sys.stderr)
+            return
+
+    n_combos = len(expand_grid(grid))
+    workers = args.workers or os.cpu_count() or 1
+    print(f"🧮 {len(history)} 个市场 × {n_combos} 组参数 | {workers} 进程", file=sys.stderr, flush=True)
+
+    t0 = time.time()
+    results = run_sweep(history, grid, workers=workers, starting_balance=args.balance, rank_by=args.rank)
+    print(f"⏱️  完成 {time.time() - t0:.1f}s", file=sys.stderr)
+
+    RESULTS_FILE.parent.mkdir(parents=True, exist_ok=True)
+    with open(RESULTS_FILE, "w") as f:
+        json.dump({"grid": grid, "rank_by": args.rank, "results": results}, f, indent=2)
+
+    if args.json:
+        print(json.dumps(results[:args.top], indent=2))
+    else:
+        print(format_table(results, top=args.top))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+parity_monitor - 基于行情推送的增量 parity 监控
+
+功能：
+    - 启动时用 REST 拉一次市场，之后只靠 WebSocket ticker / orderbook 推送更新
+    - 维护每个事件的 YES ask 累计和、每个市场的 YES+NO 和，每次报价变化 O(1) 更新
+    - 扣除手续费后越过 DEFAULT_THRESHOLD 时触发信号 (open)，回落时触发 close
+    - 全阶梯检查只对互斥且完备的区间事件启用 (bracket_parity 判断)
+
+用法：
+    python parity_monitor.py --series KXGDP --series KXCPI     # ticker 推送
+    python parity_monitor.py --series KXGDP --orderbook        # 加订阅 orderbook_delta (需要 API key)
+    python parity_monitor.py --bench 1000000                   # 合成报价吞吐测试
+
+    from parity_monitor import ParityMonitor, ParityStorage
+    monitor = ParityMonitor(on_signal=print)
+    monitor.add_event("KXGDP-26JAN30", markets)
+    handlers = MessageHandlers(storage=ParityStorage(monitor))
+
+依赖：
+    - parity_scanner.py (REST 拉取、阈值和费率)
+    - bracket_parity.py (阶梯分类)
+    - arb_depth.py (订单簿最优价)
+    - websockets (仅实时模式)
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from parity_scanner import DEFAULT_THRESHOLD, KALSHI_FEE_RATE, fetch_markets_for_series
+from bracket_parity import evaluate_ladder, synthetic_ladder, KIND_BUCKET
+from arb_depth import OrderBook
+
+
+def _fee(price_cents: int) -> float:
+    return max(0, 100 - price_cents) * KALSHI_FEE_RATE / 100
+
+
+class _Market:
+    __slots__ = ("event", "yes_ask", "no_ask", "open")
+
+    def __init__(self, event: str):
+        self.event = event
+        self.yes_ask = 0
+        self.no_ask = 0
+        self.open = False
+
+
+class _Event:
+    """
+    事件级累计量
+
+    sum_yes / missing 随单腿变化加减；最便宜一档用 1-99¢ 计数桶求得
+    (价格空间固定 100 档，查找是常数时间)。
+    """
+
+    __slots__ = ("ticker", "legs", "ladder", "sum_yes", "missing", "price_counts", "open")
+
+    def __init__(self, ticker: str, legs: List[str], ladder: bool):
+        self.ticker = ticker
+        self.legs = legs
+        self.ladder = ladder
+        self.sum_yes = 0
+        self.missing = len(legs)
+        self.price_counts = [0] * 101
+        self.open = False
+
+    def replace_yes(self, old: int, new: int):
+        if old > 0:
+            self.sum_yes -= old
+            self.price_counts[old] -= 1
+        else:
+            self.missing -= 1
+        if new > 0:
+            self.sum_yes += new
+            self.price_counts[new] += 1
+        else:
+            self.missing += 1
+
+    def min_yes(self) -> int:
+        for p in range(1, 101):
+            if self.price_counts[p]:
+                return p
+        return 0
+
+
+class ParityMonitor:
+    """增量 parity 状态机 (单线程；WebSocket 回调在同一事件循环内调用)"""
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD,
+                 on_signal: Optional[Callable[[Dict], None]] = None):
+        self.threshold = threshold
+        self.on_signal = on_signal or print_signal
+        self.markets: Dict[str, _Market] = {}
+        self.events: Dict[str, _Event] = {}
+        self.books: Dict[str, OrderBook] = {}
+        self.updates = 0
+
+    def add_event(self, event_ticker: str, markets: List[Dict]):
+        """用 REST 快照初始化一个事件 (之后只走 update)"""
+        ladder = evaluate_ladder(markets)
+        is_ladder = ladder.kind == KIND_BUCKET and ladder.exhaustive
+        ev = self.events[event_ticker] = _Event(
+            event_ticker, [m.get("ticker", "") for m in markets], is_ladder)
+        for m in markets:
+            self.markets[m.get("ticker", "")] = _Market(event_ticker)
+        for m in markets:
+            self.update(m.get("ticker", ""), m.get("yes_ask", 0) or 0, m.get("no_ask", 0) or 0)
+        return ev
+
+    def update(self, ticker: str, yes_ask: Optional[int] = None, no_ask: Optional[int] = None) -> List[Dict]:
+        """
+        一条报价更新 (None = 该边未变)；O(1) 更新累计量并检查两类 parity
+
+        Returns:
+            本次触发的信号列表
+        """
+        st = self.markets.get(ticker)
+        if st is None:
+            return []
+        self.updates += 1
+        ev = self.events[st.event]
+        signals = []
+
+        yes_changed = yes_ask is not None and yes_ask != st.yes_ask
+        if yes_changed:
+            ev.replace_yes(st.yes_ask, yes_ask)
+            st.yes_ask = yes_ask
+        if no_ask is not None:
+            st.no_ask = no_ask
+
+        # 单市场 YES + NO
+        y, n = st.yes_ask, st.no_ask
+        if y > 0 and n > 0:
+            cost = (y + n) / 100.0
+            net = 1.0 - cost - max(_fee(y), _fee(n))
+        else:
+            cost, net = 0.0, 0.0
+        profitable = net > 0 and cost < self.threshold
+        if profitable != st.open:
+            st.open = profitable
+            signals.append(self._signal("SINGLE_MARKET_PARITY", profitable, ev.ticker,
+                                        ticker, y + n, net))
+
+        # 全阶梯 YES 之和
+        if ev.ladder and yes_changed:
+            if ev.missing == 0:
+                cost = ev.sum_yes / 100.0
+                net = 1.0 - cost - _fee(ev.min_yes())
+            else:
+                cost, net = 0.0, 0.0
+            profitable = net > 0 and cost < self.threshold
+            if profitable != ev.open:
+                ev.open = profitable
+                signals.append(self._signal("BRACKET_PARITY", profitable, ev.ticker,
+                                            None, ev.sum_yes, net))
+
+        for sig in signals:
+            self.on_signal(sig)
+        return signals
+
+    def _signal(self, kind: str, opened: bool, event: str, ticker: Optional[str],
+                cost_cents: int, net: float) -> Dict:
+        return {
+            "type": kind,
+            "state": "open" if opened else "close",
+            "event_ticker": event,
+            "ticker": ticker,
+            "cost_cents": cost_cents,
+            "net_profit": round(net, 4),
+            "ts": datetime.now(timezone.utc).isoformat(),
+        }
+
+    # ── 订单簿 (orderbook_snapshot / orderbook_delta) ──
+
+    def on_book_snapshot(self, ticker: str, entry: Dict) -> List[Dict]:
+        book = self.books[ticker] = OrderBook.from_ws(ticker, entry)
+        return self.update(ticker, book.best_ask("yes"), book.best_ask("no"))
+
+    def on_book_delta(self, ticker: str, side: str, price: int, delta: int) -> List[Dict]:
+        book = self.books.get(ticker)
+        if book is None:
+            return []
+        book.apply_delta(side, price, delta)
+        # side 的 bid 只影响对面的 ask
+        if side == "yes":
+            return self.update(ticker, no_ask=book.best_ask("no"))
+        return self.update(ticker, yes_ask=book.best_ask("yes"))
+
+
+class ParityStorage:
+    """
+    websocket.handlers.MessageHandlers 的 storage 适配器
+
+        handlers = MessageHandlers(storage=ParityStorage(monitor))
+    """
+
+    def __init__(self, monitor: ParityMonitor):
+        self.monitor = monitor
+
+    async def save_ticker(self, market: str, data: Dict):
+        yes_bid = data.get("yes_bid")
+        # ticker 消息只有 YES 边；买 NO 的价格 = 100 - YES bid
+        no_ask = 100 - yes_bid if yes_bid else None
+        self.monitor.update(market, data.get("yes_ask"), no_ask)
+
+    async def save_trade(self, market: str, data: Dict):
+        pass
+
+    async def save_orderbook_snapshot(self, market: str, data: Dict):
+        self.monitor.on_book_snapshot(market, data)
+
+    async def save_orderbook_delta(self, market: str, data: Dict):
+        self.monitor.on_book_delta(market, data.get("side"), data.get("price"), data.get("delta"))
+
+    async def save_fill(self, data: Dict):
+        pass
+
+
+def print_signal(sig: Dict):
+    icon = "🚨" if sig["state"] == "open" else "✅"
+    label = sig["ticker"] or sig["event_ticker"]
+    print(f"{icon} {sig['ts'][11:19]} {sig['type']} {sig['state'].upper()} {label} "
+          f"cost {sig['cost_cents']}¢ net ${sig['net_profit']:.4f}", flush=True)
+
+
+def seed_from_series(monitor: ParityMonitor, series: List[str]) -> int:
+    """REST 拉一次 series 下的所有市场，按事件初始化"""
+    total = 0
+    for s in series:
+        events: Dict[str, List[Dict]] = {}
+        for m in fetch_markets_for_series(s):
+            events.setdefault(m.get("event_ticker", "unknown"), []).append(m)
+        for evt, markets in events.items():
+            monitor.add_event(evt, markets)
+            total += len(markets)
+    return total
+
+
+async def run_live(monitor: ParityMonitor, orderbook: bool = False):
+    from websocket.client import KalshiWebSocketClient
+    from websocket.handlers import MessageHandlers
+
+    key_path = os.environ.get("KALSHI_PRIVATE_KEY_PATH") if orderbook else None
+    client = KalshiWebSocketClient(
+        api_key_id=os.environ.get("KALSHI_API_KEY") if orderbook else None,
+        private_key_path=key_path,
+    )
+    handlers = MessageHandlers(storage=ParityStorage(monitor))
+    client.register_handler("ticker", handlers.handle_ticker)
+    client.register_handler("orderbook_snapshot", handlers.handle_orderbook_snapshot)
+    client.register_handler("orderbook_delta", handlers.handle_orderbook_delta)
+
+    await client.connect()
+    channels = ["ticker", "orderbook_delta"] if orderbook else ["ticker"]
+    await client.subscribe(channels, market_tickers=list(monitor.markets))
+    await client.run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="增量 parity 监控")
+    parser.add_argument("--series", action="append", default=[], help="监控的 series (可重复)")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--orderbook", action="store_true", help="订阅 orderbook_delta (需要 KALSHI_API_KEY)")
+    parser.add_argument("--bench", type=int, default=0, help="N 条合成报价更新的吞吐测试")
+    args = parser.parse_args()
+
+    if args.bench:
+        fired = []
+        monitor = ParityMonitor(args.threshold, on_signal=fired.append)
+        for e in range(500):
+            markets = synthetic_ladder(10, seed=e)
+            for m in markets:
+                m["ticker"] = f"{m['ticker']}-E{e}"
+            monitor.add_event(f"KXSYN-E{e}", markets)
+        tickers = list(monitor.markets)
+        rng = random.Random(7)
+        t0 = time.time()
+        for _ in range(args.bench):
+            t = tickers[rng.randrange(len(tickers))]
+            st = monitor.markets[t]
+            monitor.update(t, max(1, min(99, st.yes_ask + rng.randint(-1, 1))),
+                           max(1, min(99, st.no_ask + rng.randint(-1, 1))))
+        dt = time.time() - t0
+        print(f"⚡ {args.bench} 次更新 / {len(tickers)} 个市场 / {len(monitor.events)} 个事件 | "
+              f"{dt:.2f}s ({args.bench / dt:,.0f}/s) | 信号 {len(fired)}", file=sys.stderr)
+        return
+
+    if not args.series:
+        parser.print_help()
+        return
+
+    monitor = ParityMonitor(args.threshold)
+    n = seed_from_series(monitor, args.series)
+    ladders = sum(ev.ladder for ev in monitor.events.values())
+    print(f"📡 监控 {n} 个市场 / {len(monitor.events)} 个事件 (完备阶梯 {ladders})", file=sys.stderr, flush=True)
+    try:
+        asyncio.run(run_live(monitor, orderbook=args.orderbook))
+    except KeyboardInterrupt:
+        print(f"\n👋 已处理 {monitor.updates} 次更新", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
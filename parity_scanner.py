@@ -9,19 +9,28 @@ parity_scanner - Kalshi 套利扫描
 
 用法：
     python parity_scanner.py               # 扫描套利机会
+    python parity_scanner.py --columnar    # 额外导出列式快照 (--no-json 跳过 JSON)
+    python parity_scanner.py --depth       # 按订单簿深度计算可执行规模
+    python parity_scanner.py --stream      # 边扫边输出，在线 top-K，定期写入部分结果 (--top K)
     
 依赖：
     - requests
 """
 
+import hashlib
+import heapq
 import json
 import os
 import sys
 import time
 import requests
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 from datetime import datetime, timezone, timedelta
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bracket_parity import evaluate_ladder, KIND_ABOVE, KIND_UNKNOWN
+from arb_depth import DepthSizer, OrderBook, opportunity_legs
+
 # ── Kalshi API (same pattern as report_v2.py) ──
 
 API_BASE = "https://api.elections.kalshi.com/trade-api/v2"
@@ -56,6 +65,14 @@ except ImportError:
 KALSHI_FEE_RATE = 0.007
 # Default: total cost must be < $0.993 for profit after fees
 DEFAULT_THRESHOLD = 0.993
+# Order-book depth sizing: only the top N opportunities (one book fetch per leg)
+DEPTH_TOP_N = 20
+# Streaming mode: online top-K and partial-results flush interval
+STREAM_TOP_K = 50
+STREAM_FLUSH_SECONDS = 15
+# Fast mode: per-event quote fingerprints from the previous scan
+FINGERPRINT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "data", "parity_fingerprints.json")
 
 
 def calculate_risk_score(profit_pct, volume, num_legs=2, is_bracket=False):
@@ -102,12 +119,18 @@ def calculate_risk_score(profit_pct, volume, num_legs=2, is_bracket=False):
     return max(0, min(100, score))
 
 
-def fetch_all_events(status="open", limit=200, fast_mode=False):
-    """Fetch all open events from Kalshi."""
-    events = []
+def iter_events(status="open", limit=200, fast_mode=False):
+    """
+    Yield pages of open events as they are fetched.
+    
+    fast_mode requests nested markets so events can be filtered (and
+    evaluated) without a per-event /markets call.
+    """
     cursor = None
     while True:
         params = {"limit": limit, "status": status}
+        if fast_mode:
+            params["with_nested_markets"] = "true"
         if cursor:
             params["cursor"] = cursor
         data = api_get("/events", params)
@@ -115,19 +138,18 @@ def fetch_all_events(status="open", limit=200, fast_mode=False):
             break
         batch = data.get("events", [])
         
-        # Filter low-volume events in fast mode
-        if fast_mode:
-            filtered_batch = []
-            for event in batch:
-                # Estimate volume from event title or skip filtering here (do it later at market level)
-                filtered_batch.append(event)
-            batch = filtered_batch
-        
-        events.extend(batch)
+        yield batch
         cursor = data.get("cursor", "")
         if not cursor or len(batch) < limit:
             break
         time.sleep(0.05)  # Reduced from 0.15 to 0.05 (50ms)
+
+
+def fetch_all_events(status="open", limit=200, fast_mode=False):
+    """Fetch all open events from Kalshi."""
+    events = []
+    for batch in iter_events(status, limit, fast_mode):
+        events.extend(batch)
     return events
 
 
@@ -326,66 +348,222 @@ def check_event_bracket_parity(markets, threshold=DEFAULT_THRESHOLD):
 
 def check_adjacent_bracket_parity(markets):
     """
-    Check pairs of adjacent brackets for complementary parity.
+    Single-market parity for every bracket of an event, in one pass.
     
-    For two adjacent brackets that together cover a range,
-    check if buying YES on both is cheaper than $1.00.
-    This works when two brackets are the only possible outcomes
-    for a subset of the probability space.
+    Previously ran check_single_market_parity on both markets of every
+    i<j pair (O(n²) plus a dedupe); bracket_parity.evaluate_ladder scores
+    each market exactly once and only profitable ones are expanded.
     """
-    opportunities = []
+    ladder = evaluate_ladder(markets)
+    return [
+        check_single_market_parity(markets[i])
+        for i, net in zip(ladder.order, ladder.single_net)
+        if net > 0
+    ]
+
+
+def check_ladder_parity(markets, threshold=DEFAULT_THRESHOLD):
+    """
+    All parity checks for one event from a single ladder evaluation.
     
-    # Sort by title to get adjacent brackets
-    sorted_markets = sorted(markets, key=lambda m: m.get("title", ""))
+    Brackets are ordered by parsed numeric range (not title), then:
+      - single-market YES+NO parity for each market
+      - full-ladder YES sum < $1 (only when brackets are exclusive + exhaustive)
+      - full-ladder NO sum < $(n-1)
+      - threshold monotonicity: YES(lower) + NO(higher) < $1
+    Events whose brackets can't be parsed fall back to check_event_bracket_parity.
     
-    for i in range(len(sorted_markets)):
-        for j in range(i + 1, len(sorted_markets)):
-            m1 = sorted_markets[i]
-            m2 = sorted_markets[j]
-            
-            # Check single-market parity for each
-            opp1 = check_single_market_parity(m1)
-            if opp1:
-                opportunities.append(opp1)
-            opp2 = check_single_market_parity(m2)
-            if opp2:
-                opportunities.append(opp2)
+    Returns (single_opportunities, ladder_opportunities).
+    """
+    ladder = evaluate_ladder(markets)
+    singles = [
+        check_single_market_parity(markets[i])
+        for i, net in zip(ladder.order, ladder.single_net)
+        if net > 0
+    ]
+    
+    if ladder.kind == KIND_UNKNOWN:
+        opp = check_event_bracket_parity(markets, threshold) if len(markets) >= 2 else None
+        return singles, [opp] if opp else []
+    
+    ordered = [markets[i] for i in ladder.order]
+    event_title = ordered[0].get("title", "").split("—")[0].strip() if ordered else ""
+    total_vol = sum(m.get("volume_24h", 0) or m.get("volume", 0) or 0 for m in ordered)
+    n = len(ordered)
+    opps = []
+    
+    if ladder.yes_ladder and ladder.yes_ladder["net_profit"] > 0:
+        y = ladder.yes_ladder
+        cost = y["cost_cents"] / 100.0
+        profit_pct = y["net_profit"] / cost * 100
+        opps.append({
+            "type": "BRACKET_PARITY",
+            "brackets": [_bracket_leg(m, "yes_ask") for m in ordered],
+            "num_brackets": n,
+            "total_yes_cents": y["cost_cents"],
+            "total_yes_dollars": round(cost, 4),
+            "net_profit": round(y["net_profit"], 4),
+            "profit_pct": round(profit_pct, 2),
+            "max_fee": round(y["max_fee"], 4),
+            "event_title": event_title,
+            "risk_score": calculate_risk_score(profit_pct, total_vol, num_legs=n, is_bracket=True),
+            "stale_warning": profit_pct > 3.0,
+        })
     
-    # Deduplicate by ticker
-    seen = set()
-    unique = []
-    for opp in opportunities:
-        if opp["ticker"] not in seen:
-            seen.add(opp["ticker"])
-            unique.append(opp)
+    if ladder.no_ladder and ladder.no_ladder["net_profit"] > 0:
+        nl = ladder.no_ladder
+        cost = nl["cost_cents"] / 100.0
+        profit_pct = nl["net_profit"] / cost * 100
+        opps.append({
+            "type": "NO_LADDER_PARITY",
+            "brackets": [_bracket_leg(m, "no_ask") for m in ordered],
+            "num_brackets": n,
+            "total_no_cents": nl["cost_cents"],
+            "payout": nl["payout"],
+            "net_profit": round(nl["net_profit"], 4),
+            "profit_pct": round(profit_pct, 2),
+            "max_fee": round(nl["max_fee"], 4),
+            "event_title": event_title,
+            "risk_score": calculate_risk_score(profit_pct, total_vol, num_legs=n, is_bracket=True),
+            "stale_warning": profit_pct > 3.0,
+        })
+    
+    pair = ladder.threshold_pair
+    if pair and pair["net_profit"] > 0:
+        lower, upper = ordered[pair["first"]], ordered[pair["second"]]
+        # above 阶梯: YES 低阈值 + NO 高阈值; below 阶梯: NO 低阈值 + YES 高阈值
+        first_side, second_side = ("yes", "no") if ladder.kind == KIND_ABOVE else ("no", "yes")
+        cost = pair["cost_cents"] / 100.0
+        profit_pct = pair["net_profit"] / cost * 100
+        vol = sum(m.get("volume_24h", 0) or 0 for m in (lower, upper))
+        opps.append({
+            "type": "THRESHOLD_PARITY",
+            "legs": [
+                {**_bracket_leg(lower, f"{first_side}_ask"), "side": first_side.upper()},
+                {**_bracket_leg(upper, f"{second_side}_ask"), "side": second_side.upper()},
+            ],
+            "total_cost_cents": pair["cost_cents"],
+            "net_profit": round(pair["net_profit"], 4),
+            "profit_pct": round(profit_pct, 2),
+            "max_fee": round(pair["max_fee"], 4),
+            "event_title": event_title,
+            "risk_score": calculate_risk_score(profit_pct, vol, num_legs=2),
+            "stale_warning": profit_pct > 3.0,
+        })
     
-    return unique
+    return singles, opps
 
 
-def scan_all_parity(threshold=DEFAULT_THRESHOLD, series_filter=None, fast_mode=False):
+def _bracket_leg(market, price_key):
+    return {
+        "ticker": market.get("ticker", ""),
+        "title": market.get("title", ""),
+        "subtitle": market.get("yes_sub_title", "") or market.get("subtitle", ""),
+        price_key: market.get(price_key, 0) or 0,
+        "volume": market.get("volume_24h", 0) or market.get("volume", 0) or 0,
+    }
+
+
+def _check_event(markets, threshold, stats, out):
+    """Run all parity checks for one event, appending to out and updating stats."""
+    singles, ladder_opps = check_ladder_parity(markets, threshold)
+    _count_found(singles + ladder_opps, stats)
+    out.extend(singles)
+    out.extend(ladder_opps)
+
+
+def _count_found(opps, stats):
+    for opp in opps:
+        if opp["type"] == "SINGLE_MARKET_PARITY":
+            stats["single_parity_found"] += 1
+        elif opp["type"] == "BRACKET_PARITY":
+            stats["bracket_parity_found"] += 1
+        else:
+            stats["ladder_parity_found"] += 1
+
+
+def quote_fingerprint(markets):
+    """Hash of every market's quotes; unchanged fingerprint → same parity result."""
+    h = hashlib.blake2b(digest_size=12)
+    for m in sorted(markets, key=lambda m: m.get("ticker", "")):
+        h.update(f"{m.get('ticker', '')}:{m.get('yes_ask', 0)}:{m.get('no_ask', 0)}:"
+                 f"{m.get('yes_bid', 0)}:{m.get('no_bid', 0)};".encode())
+    return h.hexdigest()
+
+
+def load_fingerprints(path=None):
+    try:
+        with open(path or FINGERPRINT_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_fingerprints(cache, path=None):
+    path = path or FINGERPRINT_FILE
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(cache, f, default=str)
+    os.replace(tmp, path)
+
+
+def fetch_orderbook(ticker):
+    """Fetch the public order book for a market (bids on both sides)."""
+    return OrderBook.from_rest(ticker, api_get(f"/markets/{ticker}/orderbook"))
+
+
+def size_with_depth(opportunities, top=DEPTH_TOP_N):
     """
-    Main scanner: find all parity arbitrage opportunities.
+    Attach executable capacity to the top opportunities.
     
-    1. Fetch all events (or filtered by series)
-    2. For each event, fetch markets IN PARALLEL
-    3. Check single-market YES+NO parity
-    4. Check bracket-level parity (all brackets sum < $1)
-    5. Return sorted opportunities
-    
-    Args:
-        fast_mode: Skip events with total volume <$1000 for faster scanning
+    Top-of-book asks say nothing about size; walk every leg's book and find
+    the max contract count that is still profitable after fees. Each book
+    is fetched once (in parallel) even if several opportunities share it.
+    Adds opp["depth"] = {max_contracts, capacity_dollars, net_profit, ...}.
     """
-    now = datetime.now(timezone.utc)
+    sizer = DepthSizer(fetch_orderbook)
+    flagged = opportunities[:top]
+    tickers = {t for opp in flagged for t, _ in opportunity_legs(opp)[0]}
     
-    all_opportunities = []
-    stats = {
+    with ThreadPoolExecutor(max_workers=6) as executor:
+        for ticker, book in zip(tickers, executor.map(fetch_orderbook, tickers)):
+            sizer.books[ticker] = book
+    
+    for opp in flagged:
+        sizer.add(opp)
+    sizer.refresh()
+    return sizer
+
+
+def new_scan_stats():
+    return {
         "events_scanned": 0,
         "markets_scanned": 0,
         "single_parity_found": 0,
         "bracket_parity_found": 0,
+        "ladder_parity_found": 0,
         "events_skipped_low_volume": 0,
-        "scan_time": now.isoformat(),
+        "events_skipped_single_market": 0,
+        "events_skipped_unchanged": 0,
+        "scan_time": datetime.now(timezone.utc).isoformat(),
     }
+
+
+def _low_volume(markets):
+    total_volume = sum(m.get("volume_24h", 0) or m.get("volume", 0) or 0 for m in markets)
+    return total_volume < 1000  # Skip events <$1000 total volume
+
+
+def iter_parity(threshold=DEFAULT_THRESHOLD, series_filter=None, fast_mode=False, stats=None):
+    """
+    Streaming scanner: yield (event_ticker, opportunities) as each event completes.
+    
+    Market fetches for a page of events are submitted as soon as that page
+    arrives, so the first results show up while later event pages are still
+    being listed. stats (see new_scan_stats) is updated in place.
+    """
+    stats = stats if stats is not None else new_scan_stats()
     
     if series_filter:
         # Scan specific series
@@ -405,76 +583,120 @@ def scan_all_parity(threshold=DEFAULT_THRESHOLD, series_filter=None, fast_mode=F
             stats["events_scanned"] += 1
             
             # Fast mode: skip low volume events
-            if fast_mode:
-                total_volume = sum(m.get("volume_24h", 0) or m.get("volume", 0) or 0 for m in evt_markets)
-                if total_volume < 1000:  # Skip events <$1000 total volume
-                    stats["events_skipped_low_volume"] += 1
-                    continue
+            if fast_mode and _low_volume(evt_markets):
+                stats["events_skipped_low_volume"] += 1
+                continue
             
-            # Check single-market parity for each
-            for m in evt_markets:
-                opp = check_single_market_parity(m)
-                if opp:
-                    all_opportunities.append(opp)
-                    stats["single_parity_found"] += 1
-            
-            # Check bracket parity
-            if len(evt_markets) >= 2:
-                bracket_opp = check_event_bracket_parity(evt_markets, threshold)
-                if bracket_opp:
-                    all_opportunities.append(bracket_opp)
-                    stats["bracket_parity_found"] += 1
-    else:
-        # Scan ALL events with parallel market fetching
-        print("📡 Fetching all open events...", flush=True)
-        events = fetch_all_events(fast_mode=fast_mode)
-        print(f"   Found {len(events)} events", flush=True)
-        print("🚀 Starting parallel market fetching...", flush=True)
+            opps = []
+            _check_event(evt_markets, threshold, stats, opps)
+            yield evt_ticker, opps
+        return
+    
+    # Scan ALL events with parallel market fetching, pipelined with event paging
+    print("📡 Fetching open events + markets (pipelined)...", flush=True)
+    total_events = 0
+    processed_events = 0
+    found = 0
+    
+    def _process(future):
+        nonlocal processed_events, found
+        evt_ticker, markets = future.result()
+        processed_events += 1
+        stats["events_scanned"] += 1
+        stats["markets_scanned"] += len(markets)
         
-        # Parallel market fetching with ThreadPoolExecutor
-        with ThreadPoolExecutor(max_workers=6) as executor:
-            # Submit all event market fetch tasks
-            future_to_event = {
-                executor.submit(fetch_markets_for_event_parallel, event.get("event_ticker", "")): event 
-                for event in events if event.get("event_ticker")
-            }
-            
-            processed_events = 0
-            for future in as_completed(future_to_event):
-                event = future_to_event[future]
-                evt_ticker, markets = future.result()
+        # Fast mode: skip low volume events
+        if fast_mode and _low_volume(markets):
+            stats["events_skipped_low_volume"] += 1
+            return evt_ticker, None
+        
+        opps = []
+        _check_event(markets, threshold, stats, opps)
+        found += len(opps)
+        
+        # Progress with flush
+        if processed_events % 50 == 0:
+            skip_info = f" ({stats['events_skipped_low_volume']} skipped low vol)" if fast_mode else ""
+            print(f"   Progress: {processed_events}/{total_events} events, "
+                  f"{stats['markets_scanned']} markets, "
+                  f"{found} opportunities{skip_info}", flush=True)
+        return evt_ticker, opps
+    
+    # Fast mode: quote fingerprints from the previous scan (event → fp + cached opportunities)
+    prev_fps = load_fingerprints() if fast_mode else {}
+    new_fps = {}
+    
+    with ThreadPoolExecutor(max_workers=6) as executor:
+        pending = set()
+        for batch in iter_events(fast_mode=fast_mode):
+            for event in batch:
+                evt_ticker = event.get("event_ticker")
+                if not evt_ticker:
+                    continue
+                total_events += 1
+                nested = event.get("markets")
+                if not fast_mode or nested is None:
+                    pending.add(executor.submit(fetch_markets_for_event_parallel, evt_ticker))
+                    continue
                 
+                # Fast mode: filter and evaluate from nested markets, no per-event request
                 processed_events += 1
                 stats["events_scanned"] += 1
-                stats["markets_scanned"] += len(markets)
-                
-                # Fast mode: skip low volume events
-                if fast_mode:
-                    total_volume = sum(m.get("volume_24h", 0) or m.get("volume", 0) or 0 for m in markets)
-                    if total_volume < 1000:  # Skip events <$1000 total volume
-                        stats["events_skipped_low_volume"] += 1
-                        continue
-                
-                # Check single-market parity for each
-                for m in markets:
-                    opp = check_single_market_parity(m)
-                    if opp:
-                        all_opportunities.append(opp)
-                        stats["single_parity_found"] += 1
-                
-                # Check bracket parity (events with multiple markets)
-                if len(markets) >= 2:
-                    bracket_opp = check_event_bracket_parity(markets, threshold)
-                    if bracket_opp:
-                        all_opportunities.append(bracket_opp)
-                        stats["bracket_parity_found"] += 1
-                
-                # Progress with flush
-                if processed_events % 50 == 0:
-                    skip_info = f" ({stats['events_skipped_low_volume']} skipped low vol)" if fast_mode else ""
-                    print(f"   Progress: {processed_events}/{len(events)} events, "
-                          f"{stats['markets_scanned']} markets, "
-                          f"{len(all_opportunities)} opportunities{skip_info}", flush=True)
+                stats["markets_scanned"] += len(nested)
+                if len(nested) < 2:
+                    stats["events_skipped_single_market"] += 1
+                    continue
+                if _low_volume(nested):
+                    stats["events_skipped_low_volume"] += 1
+                    continue
+                fp = quote_fingerprint(nested)
+                cached = prev_fps.get(evt_ticker)
+                if cached and cached.get("fp") == fp:
+                    stats["events_skipped_unchanged"] += 1
+                    opps = cached.get("opps", [])
+                    _count_found(opps, stats)
+                else:
+                    opps = []
+                    _check_event(nested, threshold, stats, opps)
+                new_fps[evt_ticker] = {"fp": fp, "opps": opps}
+                found += len(opps)
+                yield evt_ticker, opps
+            # Drain whatever finished while this page was being fetched
+            done, pending = wait(pending, timeout=0, return_when=FIRST_COMPLETED)
+            for future in done:
+                evt_ticker, opps = _process(future)
+                if opps is not None:
+                    yield evt_ticker, opps
+        
+        print(f"   Found {total_events} events", flush=True)
+        for future in as_completed(pending):
+            evt_ticker, opps = _process(future)
+            if opps is not None:
+                yield evt_ticker, opps
+    
+    if fast_mode:
+        save_fingerprints(new_fps)
+
+
+def scan_all_parity(threshold=DEFAULT_THRESHOLD, series_filter=None, fast_mode=False):
+    """
+    Main scanner: find all parity arbitrage opportunities.
+    
+    1. Fetch all events (or filtered by series)
+    2. For each event, fetch markets IN PARALLEL
+    3. Check single-market YES+NO parity
+    4. Check ladder parity (bracket YES/NO sums, threshold monotonicity)
+    5. Return sorted opportunities
+    
+    Args:
+        fast_mode: Pull events with nested markets in bulk, skip events with
+            total volume <$1000 or a single market, and reuse the previous
+            result for events whose quote fingerprint is unchanged
+    """
+    stats = new_scan_stats()
+    all_opportunities = []
+    for _, opps in iter_parity(threshold, series_filter, fast_mode, stats):
+        all_opportunities.extend(opps)
     
     # Sort by profit potential
     all_opportunities.sort(key=lambda x: -x.get("profit_pct", 0))
@@ -482,11 +704,91 @@ def scan_all_parity(threshold=DEFAULT_THRESHOLD, series_filter=None, fast_mode=F
     
     print(f"✅ Scan complete: {stats['events_scanned']} events, {stats['markets_scanned']} markets processed", flush=True)
     if fast_mode:
-        print(f"   Fast mode: {stats['events_skipped_low_volume']} low-volume events skipped", flush=True)
+        print(f"   Fast mode: {stats['events_skipped_low_volume']} low-volume, "
+              f"{stats['events_skipped_single_market']} single-market events skipped; "
+              f"{stats['events_skipped_unchanged']} unchanged (cached)", flush=True)
     
     return all_opportunities, stats
 
 
+class TopK:
+    """Bounded min-heap keeping the K most profitable opportunities seen so far."""
+    
+    def __init__(self, k):
+        self.k = k
+        self._heap = []
+        self._seq = 0
+    
+    def push(self, opp):
+        """Returns True if opp made it into the current top-K."""
+        item = (opp.get("profit_pct", 0), self._seq, opp)
+        self._seq += 1
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, item)
+        elif item[0] > self._heap[0][0]:
+            heapq.heapreplace(self._heap, item)
+        else:
+            return False
+        return True
+    
+    def __len__(self):
+        return len(self._heap)
+    
+    def sorted(self):
+        return [opp for _, _, opp in sorted(self._heap, key=lambda x: (-x[0], x[1]))]
+
+
+def _opp_label(opp):
+    return opp.get("ticker") or opp.get("event_title") or "?"
+
+
+def stream_parity(threshold=DEFAULT_THRESHOLD, series_filter=None, fast_mode=False,
+                  top_k=STREAM_TOP_K, flush_interval=STREAM_FLUSH_SECONDS, path=None):
+    """
+    Streaming scan: print opportunities as they enter the online top-K, and flush partial results to the results file every flush_interval s.
+    
+    Returns (top_k_opportunities, stats) like scan_all_parity.
+    """
+    stats = new_scan_stats()
+    top = TopK(top_k)
+    start = time.time()
+    last_flush = start
+    
+    for _, opps in iter_parity(threshold, series_filter, fast_mode, stats):
+        for opp in opps:
+            if "first_opportunity_s" not in stats:
+                stats["first_opportunity_s"] = round(time.time() - start, 2)
+            if top.push(opp):
+                print(f"   ⚡ +{opp['profit_pct']:.2f}% {opp['type']} {_opp_label(opp)[:50]} "
+                      f"[{time.time() - start:.1f}s]", flush=True)
+        
+        if time.time() - last_flush >= flush_interval:
+            _flush_partial(top.sorted(), stats, path)
+            last_flush = time.time()
+    
+    stats["total_opportunities"] = (stats["single_parity_found"] + stats["bracket_parity_found"]
+                                     + stats["ladder_parity_found"])
+    print(f"✅ Scan complete: {stats['events_scanned']} events, {stats['markets_scanned']} markets processed", flush=True)
+    return top.sorted(), stats
+
+
+def _flush_partial(opportunities, stats, path=None):
+    """Atomically write the current top-K so readers never see a half-written file."""
+    if path is None:
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            "parity-scan-results.json")
+    output = {
+        "scan_time": stats.get("scan_time"),
+        "partial": True,
+        "stats": stats,
+        "opportunities": opportunities,
+    }
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(output, f, indent=2, default=str)
+    os.replace(tmp, path)
+
+
 def format_report(opportunities, stats):
     """Format human-readable report."""
     now = datetime.now(timezone.utc)
@@ -496,7 +798,8 @@ def format_report(opportunities, stats):
     lines.append("=" * 65)
     lines.append(f"Scanned: {stats['events_scanned']} events, {stats['markets_scanned']} markets")
     lines.append(f"Found: {stats['single_parity_found']} single-market + "
-                 f"{stats['bracket_parity_found']} bracket opportunities\n")
+                 f"{stats['bracket_parity_found']} bracket + "
+                 f"{stats.get('ladder_parity_found', 0)} ladder opportunities\n")
     
     if not opportunities:
         lines.append("  ✅ No parity violations found — markets are efficiently priced")
@@ -506,6 +809,7 @@ def format_report(opportunities, stats):
     # Single-market parity
     singles = [o for o in opportunities if o.get("type") == "SINGLE_MARKET_PARITY"]
     brackets = [o for o in opportunities if o.get("type") == "BRACKET_PARITY"]
+    ladders = [o for o in opportunities if o.get("type") in ("NO_LADDER_PARITY", "THRESHOLD_PARITY")]
     
     if singles:
         lines.append(f"🎯 SINGLE-MARKET PARITY ({len(singles)} found)")
@@ -522,6 +826,7 @@ def format_report(opportunities, stats):
                          f"risk: {opp.get('risk_score', '?')}/100 | "
                          f"bid spread: YES {opp['yes_bid']}¢ / NO {opp['no_bid']}¢")
             lines.append(f"     🔗 {opp['url']}")
+            lines.extend(_depth_lines(opp))
     
     if brackets:
         lines.append(f"\n🏗️ BRACKET PARITY ({len(brackets)} found)")
@@ -535,10 +840,29 @@ def format_report(opportunities, stats):
             stale = " ⚠️ STALE DATA?" if opp.get('stale_warning') else ""
             lines.append(f"     💰 Profit: ${opp['net_profit']:.4f} ({opp['profit_pct']:.2f}%){stale}"
                          f" | risk: {opp.get('risk_score', '?')}/100")
+            lines.extend(_depth_lines(opp))
             for b in opp.get("brackets", [])[:6]:
                 lines.append(f"       • {b['ticker']}: YES@{b['yes_ask']}¢ — "
                              f"{b['title'][:45]}")
     
+    if ladders:
+        lines.append(f"\n🪜 LADDER PARITY ({len(ladders)} found)")
+        lines.append("-" * 55)
+        for opp in ladders[:10]:
+            emoji = "🚨" if opp["profit_pct"] > 1.0 else "⚠️"
+            stale = " ⚠️ STALE DATA?" if opp.get('stale_warning') else ""
+            lines.append(f"\n  {emoji} {opp.get('event_title', 'Event')[:60]}")
+            if opp["type"] == "NO_LADDER_PARITY":
+                lines.append(f"     NO on all {opp['num_brackets']} brackets: "
+                             f"{opp['total_no_cents']}¢ for ${opp['payout']} payout")
+            else:
+                legs = " + ".join(f"{leg['side']} {leg['ticker']}@{leg.get('yes_ask') or leg.get('no_ask')}¢"
+                                  for leg in opp["legs"])
+                lines.append(f"     {legs} = {opp['total_cost_cents']}¢")
+            lines.append(f"     💰 Profit: ${opp['net_profit']:.4f} ({opp['profit_pct']:.2f}%){stale}"
+                         f" | risk: {opp.get('risk_score', '?')}/100")
+            lines.extend(_depth_lines(opp))
+    
     lines.append("\n" + "=" * 65)
     lines.append("⚠️  Use FOK (fill-or-kill) orders to avoid one-leg risk!")
     lines.append("    Verify both legs fill before counting as success.")
@@ -547,8 +871,19 @@ def format_report(opportunities, stats):
     return "\n".join(lines)
 
 
-def save_results(opportunities, stats, path=None):
-    """Save results to JSON file."""
+def _depth_lines(opp):
+    depth = opp.get("depth")
+    if not depth:
+        return []
+    if not depth["max_contracts"]:
+        return ["     📚 Depth: not executable at current book"]
+    return [f"     📚 Depth: {depth['max_contracts']} contracts | "
+            f"${depth['capacity_dollars']:.2f} capacity | "
+            f"${depth['net_profit']:.2f} net ({depth['levels_used']} levels)"]
+
+
+def save_results(opportunities, stats, path=None, columnar=False, write_json=True):
+    """Save results to JSON and/or a columnar snapshot (data/snapshots/parity)."""
     if path is None:
         path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
                             "parity-scan-results.json")
@@ -559,16 +894,28 @@ def save_results(opportunities, stats, path=None):
         "opportunities": opportunities,
     }
     
-    with open(path, "w") as f:
-        json.dump(output, f, indent=2, default=str)
+    if write_json:
+        with open(path, "w") as f:
+            json.dump(output, f, indent=2, default=str)
+        print(f"\n💾 Results saved to {path}")
     
-    print(f"\n💾 Results saved to {path}")
+    if columnar:
+        from snapshot_columns import write_snapshot
+        snap_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "data", "snapshots", "parity")
+        write_snapshot(opportunities, snap_dir, source="parity_scanner")
+        print(f"💾 Columnar snapshot saved to {snap_dir}")
 
 
 def main():
     threshold = DEFAULT_THRESHOLD
     series_filter = None
     fast_mode = False
+    columnar = False
+    write_json = True
+    depth = False
+    stream = False
+    top_k = STREAM_TOP_K
     
     # Parse args
     args = sys.argv[1:]
@@ -583,22 +930,45 @@ def main():
         elif args[i] == "--fast":
             fast_mode = True
             i += 1
+        elif args[i] == "--columnar":
+            columnar = True
+            i += 1
+        elif args[i] == "--no-json":
+            write_json = False
+            i += 1
+        elif args[i] == "--depth":
+            depth = True
+            i += 1
+        elif args[i] == "--stream":
+            stream = True
+            i += 1
+        elif args[i] == "--top" and i + 1 < len(args):
+            top_k = int(args[i + 1])
+            i += 2
         else:
             i += 1
     
-    fast_info = " | Fast mode: skip <$1K volume events" if fast_mode else ""
+    fast_info = " | Fast mode: nested markets, skip <$1K volume / single-market / unchanged events" if fast_mode else ""
     print(f"⚙️  Threshold: ${threshold:.3f} | Series: {series_filter or 'ALL'}{fast_info}\n", flush=True)
     
     start_time = time.time()
-    opportunities, stats = scan_all_parity(threshold=threshold, series_filter=series_filter, fast_mode=fast_mode)
+    if stream:
+        opportunities, stats = stream_parity(threshold=threshold, series_filter=series_filter,
+                                             fast_mode=fast_mode, top_k=top_k)
+    else:
+        opportunities, stats = scan_all_parity(threshold=threshold, series_filter=series_filter, fast_mode=fast_mode)
     scan_duration = time.time() - start_time
     
     print(f"\n⏱️  Scan completed in {scan_duration:.1f}s", flush=True)
     
+    if depth and opportunities:
+        print(f"📚 Sizing top {min(DEPTH_TOP_N, len(opportunities))} opportunities against order books...", flush=True)
+        size_with_depth(opportunities)
+    
     report = format_report(opportunities, stats)
     print(report)
     
-    save_results(opportunities, stats)
+    save_results(opportunities, stats, columnar=columnar, write_json=write_json)
     
     return opportunities, stats
 
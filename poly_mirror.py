@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+poly_mirror - Polymarket 本地镜像 + 标题倒排索引
+
+功能：
+    - 批量同步 Gamma API 的所有 active 事件/市场到 data/polymarket_mirror.json
+    - 建立标题词 → 事件 的倒排索引，交叉验证变成内存查找 (不再每个候选一次 HTTP)
+    - 镜像过期 (默认 15 分钟) 时首次查询自动重新同步一次；也可以 cron 定时 --sync
+    - 录制 Gamma 返回为 fixture，并用本地替身服务器回放 (离线调试 / 测试)
+
+用法：
+    python poly_mirror.py --sync                      # 同步镜像 (cron 每 10-15 分钟)
+    python poly_mirror.py --query "fed rate cut march"
+    python poly_mirror.py --record data/fixtures/poly_events.json   # 录制 fixture
+    python poly_mirror.py --serve data/fixtures/poly_events.json --port 8765
+    POLY_GAMMA_API=http://127.0.0.1:8765 python poly_mirror.py --sync
+
+    from poly_mirror import lookup_price, get_index
+    lookup_price("fed rate cut march")      # YES 概率 (0-1) 或 None
+    get_index().search("fed rate cut")      # [(hits, event, market), ...]
+
+依赖：
+    - requests (可选，缺失时用 urllib)
+    - host_limiter.py
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import threading
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from host_limiter import throttle
+
+try:
+    import requests
+except ImportError:
+    requests = None
+
+POLY_GAMMA_API = os.environ.get("POLY_GAMMA_API", "https://gamma-api.polymarket.com")
+MIRROR_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "polymarket_mirror.json")
+
+MIRROR_MAX_AGE = 15 * 60   # 秒；超过则下一次查询前重新同步
+PAGE_SIZE = 100
+MAX_PAGES = 50             # 最多 5000 个事件
+MIN_KEYWORD_HITS = 2       # 与 report_v2.search_polymarket 原逻辑一致
+SYNC_RETRY_SECONDS = 5 * 60   # 同步失败后这段时间内直接用旧索引，不再重试
+
+
+def _get_json(path: str, params: Dict):
+    url = f"{POLY_GAMMA_API}{path}"
+    with throttle(url):
+        if requests is not None:
+            r = requests.get(url, params=params, timeout=15)
+            r.raise_for_status()
+            return r.json()
+        import urllib.request
+        with urllib.request.urlopen(f"{url}?{urlencode(params)}", timeout=15) as resp:
+            return json.loads(resp.read().decode("utf-8"))
+
+
+def fetch_event_pages(max_pages: int = MAX_PAGES, page_size: int = PAGE_SIZE) -> List[List[Dict]]:
+    """按 24h 成交量降序分页拉取所有 active 事件 (原始返回，每页一个 list)"""
+    pages = []
+    for page in range(max_pages):
+        data = _get_json("/events", {
+            "limit": page_size,
+            "offset": page * page_size,
+            "active": "true",
+            "closed": "false",
+            "order": "volume24hr",
+            "ascending": "false",
+        })
+        events = data if isinstance(data, list) else []
+        pages.append(events)
+        if len(events) < page_size:
+            break
+    return pages
+
+
+def yes_price(market: Dict) -> Optional[float]:
+    """outcomePrices[0] → YES 概率 (0-1)"""
+    prices = market.get("outcomePrices", "")
+    if isinstance(prices, str):
+        try:
+            prices = json.loads(prices)
+        except (ValueError, TypeError):
+            return None
+    try:
+        return float(prices[0]) if prices else None
+    except (ValueError, TypeError, IndexError):
+        return None
+
+
+def compact_event(event: Dict) -> Dict:
+    """只保留比价需要的字段 (description 保留全文：search_terms 按描述匹配)"""
+    return {
+        "id": event.get("id"),
+        "slug": event.get("slug", ""),
+        "title": event.get("title", "") or "",
+        "description": event.get("description", "") or "",
+        "volume24hr": event.get("volume24hr", 0) or 0,
+        "endDate": event.get("endDate", ""),
+        "markets": [{
+            "id": m.get("id"),
+            "slug": m.get("slug", ""),
+            "question": m.get("question", "") or "",
+            "outcomePrices": m.get("outcomePrices", ""),
+            "volume": m.get("volume", 0) or 0,
+            "yes": yes_price(m),
+        } for m in event.get("markets", []) or []],
+    }
+
+
+def sync(path: Optional[str] = None, pages: Optional[List[List[Dict]]] = None) -> Dict:
+    """拉取 (或使用给定的 pages) 并原子写入镜像文件"""
+    path = path or MIRROR_FILE
+    t0 = time.time()
+    if pages is None:
+        pages = fetch_event_pages()
+    events = [compact_event(e) for page in pages for e in page]
+    mirror = {"synced_at": time.time(), "source": POLY_GAMMA_API, "events": events}
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(mirror, f, ensure_ascii=False)
+    os.replace(tmp, path)
+    n_markets = sum(len(e["markets"]) for e in events)
+    print(f"🪞 Polymarket 镜像: {len(events)} 事件 / {n_markets} 市场 "
+          f"({len(pages)} 页, {time.time() - t0:.1f}s) → {path}", file=sys.stderr, flush=True)
+    return mirror
+
+
+def load_mirror(path: Optional[str] = None) -> Optional[Dict]:
+    try:
+        with open(path or MIRROR_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _tokens(text: str) -> List[str]:
+    return re.sub(r'[^a-z0-9\s]', ' ', text.lower()).split()
+
+
+class PolyIndex:
+    """
+    标题词倒排索引
+
+    原 search_polymarket 用子串匹配 (kw in title)；这里按词匹配，
+    并把每个标题词的所有前缀 (>= 4 字符) 也入索引，覆盖 "rate" → "rates" 这类情况。
+    """
+
+    def __init__(self, events: List[Dict]):
+        self.events = events
+        self.index: Dict[str, List[int]] = {}
+        for i, e in enumerate(events):
+            keys = set()
+            for tok in _tokens(e.get("title", "")):
+                for k in range(4, len(tok) + 1):
+                    keys.add(tok[:k])
+            for key in keys:
+                self.index.setdefault(key, []).append(i)
+
+    def search(self, query: str, min_hits: int = MIN_KEYWORD_HITS,
+               limit: int = 5) -> List[Tuple[int, Dict, Dict]]:
+        """
+        关键词 (> 3 字符) 命中数 >= min_hits 的事件，按命中数、24h 成交量排序
+
+        Returns:
+            [(hits, event, 主市场), ...]
+        """
+        keywords = {w for w in _tokens(query) if len(w) > 3}
+        hits: Dict[int, int] = {}
+        for kw in keywords:
+            for i in self.index.get(kw, ()):
+                hits[i] = hits.get(i, 0) + 1
+        ranked = sorted((i for i, h in hits.items() if h >= min_hits),
+                        key=lambda i: (-hits[i], -self.events[i]["volume24hr"]))
+        out = []
+        for i in ranked[:limit]:
+            e = self.events[i]
+            if e["markets"]:
+                out.append((hits[i], e, e["markets"][0]))
+        return out
+
+    def search_terms(self, terms: List[str]) -> List[Dict]:
+        """任一短语出现在标题/描述中的事件 (cross_platform_monitor 的已知配对)"""
+        terms = [t.lower() for t in terms]
+        return [e for e in self.events
+                if any(t in f"{e['title']} {e['description']}".lower() for t in terms)]
+
+
+_lock = threading.Lock()
+_state = {"index": None, "synced_at": 0.0, "retry_at": 0.0}
+
+
+def get_index(max_age: float = MIRROR_MAX_AGE, path: Optional[str] = None) -> PolyIndex:
+    """
+    返回内存索引；镜像缺失或过期时同步一次 (并发调用只同步一次)
+
+    同步失败时继续用旧镜像 (没有则为空索引)，SYNC_RETRY_SECONDS 内不再重试，
+    避免每次查询都在锁里等网络超时
+    """
+    with _lock:
+        now = time.time()
+        if _state["index"] is not None and (now - _state["synced_at"] < max_age or now < _state["retry_at"]):
+            return _state["index"]
+        mirror = load_mirror(path)
+        if not mirror or now - mirror.get("synced_at", 0) >= max_age:
+            try:
+                mirror = sync(path)
+            except Exception as e:
+                print(f"⚠️ Polymarket 同步失败: {e} ({'用旧镜像' if mirror else '空索引'}，"
+                      f"{SYNC_RETRY_SECONDS // 60} 分钟后重试)", file=sys.stderr)
+                mirror = mirror or {"synced_at": 0.0, "events": []}
+                _state["retry_at"] = time.time() + SYNC_RETRY_SECONDS
+        _state["index"] = PolyIndex(mirror.get("events", []))
+        _state["synced_at"] = mirror.get("synced_at", 0.0)
+        return _state["index"]
+
+
+def lookup_price(query: str) -> Optional[float]:
+    """最佳匹配事件主市场的 YES 概率 (0-1)，无匹配返回 None"""
+    matches = get_index().search(query, limit=1)
+    return matches[0][2]["yes"] if matches else None
+
+
+# ── fixture 录制 / 本地替身服务器 ──
+
+def record_fixture(out_path: str):
+    pages = fetch_event_pages()
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    with open(out_path, "w") as f:
+        json.dump({"recorded_at": time.time(), "events": [e for p in pages for e in p]}, f)
+    print(f"📼 录制 {sum(len(p) for p in pages)} 个事件 → {out_path}", file=sys.stderr)
+
+
+def serve_fixture(fixture_path: str, port: int = 8765):
+    """以 Gamma /events 的 limit/offset 语义回放录制的事件"""
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from urllib.parse import urlsplit, parse_qs
+
+    with open(fixture_path) as f:
+        events = json.load(f)["events"]
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlsplit(self.path)
+            if url.path != "/events":
+                self.send_error(404)
+                return
+            q = parse_qs(url.query)
+            offset = int(q.get("offset", ["0"])[0])
+            limit = int(q.get("limit", [str(PAGE_SIZE)])[0])
+            body = json.dumps(events[offset:offset + limit]).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", port), Handler)
+    print(f"🧪 Gamma 替身服务器: http://127.0.0.1:{port}/events ({len(events)} 事件)", file=sys.stderr)
+    server.serve_forever()
+
+
+def main():
+    args = sys.argv[1:]
+
+    def _arg(flag, default=None):
+        return args[args.index(flag) + 1] if flag in args and args.index(flag) + 1 < len(args) else default
+
+    if "--record" in args:
+        record_fixture(_arg("--record", "data/fixtures/poly_events.json"))
+    elif "--serve" in args:
+        serve_fixture(_arg("--serve"), int(_arg("--port", "8765")))
+    elif "--sync" in args:
+        sync()
+    elif "--query" in args:
+        t0 = time.time()
+        idx = get_index()
+        t1 = time.time()
+        for hits, e, m in idx.search(_arg("--query", "")):
+            print(f"  [{hits}] {e['title'][:70]} | YES {m['yes']} | vol24h {e['volume24hr']:.0f}")
+        print(f"  (索引 {len(idx.events)} 事件 {t1 - t0:.2f}s, 查询 {(time.time() - t1) * 1000:.2f}ms)",
+              file=sys.stderr)
+    else:
+        print(__doc__)
+
+
+if __name__ == "__main__":
+    main()
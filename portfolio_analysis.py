@@ -14,16 +14,17 @@ portfolio_analysis - Kalshi 持仓综合分析
     
 依赖：
     - kalshi.client.KalshiClient
+    - win_prob.py (胜率估计)
 """
 import warnings; warnings.filterwarnings("ignore", message="urllib3 v2")
 import sys
 import os
-import math
 from datetime import datetime, timezone
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../btc-arbitrage/src"))
 from kalshi.client import KalshiClient
+from win_prob import estimate_win_prob
 
 # 账户配置
 ACCOUNTS = [
@@ -73,33 +74,6 @@ def get_all_positions():
     return all_positions, total_cash / 100, total_portfolio / 100
 
 
-def estimate_win_prob(ticker, yes_bid):
-    """Estimate win probability based on market type."""
-    GDP_NOW = 2.0
-    GDP_SIGMA = 1.5
-    
-    if "GDP" in ticker:
-        threshold = float(ticker.split("-T")[-1])
-        z = (GDP_NOW - threshold) / GDP_SIGMA
-        prob = 0.5 * (1 + math.erf(z / math.sqrt(2)))
-        return min(max(prob, 0.05), 0.90)
-    
-    elif "CPI" in ticker:
-        threshold = float(ticker.split("-T")[-1])
-        if threshold <= 0.0:
-            return 0.99
-        elif threshold >= 0.5:
-            return 0.15
-        elif threshold >= 0.4:
-            return 0.30
-        elif threshold >= 0.3:
-            return 0.55
-        else:
-            return 0.80
-    
-    return yes_bid if yes_bid else 0.5
-
-
 def kelly_fraction(prob, odds):
     """Kelly criterion: f* = (p*b - q) / b"""
     if odds <= 0:
@@ -0,0 +1,465 @@
+#!/usr/bin/env python3
+"""
+price_store - 市场价格历史 (OHLCV K 线) 存储
+
+功能：
+    - 把 WebSocket ticker/trade 或定时快照聚合成 1m / 1h / 1d K 线
+    - 按 series / 日期 / 周期分区，列式二进制文件 (array) 追加写入
+    - 读取时 mmap + memoryview，按时间二分查找做区间读取
+    - 提供 WebSocket MessageHandlers 的 storage 适配器 (CandleStorage)
+    - 多进程写入 (WebSocket CandleStorage + notify.scan 快照)：tickers.json 加文件锁
+      合并分配 id，分区追加 (各列 + 段索引) 持 append.lock，累计成交量的上次值持久化 (last_volume.json)，新进程也能算出增量
+
+用法：
+    from price_store import PriceStore
+    store = PriceStore()
+    store.record_snapshot(markets)            # 定时快照 (API markets 列表)
+    store.flush()
+    candles = store.read_candles("KXGDP-26JAN30-T2.5", start_ts, end_ts, "1h")
+
+    python price_store.py KXGDP-26JAN30-T2.5 --hours 48      # 查看最近 K 线
+    python price_store.py --bench 200000                     # 合成数据性能测试
+
+依赖：
+    - 无 (标准库)
+"""
+
+import os
+import json
+import mmap
+import time
+import random
+import argparse
+from array import array
+from contextlib import contextmanager
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:   # Windows: 不加锁
+    fcntl = None
+
+STORE_DIR = Path(__file__).parent / "data" / "price_history"
+
+# 周期 → 秒
+RESOLUTIONS = {"1m": 60, "1h": 3600, "1d": 86400}
+
+# 列名 → array typecode (价格用 ¢，int16 足够)
+COLUMNS = {
+    "ticker_id": "i",
+    "bucket_ts": "q",
+    "open": "h",
+    "high": "h",
+    "low": "h",
+    "close": "h",
+    "volume": "q",
+}
+
+
+def series_of(ticker: str) -> str:
+    """KXGDP-26JAN30-T2.5 → KXGDP"""
+    return ticker.split("-")[0] if "-" in ticker else ticker
+
+
+def day_of(ts: int) -> str:
+    """epoch 秒 → YYYYMMDD (UTC)"""
+    return datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y%m%d")
+
+
+@contextmanager
+def _file_lock(path: Path):
+    """跨进程独占锁 (path 为锁文件)"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _write_json(path: Path, data):
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+class _Partition:
+    """一个 (series, day, resolution) 分区：列文件 + ticker 字典"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.tickers: List[str] = []
+        self.ticker_ids: Dict[str, int] = {}
+        self._reload()
+
+    def _reload(self):
+        index_file = self.path / "tickers.json"
+        if index_file.exists():
+            with open(index_file) as f:
+                self.tickers = json.load(f)
+            self.ticker_ids = {t: i for i, t in enumerate(self.tickers)}
+
+    def ticker_id(self, ticker: str) -> int:
+        """
+        ticker → 分区内 id (只追加，已分配的 id 不变)
+
+        新 ticker 在文件锁内重读 tickers.json 再分配：其他进程 (WebSocket / notify)
+        可能已经追加了别的 ticker，不能用本进程缓存的长度当新 id
+        """
+        tid = self.ticker_ids.get(ticker)
+        if tid is None:
+            with _file_lock(self.path / "tickers.lock"):
+                self._reload()
+                tid = self.ticker_ids.get(ticker)
+                if tid is None:
+                    tid = self.ticker_ids[ticker] = len(self.tickers)
+                    self.tickers.append(ticker)
+                    _write_json(self.path / "tickers.json", self.tickers)
+        return tid
+
+    def append(self, rows: List[Tuple]):
+        """rows: [(ticker, bucket_ts, o, h, l, c, v), ...]，已按 bucket_ts 排序"""
+        cols = {name: array(code) for name, code in COLUMNS.items()}
+        for ticker, bucket_ts, o, h, l, c, v in rows:
+            cols["ticker_id"].append(self.ticker_id(ticker))
+            cols["bucket_ts"].append(bucket_ts)
+            cols["open"].append(o)
+            cols["high"].append(h)
+            cols["low"].append(l)
+            cols["close"].append(c)
+            cols["volume"].append(v)
+        ts = cols["bucket_ts"]
+        # 多个写入进程 (WebSocket / notify) 可能写同一分区：行号计算 + 各列 + 段索引在同一把锁内完成
+        with _file_lock(self.path / "append.lock"):
+            ts_file = self.path / "bucket_ts.bin"
+            row_start = (ts_file.stat().st_size if ts_file.exists() else 0) // ts.itemsize
+            for name, col in cols.items():
+                with open(self.path / f"{name}.bin", "ab") as f:
+                    col.tofile(f)
+            # 段索引：每次 flush 一段，段内按 bucket_ts 有序
+            with open(self.path / "segments.bin", "ab") as f:
+                array("q", [row_start, len(ts), ts[0], ts[-1]]).tofile(f)
+
+
+class _ColumnReader:
+    """mmap 只读列视图 (文件为空时返回空 array)"""
+
+    def __init__(self, path: Path):
+        self._maps = []
+        self.columns = {}
+        for name, code in COLUMNS.items():
+            file = path / f"{name}.bin"
+            size = file.stat().st_size if file.exists() else 0
+            itemsize = array(code).itemsize
+            size -= size % itemsize  # 忽略写了一半的尾部
+            if size <= 0:
+                self.columns[name] = array(code)
+                continue
+            with open(file, "rb") as f:
+                mm = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+            self._maps.append(mm)
+            self.columns[name] = memoryview(mm).cast(code)
+
+    def __len__(self):
+        return min(len(c) for c in self.columns.values())
+
+    def close(self):
+        for view in self.columns.values():
+            if isinstance(view, memoryview):
+                view.release()
+        for mm in self._maps:
+            mm.close()
+
+
+class PriceStore:
+    """
+    K 线存储
+
+    写入：record_tick / record_snapshot → 内存聚合 → flush() 落盘
+    读取：read_candles (跨天分区，自动合并同一 bucket 的多段写入)
+    """
+
+    def __init__(self, root: Path = STORE_DIR, resolutions: Tuple[str, ...] = ("1m", "1h", "1d")):
+        self.root = Path(root)
+        self.resolutions = resolutions
+        # (ticker, resolution) → [bucket_ts, o, h, l, c, v]
+        self._open: Dict[Tuple[str, str], List[int]] = {}
+        # (series, day, resolution) → 已收盘待写入的行
+        self._pending: Dict[Tuple[str, str, str], List[Tuple]] = {}
+        self._partitions: Dict[Tuple[str, str, str], _Partition] = {}
+        # ticker → 上次累计成交量 (持久化在 last_volume.json，跨进程 / 跨次运行)
+        self._last_volume: Optional[Dict[str, int]] = None
+        self._volume_dirty: Dict[str, int] = {}
+
+    # ---------------- 写入 ----------------
+
+    def record_tick(self, ticker: str, ts: float, price: int, volume: int = 0):
+        """记录一笔价格观测 (volume = 本次新增成交量)"""
+        if not ticker or price is None:
+            return
+        ts = int(ts)
+        price = int(price)
+        for res in self.resolutions:
+            width = RESOLUTIONS[res]
+            bucket_ts = ts - ts % width
+            key = (ticker, res)
+            bar = self._open.get(key)
+            if bar is not None and bar[0] != bucket_ts:
+                if bucket_ts < bar[0]:
+                    continue  # 迟到的旧数据，丢弃
+                self._close_bar(ticker, res, bar)
+                bar = None
+            if bar is None:
+                self._open[key] = [bucket_ts, price, price, price, price, volume]
+            else:
+                bar[2] = max(bar[2], price)
+                bar[3] = min(bar[3], price)
+                bar[4] = price
+                bar[5] += volume
+
+    def record_cumulative(self, ticker: str, ts: float, price: int, cum_volume: Optional[int]):
+        """记录带累计成交量的观测 (API 快照 / ticker 消息)，自动换算成增量"""
+        volume = 0
+        if cum_volume is not None:
+            prev = self._volumes().get(ticker)
+            if prev is not None and cum_volume >= prev:
+                volume = cum_volume - prev
+            self._last_volume[ticker] = self._volume_dirty[ticker] = cum_volume
+        self.record_tick(ticker, ts, price, volume)
+
+    def _volumes(self) -> Dict[str, int]:
+        if self._last_volume is None:
+            try:
+                with open(self.root / "last_volume.json") as f:
+                    self._last_volume = json.load(f)
+            except (OSError, ValueError):
+                self._last_volume = {}
+        return self._last_volume
+
+    def _save_volumes(self):
+        """合并写回 last_volume.json (文件锁内重读，只覆盖本进程更新过的 ticker)"""
+        if not self._volume_dirty:
+            return
+        path = self.root / "last_volume.json"
+        with _file_lock(self.root / "last_volume.lock"):
+            try:
+                with open(path) as f:
+                    saved = json.load(f)
+            except (OSError, ValueError):
+                saved = {}
+            saved.update(self._volume_dirty)
+            _write_json(path, saved)
+        self._volume_dirty.clear()
+
+    def record_snapshot(self, markets: List[Dict], ts: Optional[float] = None):
+        """记录一次 /markets 快照"""
+        ts = ts or time.time()
+        for m in markets:
+            price = m.get("last_price")
+            if price is None:
+                continue
+            self.record_cumulative(m.get("ticker", ""), ts, price, m.get("volume"))
+
+    def _close_bar(self, ticker: str, res: str, bar: List[int]):
+        key = (series_of(ticker), day_of(bar[0]), res)
+        self._pending.setdefault(key, []).append((ticker, *bar))
+
+    def flush(self, include_open: bool = False):
+        """
+        把已收盘的 K 线写入磁盘
+
+        include_open=True 时把未收盘的 K 线也写出 (进程退出前调用)；
+        之后同一 bucket 的新数据会另起一段，读取时合并。
+        """
+        if include_open:
+            for (ticker, res), bar in list(self._open.items()):
+                self._close_bar(ticker, res, bar)
+            self._open.clear()
+
+        for key, rows in self._pending.items():
+            if not rows:
+                continue
+            series, day, res = key
+            part = self._partitions.get(key)
+            if part is None:
+                part = self._partitions[key] = _Partition(self.root / series / day / res)
+            rows.sort(key=lambda r: r[1])
+            part.append(rows)
+        self._pending.clear()
+        self._save_volumes()
+
+    # ---------------- 读取 ----------------
+
+    def read_candles(self, ticker: str, start_ts: int, end_ts: int, resolution: str = "1h") -> List[Dict]:
+        """
+        读取 [start_ts, end_ts] 内的 K 线 (按时间升序)
+
+        Returns:
+            [{"ts", "open", "high", "low", "close", "volume"}, ...]
+        """
+        width = RESOLUTIONS[resolution]
+        merged: Dict[int, List[int]] = {}
+        day_ts = start_ts - start_ts % 86400
+        while day_ts <= end_ts:
+            path = self.root / series_of(ticker) / day_of(day_ts) / resolution
+            day_ts += 86400
+            if not (path / "tickers.json").exists():
+                continue
+            with open(path / "tickers.json") as f:
+                tickers = json.load(f)
+            if ticker not in tickers:
+                continue
+            tid = tickers.index(ticker)
+            reader = _ColumnReader(path)
+            try:
+                cols = reader.columns
+                ts_col, tid_col = cols["bucket_ts"], cols["ticker_id"]
+                n = len(reader)
+                lo_ts = start_ts - start_ts % width
+                for seg_start, seg_len, seg_min, seg_max in _segments(path):
+                    if seg_max < lo_ts or seg_min > end_ts:
+                        continue
+                    seg_end = min(seg_start + seg_len, n)
+                    lo = bisect_left(ts_col, lo_ts, seg_start, seg_end)
+                    hi = bisect_right(ts_col, end_ts, lo, seg_end)
+                    for i in range(lo, hi):
+                        if tid_col[i] != tid:
+                            continue
+                        bts = ts_col[i]
+                        o, h, l, c, v = cols["open"][i], cols["high"][i], cols["low"][i], cols["close"][i], cols["volume"][i]
+                        bar = merged.get(bts)
+                        if bar is None:
+                            merged[bts] = [o, h, l, c, v]
+                        else:
+                            bar[1] = max(bar[1], h)
+                            bar[2] = min(bar[2], l)
+                            bar[3] = c
+                            bar[4] += v
+            finally:
+                reader.close()
+
+        # 加上内存中尚未落盘的 K 线
+        bar = self._open.get((ticker, resolution))
+        if bar is not None and start_ts - start_ts % width <= bar[0] <= end_ts:
+            prev = merged.get(bar[0])
+            if prev is None:
+                merged[bar[0]] = list(bar[1:])
+            else:
+                prev[1] = max(prev[1], bar[2])
+                prev[2] = min(prev[2], bar[3])
+                prev[3] = bar[4]
+                prev[4] += bar[5]
+
+        return [
+            {"ts": ts, "open": b[0], "high": b[1], "low": b[2], "close": b[3], "volume": b[4]}
+            for ts, b in sorted(merged.items())
+        ]
+
+    def price_at(self, ticker: str, ts: int, resolution: str = "1h", lookback: int = 3 * 86400) -> Optional[int]:
+        """ts 时刻之前最后一根 K 线的收盘价 (没有数据返回 None)"""
+        candles = self.read_candles(ticker, ts - lookback, ts, resolution)
+        return candles[-1]["close"] if candles else None
+
+
+def _segments(path: Path) -> List[Tuple[int, int, int, int]]:
+    """读取分区段索引 [(row_start, row_count, min_ts, max_ts), ...]"""
+    seg = array("q")
+    file = path / "segments.bin"
+    if file.exists():
+        with open(file, "rb") as f:
+            seg.frombytes(f.read())
+    n = len(seg) - len(seg) % 4
+    return [tuple(seg[i:i + 4]) for i in range(0, n, 4)]
+
+
+class CandleStorage:
+    """
+    websocket.handlers.MessageHandlers 的 storage 适配器
+
+        handlers = MessageHandlers(storage=CandleStorage(PriceStore()))
+
+    ticker / trade 消息写入 K 线；订单簿和成交回报忽略。
+    """
+
+    def __init__(self, store: PriceStore, flush_interval: float = 60.0):
+        self.store = store
+        self.flush_interval = flush_interval
+        self._last_flush = time.time()
+
+    def _maybe_flush(self):
+        if time.time() - self._last_flush >= self.flush_interval:
+            self.store.flush()
+            self._last_flush = time.time()
+
+    async def save_ticker(self, market: str, data: Dict):
+        price = data.get("last_price")
+        if price is not None:
+            self.store.record_cumulative(market, time.time(), price, data.get("volume"))
+        self._maybe_flush()
+
+    async def save_trade(self, market: str, data: Dict):
+        price = data.get("yes_price")
+        if price is not None:
+            # trade 自带成交量；ticker 的累计量不重复计入
+            self.store.record_tick(market, time.time(), price, data.get("count") or 0)
+        self._maybe_flush()
+
+    async def save_orderbook_snapshot(self, market: str, data: Dict):
+        pass
+
+    async def save_orderbook_delta(self, market: str, data: Dict):
+        pass
+
+    async def save_fill(self, data: Dict):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="价格历史 K 线存储")
+    parser.add_argument("ticker", nargs="?", help="查看该市场的 K 线")
+    parser.add_argument("--hours", type=int, default=24, help="查看最近 N 小时")
+    parser.add_argument("--res", choices=list(RESOLUTIONS), default="1h", help="K 线周期")
+    parser.add_argument("--bench", type=int, default=0, help="写入 N 个合成 tick 并测试区间读取")
+    args = parser.parse_args()
+
+    if args.bench:
+        import tempfile
+        with tempfile.TemporaryDirectory() as tmp:
+            store = PriceStore(Path(tmp))
+            rng = random.Random(1)
+            tickers = [f"KXSYN-26JAN01-T{i}" for i in range(50)]
+            base = 1_767_225_600  # 2026-01-01 UTC
+            price = {t: 50 for t in tickers}
+            t0 = time.time()
+            for i in range(args.bench):
+                t = tickers[i % len(tickers)]
+                price[t] = min(99, max(1, price[t] + rng.randint(-2, 2)))
+                store.record_tick(t, base + i * 2, price[t], rng.randint(0, 20))
+            store.flush(include_open=True)
+            t_write = time.time() - t0
+            t1 = time.time()
+            candles = store.read_candles(tickers[0], base, base + args.bench * 2, "1m")
+            t_read = time.time() - t1
+            print(f"⏱️  写入 {args.bench} tick {t_write:.2f}s | 区间读取 {len(candles)} 根 1m K 线 {t_read * 1000:.1f}ms")
+        return
+
+    if not args.ticker:
+        parser.print_help()
+        return
+
+    store = PriceStore()
+    now = int(time.time())
+    for c in store.read_candles(args.ticker, now - args.hours * 3600, now, args.res):
+        ts = datetime.fromtimestamp(c["ts"], tz=timezone.utc).strftime("%m/%d %H:%M")
+        print(f"{ts}  O{c['open']:>3} H{c['high']:>3} L{c['low']:>3} C{c['close']:>3}  vol {c['volume']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -55,9 +55,20 @@ import re
 import time
 from datetime import datetime, timezone, timedelta
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from market_cache import get_market, log_dedup_stats
+from host_limiter import throttle
+from news_cache import search_news as _cached_news, flush_news_cache
+from poly_mirror import lookup_price as lookup_polymarket
+
 API_BASE = "https://api.elections.kalshi.com/trade-api/v2"
 WATCHLIST_FILE = os.path.join(os.path.dirname(__file__), "data", "watchlist_series.json")
 
+# 决策阈值 (MIN_VOLUME 对应 param_sweep.py 的 min_volume 网格；BUY/WAIT 分数线不在回测范围内)
+MIN_VOLUME = 200       # Skip low liquidity markets
+BUY_SCORE_MIN = 70     # final_score >= 70 → BUY
+WAIT_SCORE_MIN = 50    # final_score >= 50 → WAIT
+
 # Fallback 硬编码列表 (当 watchlist 不存在时使用)
 FALLBACK_SERIES = [
     "KXGDP", "KXCPI", "KXFED", "KXPCE", "KXJOBLESS", "KXUNEMPLOY",
@@ -84,7 +95,8 @@ def load_watchlist_series():
 
 def api_get(endpoint, params=None):
     try:
-        resp = requests.get(f"{API_BASE}{endpoint}", params=params, timeout=15)
+        with throttle(API_BASE):
+            resp = requests.get(f"{API_BASE}{endpoint}", params=params, timeout=15)
         resp.raise_for_status()
         return resp.json()
     except Exception as e:
@@ -92,76 +104,28 @@ def api_get(endpoint, params=None):
         return None
 
 def fetch_market_details(ticker):
-    """Fetch complete market details including rules"""
-    data = api_get(f"/markets/{ticker}")
-    if not data:
-        return None
-    return data.get("market", {})
+    """Fetch complete market details including rules (single-flight + short TTL cache)"""
+    def _fetch():
+        data = api_get(f"/markets/{ticker}")
+        if not data:
+            return None
+        return data.get("market", {})
+    return get_market(ticker, _fetch)
 
 def kalshi_url(ticker):
     return f"https://kalshi.com/markets/{ticker.lower()}"
 
 def search_polymarket(query, max_results=3):
-    """Search Polymarket for matching markets, return YES probability (0-1) or None"""
+    """Look up Polymarket YES probability (0-1) in the local mirror index, or None"""
     try:
-        r = requests.get("https://gamma-api.polymarket.com/events",
-                        params={"active": "true", "closed": "false", "limit": 20},
-                        timeout=10)
-        if r.status_code != 200:
-            return None
-        data = r.json()
-        events = data if isinstance(data, list) else []
-        # Fuzzy match by title keywords
-        query_lower = query.lower()
-        for event in events:
-            title = event.get("title", "").lower()
-            # Check if 2+ keywords match
-            keywords = [w for w in query_lower.split() if len(w) > 3]
-            matches = sum(1 for kw in keywords if kw in title)
-            if matches >= 2:
-                markets = event.get("markets", [])
-                if markets:
-                    # Get the main market price (0-1 range)
-                    prices = json.loads(markets[0].get("outcomePrices", "[]"))
-                    if prices:
-                        return float(prices[0])
-        return None
-    except:
+        return lookup_polymarket(query)
+    except Exception:
         return None
 
 
 def search_news(query, max_results=5):
-    """Search Google News RSS for recent articles"""
-    results = []
-    try:
-        import urllib.parse
-        query_encoded = urllib.parse.quote(query)
-        url = f"https://news.google.com/rss/search?q={query_encoded}&hl=en-US&gl=US&ceid=US:en"
-        
-        if hasattr(requests, 'get'):
-            # Using requests
-            r = requests.get(url, timeout=10)
-            text = r.text
-        else:
-            # Using urllib fallback
-            import urllib.request
-            req = urllib.request.Request(url)
-            with urllib.request.urlopen(req, timeout=10) as resp:
-                text = resp.read().decode('utf-8')
-        
-        import re
-        titles = re.findall(r'<title>(.*?)</title>', text)
-        dates = re.findall(r'<pubDate>(.*?)</pubDate>', text)
-        
-        for i, title in enumerate(titles[1:max_results+1]):  # skip feed title
-            results.append({
-                "title": title,
-                "date": dates[i] if i < len(dates) else "",
-            })
-    except Exception as e:
-        # Fail silently, don't block on news errors
-        pass
-    return results
+    """Search Google News RSS for recent articles (normalized query, persistent TTL cache)"""
+    return _cached_news(query, max_results)
 
 def format_vol(v):
     if v >= 1_000_000:
@@ -413,11 +377,11 @@ def score_market(m):
     final_score += yield_bonus
     
     # 决策
-    if final_score >= 70 and liquidity_ok and direction_score >= -20:
+    if final_score >= BUY_SCORE_MIN and liquidity_ok and direction_score >= -20:
         decision = "🟢 BUY"
         confidence = "HIGH"
         position = 100 if final_score >= 85 else 50
-    elif final_score >= 50 and direction_score >= -40:
+    elif final_score >= WAIT_SCORE_MIN and direction_score >= -40:
         decision = "🟡 WAIT"
         confidence = "MEDIUM"
         position = 25
@@ -429,7 +393,7 @@ def score_market(m):
     # News validation (only for promising candidates)
     news_count = 0
     pm_price_val = None
-    if final_score >= 50:  # Only search news for candidates worth considering
+    if final_score >= WAIT_SCORE_MIN:  # Only search news for candidates worth considering
         title_for_search = m.get("title", "")
         subtitle = m.get("yes_sub_title", "") or m.get("no_sub_title", "")
         
@@ -458,8 +422,6 @@ def score_market(m):
             else:
                 direction_score -= 10
                 warnings.append("❌ 无相关新闻佐证")
-        
-        time.sleep(0.1)
 
         # Polymarket cross-validation
         if query_terms:
@@ -478,11 +440,11 @@ def score_market(m):
     final_score += min(ann_yield / 100, 20)  # 收益率只加少量分
     
     # 最终决策
-    if final_score >= 70 and liquidity_ok and direction_score >= -20:
+    if final_score >= BUY_SCORE_MIN and liquidity_ok and direction_score >= -20:
         decision = "🟢 BUY"
         confidence = "HIGH"
         position = 100 if final_score >= 85 else 50
-    elif final_score >= 50 and direction_score >= -40:
+    elif final_score >= WAIT_SCORE_MIN and direction_score >= -40:
         decision = "🟡 WAIT"
         confidence = "MEDIUM"
         position = 25
@@ -518,7 +480,6 @@ def scan_and_decide():
     now = datetime.now(timezone.utc)
     
     # === OPTIMIZATION CONFIG ===
-    MIN_VOLUME = 200  # Skip low liquidity markets
     MAX_WORKERS_SERIES = 3   # Conservative: Kalshi rate-limits at 8+ concurrent (429)
     MAX_WORKERS_DETAILS = 5  # Parallel detail fetches
     
@@ -601,6 +562,9 @@ def scan_and_decide():
             if done % 20 == 0 or done == len(candidates):
                 print(f"  Progress: {done}/{len(candidates)} analyzed", file=sys.stderr, flush=True)
     
+    log_dedup_stats("report_v2")
+    flush_news_cache("report_v2")
+    
     # Sort by score
     opportunities.sort(key=lambda x: -x["score"])
     
@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+"""
+snapshot_columns - 扫描结果的列式导出 / 零拷贝读取
+
+功能：
+    - 把扫描结果 (list[dict]) 写成每列一个 .npy 文件 + schema.json 头
+      (.npy 用标准库写出，numpy.load(mmap_mode="r") 可直接读)
+    - 安装了 pyarrow 时可选 Arrow IPC / Parquet 格式
+    - write_columns 直接写 array 列 (backtest_engine 的 SettledHistory)
+    - SnapshotReader 按需 mmap 单列，不解析其他列
+    - 每次写出新一代文件 (文件名带代号，新 inode)，最后原子替换 schema.json；
+      已 mmap 旧文件的读取方不受影响，上一代文件保留到再下一次写入才删除
+    - JSON 仍可作为可选视图 (json_path)
+
+用法：
+    from snapshot_columns import write_snapshot, SnapshotReader
+    write_snapshot(opportunities, "data/snapshots/endgame", source="endgame_scanner")
+    r = SnapshotReader("data/snapshots/endgame")
+    prices = r.column("entry_cost")         # memoryview (零拷贝)
+    rows = r.rows(["ticker", "edge"])
+
+    python snapshot_columns.py data/snapshots/endgame            # 查看 schema
+    python snapshot_columns.py data/snapshots/endgame --head 5 --cols ticker,edge
+
+依赖：
+    - 无 (标准库)；pyarrow 可选
+"""
+
+import os
+import sys
+import ast
+import json
+import mmap
+import time
+import argparse
+from array import array
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Union
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+SCHEMA_FILE = "schema.json"
+NPY_MAGIC = b"\x93NUMPY"
+
+# 列类型 → (npy descr, array typecode)
+NUMERIC_DTYPES = {
+    "int": ("<i8", "q"),
+    "float": ("<f8", "d"),
+    "bool": ("|b1", "b"),
+}
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+
+def _infer_kind(values: Sequence) -> str:
+    """推断列类型: int / float / bool / str (嵌套结构、超出 int64 的整数按字符串存)"""
+    kinds = set()
+    for v in values:
+        if v is None:
+            kinds.add("none")
+        elif isinstance(v, bool):
+            kinds.add("bool")
+        elif isinstance(v, int):
+            if not INT64_MIN <= v <= INT64_MAX:
+                return "str"
+            kinds.add("int")
+        elif isinstance(v, float):
+            kinds.add("float")
+        else:
+            return "str"
+    has_none = "none" in kinds
+    kinds.discard("none")
+    if not kinds:
+        return "str"
+    if kinds == {"bool"}:
+        # bool 列没有缺失值表示 → 按字符串存 ("True" / "False" / "")
+        return "str" if has_none else "bool"
+    if kinds <= {"int", "float"}:
+        # int 列出现 None → 用 float(NaN) 表示缺失
+        return "int" if kinds == {"int"} and not has_none else "float"
+    return "str"
+
+
+def _to_text(v) -> str:
+    if v is None:
+        return ""
+    if isinstance(v, str):
+        return v
+    if isinstance(v, (dict, list, tuple)):
+        return json.dumps(v, ensure_ascii=False, default=str)
+    return str(v)
+
+
+def _npy_header(descr: str, n: int) -> bytes:
+    header = "{'descr': '%s', 'fortran_order': False, 'shape': (%d,), }" % (descr, n)
+    # magic(6) + version(2) + len(2) + header + '\n'，总长 64 字节对齐
+    pad = 64 - (10 + len(header) + 1) % 64
+    header = header + " " * (pad % 64) + "\n"
+    return NPY_MAGIC + b"\x01\x00" + len(header).to_bytes(2, "little") + header.encode("latin1")
+
+
+def _generation() -> str:
+    """本次写入的文件代号 (同目录多次写入互不覆盖)"""
+    return f"{time.time_ns():x}-{os.getpid():x}"
+
+
+def _read_schema(out_dir: Path) -> Optional[Dict]:
+    try:
+        with open(out_dir / SCHEMA_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _schema_files(schema: Optional[Dict]) -> set:
+    return {meta["file"] for meta in (schema or {}).get("columns", {}).values()}
+
+
+def _write_npy(path: Path, kind: str, values: Sequence) -> Dict:
+    n = len(values)
+    if kind in NUMERIC_DTYPES:
+        descr, code = NUMERIC_DTYPES[kind]
+        if kind == "float":
+            data = array(code, (float("nan") if v is None else float(v) for v in values))
+        else:
+            data = array(code, (int(v) for v in values))
+        if sys.byteorder == "big":
+            data.byteswap()
+        body = data.tobytes()
+    else:
+        texts = [_to_text(v) for v in values]
+        width = max((len(t) for t in texts), default=1) or 1
+        descr = f"<U{width}"
+        body = b"".join(t.ljust(width, "\0").encode("utf-32-le") for t in texts)
+    with open(path, "wb") as f:
+        f.write(_npy_header(descr, n))
+        f.write(body)
+    return {"kind": kind, "descr": descr, "file": path.name}
+
+
+def write_snapshot(
+    rows: List[Dict],
+    out_dir: Union[str, Path],
+    columns: Optional[List[str]] = None,
+    fmt: str = "npy",
+    source: str = "",
+    json_path: Optional[Union[str, Path]] = None,
+) -> Path:
+    """
+    把 rows 写成列式快照
+
+    Args:
+        rows: 扫描结果 (list of dict)
+        out_dir: 输出目录 (schema.json + 每列一个文件)
+        columns: 只导出这些列 (默认所有 key 的并集，按首次出现顺序)
+        fmt: "npy" | "arrow" | "parquet" (后两者需要 pyarrow)
+        source: 写入 schema 的来源标记
+        json_path: 同时写出 JSON 视图 (None 则不写)
+
+    Returns:
+        out_dir
+    """
+    if columns is None:
+        columns = []
+        seen = set()
+        for r in rows:
+            for k in r:
+                if k not in seen:
+                    seen.add(k)
+                    columns.append(k)
+
+    col_values = {c: [r.get(c) for r in rows] for c in columns}
+    write_columns(col_values, out_dir, fmt=fmt, source=source)
+
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump(rows, f, indent=2, ensure_ascii=False, default=str)
+
+    return Path(out_dir)
+
+
+def write_columns(
+    col_values: Dict[str, Sequence],
+    out_dir: Union[str, Path],
+    fmt: str = "npy",
+    source: str = "",
+    meta: Optional[Dict] = None,
+) -> Path:
+    """
+    直接写列 (已是列式的数据，如 array 列，免去先拼 dict 行)
+
+    Args:
+        col_values: {列名: 值序列}，各列等长
+        meta: 附加写入 schema["meta"] 的信息 (如字典编码表)
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    previous = _read_schema(out_dir)
+    gen = _generation()
+    columns = list(col_values)
+    n_rows = len(col_values[columns[0]]) if columns else 0
+
+    schema = {
+        "format": fmt,
+        "rows": n_rows,
+        "source": source,
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "columns": {},
+    }
+    if meta:
+        schema["meta"] = meta
+
+    kinds = {
+        c: ("int" if isinstance(v, array) and v.typecode in "bBhHiIlLqQ" else _infer_kind(v))
+        for c, v in col_values.items()
+    }
+
+    if fmt == "npy":
+        for c in columns:
+            filename = f"{_safe_filename(c)}.{gen}.npy"
+            schema["columns"][c] = _write_npy(out_dir / filename, kinds[c], col_values[c])
+    elif fmt in ("arrow", "parquet"):
+        if pyarrow is None:
+            raise RuntimeError(f"pyarrow not installed, cannot write {fmt}")
+        data = {
+            c: [_to_text(v) for v in vals] if kinds[c] == "str" else list(vals)
+            for c, vals in col_values.items()
+        }
+        table = pyarrow.table(data)
+        filename = f"snapshot.{gen}.{fmt}"
+        if fmt == "arrow":
+            with pyarrow.OSFile(str(out_dir / filename), "wb") as sink:
+                with pyarrow.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+        else:
+            pyarrow.parquet.write_table(table, str(out_dir / filename))
+        for c in columns:
+            schema["columns"][c] = {"kind": kinds[c], "file": filename}
+    else:
+        raise ValueError(f"unknown format: {fmt}")
+
+    # 上一代文件记在 retired 里：刚读了旧 schema 的读取方还能打开它们，下一次写入再删
+    current = _schema_files(schema)
+    schema["retired"] = sorted(_schema_files(previous) - current)
+    tmp = out_dir / f"{SCHEMA_FILE}.{gen}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(schema, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, out_dir / SCHEMA_FILE)
+
+    # 删除已 mmap 的文件不影响读取方 (映射仍指向原 inode)
+    for filename in set((previous or {}).get("retired", [])) - current - set(schema["retired"]):
+        try:
+            os.unlink(out_dir / filename)
+        except OSError:
+            pass
+    return out_dir
+
+
+def _safe_filename(name: str) -> str:
+    return "".join(ch if ch.isalnum() or ch in "-_" else "_" for ch in name)
+
+
+class _TextColumn:
+    """定长 UTF-32 列的惰性视图 (只在取值时解码)"""
+
+    def __init__(self, buf: memoryview, width: int, n: int):
+        self._buf = buf
+        self._stride = width * 4
+        self._n = n
+
+    def __len__(self):
+        return self._n
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._n))]
+        if i < 0:
+            i += self._n
+        if not 0 <= i < self._n:
+            raise IndexError(i)
+        raw = bytes(self._buf[i * self._stride:(i + 1) * self._stride])
+        return raw.decode("utf-32-le").rstrip("\0")
+
+    def __iter__(self):
+        for i in range(self._n):
+            yield self[i]
+
+
+class SnapshotReader:
+    """
+    列式快照读取器
+
+    npy 格式：每列单独 mmap，数值列返回 memoryview (零拷贝)，文本列返回惰性视图。
+    列文件一经写出不再修改，读取期间写入方生成新快照也不会改动已映射的数据。
+    arrow/parquet 格式：用 pyarrow 读取指定列。
+    """
+
+    def __init__(self, snapshot_dir: Union[str, Path]):
+        self.dir = Path(snapshot_dir)
+        with open(self.dir / SCHEMA_FILE) as f:
+            self.schema = json.load(f)
+        self._maps: Dict[str, mmap.mmap] = {}
+        self._cache: Dict[str, object] = {}
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self.schema["columns"])
+
+    def __len__(self):
+        return self.schema["rows"]
+
+    def column(self, name: str):
+        """读取单列 (只映射该列文件)"""
+        if name in self._cache:
+            return self._cache[name]
+        meta = self.schema["columns"][name]
+        fmt = self.schema.get("format", "npy")
+        if fmt == "npy":
+            col = self._map_npy(name, meta)
+        else:
+            if pyarrow is None:
+                raise RuntimeError(f"pyarrow not installed, cannot read {fmt}")
+            path = str(self.dir / meta["file"])
+            if fmt == "arrow":
+                table = pyarrow.ipc.open_file(pyarrow.memory_map(path)).read_all()
+            else:
+                table = pyarrow.parquet.read_table(path, columns=[name], memory_map=True)
+            col = table.column(name).to_pylist()
+        self._cache[name] = col
+        return col
+
+    def _map_npy(self, name: str, meta: Dict):
+        n = self.schema["rows"]
+        path = self.dir / meta["file"]
+        with open(path, "rb") as f:
+            if n == 0 or os.fstat(f.fileno()).st_size == 0:
+                return array("q") if meta["kind"] != "str" else []
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps[name] = mm
+        if mm[:6] != NPY_MAGIC:
+            raise ValueError(f"not a .npy file: {path}")
+        header_len = int.from_bytes(mm[8:10], "little")
+        header = ast.literal_eval(mm[10:10 + header_len].decode("latin1"))
+        body = memoryview(mm)[10 + header_len:]
+        descr = header["descr"]
+        if descr.startswith("<U"):
+            return _TextColumn(body, int(descr[2:]), n)
+        kind = meta["kind"]
+        code = NUMERIC_DTYPES[kind][1]
+        if sys.byteorder == "big":
+            data = array(code, body.tobytes())
+            data.byteswap()
+            return data
+        return body.cast(code)
+
+    def rows(self, columns: Optional[List[str]] = None) -> List[Dict]:
+        """还原成 list[dict] (只读取指定列)"""
+        columns = columns or self.columns
+        cols = {c: self.column(c) for c in columns}
+        bool_cols = {c for c in columns if self.schema["columns"][c]["kind"] == "bool"}
+        out = []
+        for i in range(len(self)):
+            row = {}
+            for c, col in cols.items():
+                v = col[i]
+                row[c] = bool(v) if c in bool_cols else v
+            out.append(row)
+        return out
+
+    def close(self):
+        for col in self._cache.values():
+            if isinstance(col, memoryview):
+                col.release()
+        self._cache.clear()
+        for mm in self._maps.values():
+            try:
+                mm.close()
+            except BufferError:
+                pass  # 调用方仍持有列视图
+        self._maps.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="列式快照查看")
+    parser.add_argument("snapshot_dir", help="快照目录 (含 schema.json)")
+    parser.add_argument("--head", type=int, default=0, help="打印前 N 行")
+    parser.add_argument("--cols", default="", help="只读取这些列 (逗号分隔)")
+    args = parser.parse_args()
+
+    with SnapshotReader(args.snapshot_dir) as r:
+        s = r.schema
+        print(f"📦 {args.snapshot_dir} | {s['format']} | {s['rows']} 行 | {s.get('source', '')} | {s['generated_at'][:19]}")
+        for name, meta in s["columns"].items():
+            print(f"  {name}: {meta['kind']} ({meta.get('descr', meta['file'])})")
+        if args.head:
+            cols = [c for c in args.cols.split(",") if c] or None
+            for row in r.rows(cols)[:args.head]:
+                print(json.dumps(row, ensure_ascii=False, default=str))
+
+
+if __name__ == "__main__":
+    main()
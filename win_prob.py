@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+win_prob - 持仓胜率估计 (不依赖 Kalshi 客户端)
+
+功能：
+    - estimate_win_prob: 按市场类型估计 YES 获胜概率
+      GDP 阈值用正态模型 (GDP_NOW / GDP_SIGMA，结果夹在 [0.05, 0.90])，CPI 用分段表
+    - 供 portfolio_analysis 计算 Kelly，fair_value --check 与阶梯定价逐档对比
+
+用法：
+    from win_prob import estimate_win_prob
+    estimate_win_prob("KXGDP-26Q3-T2.5", 0)
+
+依赖：
+    - 无 (标准库)
+"""
+
+import math
+
+GDP_NOW = 2.0
+GDP_SIGMA = 1.5
+GDP_PROB_MIN, GDP_PROB_MAX = 0.05, 0.90
+
+
+def estimate_win_prob(ticker, yes_bid):
+    """Estimate win probability based on market type."""
+    if "GDP" in ticker:
+        threshold = float(ticker.split("-T")[-1])
+        z = (GDP_NOW - threshold) / GDP_SIGMA
+        prob = 0.5 * (1 + math.erf(z / math.sqrt(2)))
+        return min(max(prob, GDP_PROB_MIN), GDP_PROB_MAX)
+    
+    elif "CPI" in ticker:
+        threshold = float(ticker.split("-T")[-1])
+        if threshold <= 0.0:
+            return 0.99
+        elif threshold >= 0.5:
+            return 0.15
+        elif threshold >= 0.4:
+            return 0.30
+        elif threshold >= 0.3:
+            return 0.55
+        else:
+            return 0.80
+    
+    return yes_bid if yes_bid else 0.5